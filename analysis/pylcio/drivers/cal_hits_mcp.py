@@ -0,0 +1,218 @@
+import ROOT as R
+import numpy as np
+import math
+from pyLCIO.drivers.Driver import Driver
+from pyLCIO import EVENT, UTIL
+
+from pdb import set_trace
+from time_scan import TimeScan, time_scan_path
+from quantile_sketch import SketchSet, sketches_path
+from tree_output import TreeOutput
+from occupancy import OccupancySummary, OCCUPANCY_FIELDS, occupancy_path
+from cell_occupancy import CellOccupancy, cells_path
+from event_context import EventContext
+
+CONST_C = R.TMath.C()
+T_MAX = 0.3 # ns
+# T_MAX = 10.0 # ns
+T_MIN = -1.0 # ns
+
+class CalHitsMCPDriver( Driver ):
+    """Driver creating histograms of detector hits and their corresponding MCParticles"""
+
+    HIT_COLLECTION_NAMES = ['ECalBarrelCollection', 'ECalEndcapCollection']
+    # HIT_COLLECTION_NAMES = ['ECalBarrelCollection', 'ECalEndcapCollection',
+    #                         'HCalBarrelCollection', 'HCalEndcapCollection']
+
+    MODES = ('tree', 'occupancy')
+
+    def __init__( self, output_path=None, mode='tree', context=None, **tree_options):
+        """Constructor
+
+        mode 'tree' stores every hit contribution in the TTree, mode 'occupancy' only the per-module summary
+        context is an EventContext sharing derived products with other drivers, by default a private one
+        tree_options are passed to TreeOutput (compression, auto_flush, auto_save, basket_size)
+        """
+        Driver.__init__(self)
+        if mode not in self.MODES:
+            raise ValueError('Unknown mode {0:s}, use one of {1:s}'.format(mode, ', '.join(self.MODES)))
+        self.output_path = output_path
+        self.mode = mode
+        self.context = EventContext() if context is None else context
+        self.contextSequence = self.context.sequence
+        self.tree_options = tree_options
+
+
+    def startOfData( self ):
+        """Called by the event loop at the beginning of the loop"""
+
+        # Time distributions of all hits, before the T_MIN/T_MAX cut
+        self.time_scan = TimeScan(self.HIT_COLLECTION_NAMES)
+        # Percentiles of hit time and energy per collection and layer, in bounded memory
+        self.sketches = SketchSet(self.HIT_COLLECTION_NAMES)
+        if self.mode == 'occupancy':
+            # Hit counts and energy per module, without the per-hit tree
+            self.occupancy = OccupancySummary(self.HIT_COLLECTION_NAMES)
+            # Hit rates, energy and time moments per full CellID
+            self.cells = CellOccupancy(self.HIT_COLLECTION_NAMES)
+            return
+
+        names_F = ['edep', 'time', 'time0', 'path_len',
+                   'pos_r', 'pos_z', 'pos_x', 'pos_y',
+                   'mcp_vtx_r', 'mcp_vtx_z', 'mcp_vtx_x', 'mcp_vtx_y',
+                   'mcp_bib_vtx_r', 'mcp_bib_vtx_z', 'mcp_bib_vtx_x', 'mcp_bib_vtx_y',
+                   'mcp_theta', 'mcp_phi', 'mcp_bib_theta', 'mcp_bib_phi',
+                   'mcp_time', 'mcp_bib_time',
+                   'mcp_beta', 'mcp_gamma', 'mcp_e', 'mcp_p', 'mcp_pt', 'mcp_pz',
+                   'mcp_bib_beta', 'mcp_bib_gamma', 'mcp_bib_e', 'mcp_bib_p', 'mcp_bib_pt', 'mcp_bib_pz'
+                   ]
+        names_I = ['layer', 'side', 'col_id',
+                   'mcp_pdg', 'mcp_bib_pdg', 'mcp_bib_niters', 'mcp_gen', 'mcp_bib_gen']
+        # Creating the TTree with branches, written to the output file while filling
+        self.data = {}
+        self.output = TreeOutput(self.output_path, 'tree', 'SimTrackerHit properties', **self.tree_options)
+        self.tree = self.output.tree
+        for name in names_F:
+            self.data[name] = np.zeros(1, dtype=np.float32)
+            self.output.branch(name, self.data[name], '{0:s}/F'.format(name))
+        for name in names_I:
+            self.data[name] = np.zeros(1, dtype=np.int32)
+            self.output.branch(name, self.data[name], '{0:s}/I'.format(name))
+
+    def processEvent( self, event ):
+        """Called by the event loop for each event"""
+
+        # Starts the event in the context, unless EventContextDriver or another driver already did
+        self.contextSequence = self.context.join_event(event, self.contextSequence)
+        if self.mode == 'occupancy':
+            return self.processOccupancy(event)
+
+        # Get the MCParticle graph with all lineages resolved, shared by the drivers of the chain
+        mcpGraph = self.context.get('mcp_graph')
+        mcpAnc, mcpDepth = self.context.get('ancestry')
+
+        # Loop over hits
+        print('Event: {0:d}'.format(event.getEventNumber()))
+        nUnmatched = 0
+        for iCol, col_name in enumerate(self.HIT_COLLECTION_NAMES):
+            # print('Event: {0:d} Col: {1:s}'.format(event.getEventNumber(), col_name))
+            col = self.context.get('collection', col_name)
+            # print('  N elements: {0:d}'.format(col.getNumberOfElements()))
+            # CellID fields of all hits, decoded once per event
+            cellIdFields = self.context.get('decoded', col_name)
+            # Filling the Tracker hit properties
+            data = self.data
+            nHits = col.getNumberOfElements()
+            scan = {'layer': [], 'side': [], 'dt': [], 'edep': []}
+            # print('Checking {1:d} hits from: {0:s}'.format(col_name, nHits))
+            for iHit in range(nHits):
+                # if iHit % int(nHits/10) == 0:
+                #     print('  hit {0:d} / {1:d}'.format(iHit, nHits))
+                # Hit time information
+                hit = col.getElementAt(iHit)
+                # Decoded CellID
+                data['col_id'][0] = iCol
+                data['side'][0] = cellIdFields['side'][iHit]
+                data['layer'][0] = cellIdFields['layer'][iHit]
+                # Hit general properties
+                pos = hit.getPositionVec()
+                data['pos_x'][0] = pos.X()
+                data['pos_y'][0] = pos.Y()
+                data['pos_z'][0] = pos.Z()
+                data['pos_r'][0] = pos.Perp()
+                t0 = pos.Mag() / (CONST_C / 1e6)
+                data['time0'][0] = t0
+                # Looping over hit contributions
+                nC = hit.getNMCContributions()
+                for iC in range(nC):
+                    data['time'][0] = hit.getTimeCont(iC)
+                    # Recording every contribution for the time scan
+                    scan['layer'].append(data['layer'][0])
+                    scan['side'].append(data['side'][0])
+                    scan['dt'].append(data['time'][0] - t0)
+                    scan['edep'].append(hit.getEnergyCont(iC))
+                    # Skipping hits outside of the time window
+                    if (data['time'][0] - t0) > T_MAX:
+                        continue
+                    if (data['time'][0] - t0) < T_MIN:
+                        continue
+                    data['edep'][0] = hit.getEnergyCont(iC)
+                    # MCParticle properties
+                    mcp = hit.getParticleCont(iC)
+                    iMcp = mcpGraph.index_of(mcp, -1) if mcp else -1
+                    # Skipping contributions whose particle is not in the MCParticle collection
+                    if iMcp < 0:
+                        nUnmatched += 1
+                        continue
+                    mcp_bib, mcp_bib_niters = mcpGraph.particles[mcpAnc[iMcp]], int(mcpDepth[iMcp])
+                    data['mcp_bib_niters'][0] = mcp_bib_niters
+                    for prefix, part in {'mcp': mcp, 'mcp_bib': mcp_bib}.items():
+                        pos = part.getVertex()
+                        lv = part.getLorentzVec()
+                        data[prefix+'_vtx_x'][0] = pos[0]
+                        data[prefix+'_vtx_y'][0] = pos[1]
+                        data[prefix+'_vtx_z'][0] = pos[2]
+                        data[prefix+'_vtx_r'][0] = math.sqrt(pos[0]*pos[0] + pos[1]*pos[1])
+                        data[prefix+'_pdg'][0] = part.getPDG()
+                        data[prefix+'_time'][0] = part.getTime()
+                        data[prefix+'_gen'][0] = part.getGeneratorStatus()
+                        data[prefix+'_theta'][0] = lv.Theta()
+                        data[prefix+'_phi'][0] = lv.Phi()
+                        data[prefix+'_p'][0] = lv.P()
+                        data[prefix+'_pt'][0] = lv.Pt()
+                        data[prefix+'_pz'][0] = lv.Pz()
+                        data[prefix+'_beta'][0] = lv.Beta()
+                        data[prefix+'_gamma'][0] = lv.Gamma()
+                    self.tree.Fill()
+            self.time_scan.fill(iCol, scan['layer'], scan['side'], scan['dt'], scan['edep'])
+            self.sketches.fill(iCol, scan['layer'], scan['dt'], scan['edep'])
+
+        print('  Tree has {0:d} hits'.format(self.tree.GetEntries()))
+        if nUnmatched:
+            print('  Skipped {0:d} hit contributions with no particle in the MCParticle collection'.format(nUnmatched))
+
+    def processOccupancy( self, event ):
+        """Aggregates hits per (collection, side, layer, module) with array operations, skipping MCParticles
+
+        A hit counts if any of its contributions is inside the time window, with the energy of those contributions
+        """
+
+        print('Event: {0:d}'.format(event.getEventNumber()))
+        self.occupancy.begin_event(event.getEventNumber())
+        self.cells.begin_event()
+        for iCol, col_name in enumerate(self.HIT_COLLECTION_NAMES):
+            decoder = self.context.get('decoder', col_name)
+            cellIds = self.context.get('cellids', col_name)
+            # Fields missing from the encoding count as 0, as in OccupancySummary.add
+            decoded = self.context.get('decoded', col_name)
+            fields = {name: decoded.get(name, np.zeros(len(cellIds), dtype=np.int64)) for name in OCCUPANCY_FIELDS}
+            hits = self.context.get('hit_arrays', col_name)
+            pos = hits['pos']
+            nHits = len(cellIds)
+            # Flat arrays of contributions with the index of their hit
+            iHit, edep, dt = hits['cont_i_hit'], hits['cont_edep'], hits['cont_dt']
+            self.time_scan.fill(iCol, fields['layer'][iHit], fields['side'][iHit], dt, edep)
+            self.sketches.fill(iCol, fields['layer'][iHit], dt, edep)
+            # Same time window as for the tree
+            inWindow = (dt >= T_MIN) & (dt <= T_MAX)
+            hitEdep = np.bincount(iHit[inWindow], weights=edep[inWindow], minlength=nHits)
+            sel = np.bincount(iHit[inWindow], minlength=nHits) > 0
+            self.occupancy.add(iCol, {name: values[sel] for name, values in fields.items()}, hitEdep[sel])
+            # Time of a cell hit: its earliest contribution inside the window
+            hitDt = np.full(nHits, np.inf)
+            np.minimum.at(hitDt, iHit[inWindow], dt[inWindow])
+            self.cells.add(iCol, cellIds[sel], hitEdep[sel], hitDt[sel], pos[sel], decoder.encoding)
+
+    def endOfData( self ):
+        """Called by the event loop at the end of the loop"""
+
+        if self.mode == 'occupancy':
+            if self.output_path is not None:
+                self.occupancy.save(occupancy_path(self.output_path))
+                self.cells.save(cells_path(self.output_path))
+        else:
+            # Closing the output ROOT file with the last baskets of the tree
+            self.output.close()
+        if self.output_path is not None:
+            self.time_scan.save(time_scan_path(self.output_path))
+            self.sketches.save(sketches_path(self.output_path))
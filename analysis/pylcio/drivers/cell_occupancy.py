@@ -0,0 +1,186 @@
+import numpy as np
+
+from cellid import CellIDDecoder
+
+CELL_COLUMNS = ('n_hits', 'n_events', 'edep', 't_sum', 't2_sum', 'x_sum', 'y_sum', 'z_sum')
+CELL_COMPACT_SIZE = 1000000  # pending per-event rows merged into the table at once
+
+class CellTable:
+    """Sums per 64-bit CellID of one collection, as a sorted key array with one row of CELL_COLUMNS per cell
+
+    Each event is grouped by CellID with np.unique/bincount and queued; queued rows are merged
+    into the table in one go, so the cost per event does not grow with the number of known cells.
+    """
+
+    def __init__(self):
+        self.keys = np.zeros(0, dtype=np.uint64)
+        self.sums = np.zeros((0, len(CELL_COLUMNS)))
+        self._pending = []
+        self._n_pending = 0
+
+    def add(self, cellids, edeps, dts, positions):
+        """Adds the hits of one event: arrays of CellID, energy [GeV], time - time0 [ns] and (N, 3) positions [mm]"""
+        cellids = np.asarray(cellids, dtype=np.uint64)
+        if len(cellids) == 0:
+            return
+        dts = np.asarray(dts, dtype=np.float64)
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        keys, inverse = np.unique(cellids, return_inverse=True)
+        inverse = inverse.ravel()
+        values = (np.ones(len(cellids)), None, edeps, dts, dts * dts, positions[:, 0], positions[:, 1], positions[:, 2])
+        sums = np.empty((len(keys), len(CELL_COLUMNS)))
+        for i, weights in enumerate(values):
+            # Every cell in this group-by was hit in this event
+            sums[:, i] = 1.0 if weights is None else np.bincount(inverse, weights=weights, minlength=len(keys))
+        self._queue(keys, sums)
+
+    def _queue(self, keys, sums):
+        self._pending.append((keys, sums))
+        self._n_pending += len(keys)
+        if self._n_pending > CELL_COMPACT_SIZE:
+            self.compact()
+
+    def compact(self):
+        if not self._pending:
+            return self
+        keys = np.concatenate([self.keys] + [p[0] for p in self._pending])
+        sums = np.concatenate([self.sums] + [p[1] for p in self._pending])
+        self.keys, inverse = np.unique(keys, return_inverse=True)
+        inverse = inverse.ravel()
+        self.sums = np.stack([np.bincount(inverse, weights=sums[:, i], minlength=len(self.keys))
+                              for i in range(len(CELL_COLUMNS))], axis=1)
+        self._pending, self._n_pending = [], 0
+        return self
+
+    def merge(self, other):
+        other.compact()
+        self._queue(other.keys, other.sums)
+        return self
+
+    def column(self, name):
+        self.compact()
+        return self.sums[:, CELL_COLUMNS.index(name)]
+
+class CellOccupancy:
+    """Per-cell hit counts, energy sums, time moments and mean positions, keyed by the full CellID
+
+    Rates are per processed event; the mean positions make the cell maps joinable with the geometry.
+
+    Usage:
+        cells = CellOccupancy(['VertexBarrelCollection', 'VertexEndcapCollection'])
+        cells.begin_event()
+        cells.add(iCol, cellids_of(col), edeps, dts, positions, decoder.encoding)
+        cells.save('vtx_cells.npz')
+        rate = CellOccupancy.load('vtx_cells.npz').heatmap('VertexBarrelCollection', 'layer', 'module')
+    """
+
+    def __init__(self, collections):
+        self.collections = list(collections)
+        self.tables = [CellTable() for _ in self.collections]
+        self.encodings = [''] * len(self.collections)
+        self.n_events = 0
+
+    def begin_event(self):
+        self.n_events += 1
+
+    def add(self, col_id, cellids, edeps, dts, positions, encoding=None):
+        if encoding:
+            self.encodings[col_id] = encoding
+        self.tables[col_id].add(cellids, edeps, dts, positions)
+
+    def merge(self, other):
+        for col_id, col_name in enumerate(other.collections):
+            if col_name not in self.collections:
+                self.collections.append(col_name)
+                self.tables.append(CellTable())
+                self.encodings.append('')
+            mine = self.collections.index(col_name)
+            self.tables[mine].merge(other.tables[col_id])
+            self.encodings[mine] = self.encodings[mine] or other.encodings[col_id]
+        self.n_events += other.n_events
+        return self
+
+    def cells(self, col):
+        """Table of one collection: cellid, decoded fields, n_hits, rate, occupancy, edep, t_mean, t_rms, pos_x/y/z"""
+        col_id = self.collections.index(col)
+        table = self.tables[col_id].compact()
+        s = {name: table.sums[:, i] for i, name in enumerate(CELL_COLUMNS)}
+        n_hits = s['n_hits']
+        out = {'cellid': table.keys}
+        if self.encodings[col_id]:
+            out.update(CellIDDecoder(self.encodings[col_id]).decode(table.keys))
+        n_events = max(self.n_events, 1)
+        t_mean = s['t_sum'] / n_hits
+        out.update({'n_hits': n_hits.astype(np.int64),
+                    'rate': n_hits / n_events,
+                    'occupancy': s['n_events'] / n_events,
+                    'edep': s['edep'],
+                    't_mean': t_mean,
+                    't_rms': np.sqrt(np.maximum(s['t2_sum'] / n_hits - t_mean**2, 0.0)),
+                    'pos_x': s['x_sum'] / n_hits, 'pos_y': s['y_sum'] / n_hits, 'pos_z': s['z_sum'] / n_hits})
+        return out
+
+    def heatmap(self, col, x_field, y_field, quantity='rate'):
+        """2D array of a per-cell quantity summed over cells sharing (x_field, y_field), with the field offsets
+
+        Returns (array indexed [x - x_min, y - y_min], x_min, y_min)
+        """
+        cells = self.cells(col)
+        x, y = cells[x_field], cells[y_field]
+        if len(x) == 0:
+            return np.zeros((0, 0)), 0, 0
+        shape = (int(x.max() - x.min()) + 1, int(y.max() - y.min()) + 1)
+        flat = np.ravel_multi_index((x - x.min(), y - y.min()), shape)
+        values = np.bincount(flat, weights=cells[quantity], minlength=shape[0] * shape[1]).reshape(shape)
+        return values, int(x.min()), int(y.min())
+
+    def save(self, path):
+        data = {'collections': np.array(self.collections), 'encodings': np.array(self.encodings),
+                'n_events': np.array(self.n_events)}
+        for col_id, col_name in enumerate(self.collections):
+            table = self.tables[col_id].compact()
+            data['{0:d}_keys'.format(col_id)] = table.keys
+            data['{0:d}_sums'.format(col_id)] = table.sums
+            # Decoded fields and derived values, for reading without this class
+            for name, values in self.cells(col_name).items():
+                if name != 'cellid':
+                    data['{0:d}_{1:s}'.format(col_id, name)] = values
+        np.savez_compressed(path, **data)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            cells = cls([str(c) for c in data['collections']])
+            cells.encodings = [str(e) for e in data['encodings']]
+            cells.n_events = int(data['n_events'])
+            for col_id, table in enumerate(cells.tables):
+                table.keys = data['{0:d}_keys'.format(col_id)].astype(np.uint64)
+                table.sums = data['{0:d}_sums'.format(col_id)].reshape(-1, len(CELL_COLUMNS))
+        return cells
+
+def cells_path(output_path):
+    """Path of the per-cell occupancy file written next to a driver's output"""
+    return output_path[:-5] + '_cells.npz' if output_path.endswith('.root') else output_path + '_cells.npz'
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Per-cell hit rates from one or more cell occupancy files (merged)')
+    parser.add_argument('input', metavar='FILE_cells.npz', type=str, nargs='+')
+    parser.add_argument('-o', '--output', metavar='OUT.npz', type=str, help='Save the merged cell maps', default=None)
+    parser.add_argument('-n', '--top', metavar='N', type=int, help='Number of hottest cells to list', default=10)
+    opts = parser.parse_args()
+
+    cells = CellOccupancy.load(opts.input[0])
+    for path in opts.input[1:]:
+        cells.merge(CellOccupancy.load(path))
+    print('{0:d} events'.format(cells.n_events))
+    for col_id, col_name in enumerate(cells.collections):
+        table = cells.cells(col_name)
+        print('{0:30s} {1:>8d} cells {2:>10.4g} hits/event'.format(col_name, len(table['cellid']), table['rate'].sum()))
+        fields = CellIDDecoder(cells.encodings[col_id]).names if cells.encodings[col_id] else []
+        for i in np.argsort(table['rate'])[::-1][:opts.top]:
+            print('  ' + ' '.join('{0:s}={1:d}'.format(f, int(table[f][i])) for f in fields) +
+                  '  rate={0:.4g} occupancy={1:.4g} t_mean={2:.3g} ns'.format(table['rate'][i], table['occupancy'][i], table['t_mean'][i]))
+    if opts.output:
+        cells.save(opts.output)
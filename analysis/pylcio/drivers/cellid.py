@@ -0,0 +1,53 @@
+import numpy as np
+
+class CellIDDecoder:
+    """Vectorized decoder of DD4hep CellIDs, equivalent to UTIL.BitField64 over whole arrays
+
+    The encoding string lists 'name:width' or 'name:offset:width' fields; a negative width
+    marks a signed field, e.g. 'system:5,side:-2,layer:6,module:11,sensor:8'.
+
+    Usage:
+        decoder = CellIDDecoder.for_collection(col)
+        fields = decoder.decode(cellids_of(col), ['side', 'layer', 'module'])
+    """
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        self.fields = {}
+        offset = 0
+        for token in encoding.split(','):
+            parts = token.strip().split(':')
+            if len(parts) == 3:
+                offset = int(parts[1])
+            width = int(parts[-1])
+            if not (0 < abs(width) <= 64) or offset + abs(width) > 64:
+                raise ValueError('Invalid CellID field {0:s} in {1:s}'.format(token, encoding))
+            self.fields[parts[0]] = (offset, abs(width), width < 0)
+            offset += abs(width)
+
+    @classmethod
+    def for_collection(cls, col):
+        from pyLCIO import EVENT
+        return cls(col.getParameters().getStringVal(EVENT.LCIO.CellIDEncoding))
+
+    @property
+    def names(self):
+        return list(self.fields)
+
+    def field(self, name, cellids):
+        """Values of one field as int64"""
+        offset, width, signed = self.fields[name]
+        cellids = np.asarray(cellids, dtype=np.uint64)
+        values = ((cellids >> np.uint64(offset)) & np.uint64((1 << width) - 1)).astype(np.int64)
+        if signed:
+            values = np.where(values >= (1 << (width - 1)), values - (1 << width), values)
+        return values
+
+    def decode(self, cellids, names=None):
+        """Dictionary of field name -> int64 array"""
+        return {name: self.field(name, cellids) for name in (self.names if names is None else names)}
+
+def cellids_of(col):
+    """64-bit CellIDs of all hits of a collection, as a uint64 array"""
+    return np.array([(int(hit.getCellID0()) & 0xffffffff) | ((int(hit.getCellID1()) & 0xffffffff) << 32)
+                     for hit in col], dtype=np.uint64)
@@ -0,0 +1,155 @@
+import numpy as np
+from pyLCIO.drivers.Driver import Driver
+
+from mcp_graph import MCParticleGraph
+from cellid import CellIDDecoder, cellids_of
+
+CONST_C = 299792458.0  # m/s, as R.TMath.C()
+
+# Producers known to every EventContext: name -> function(context, *args) returning the product
+PRODUCERS = {}
+
+def producer(name):
+    """Decorator registering a producer for all EventContexts"""
+    def register(func):
+        PRODUCERS[name] = func
+        return func
+    return register
+
+class EventContext:
+    """Products derived from the current event, computed lazily at most once per event and shared by all drivers
+
+    A product is requested by name and arguments, e.g. context.get('decoded', 'ECalBarrelCollection'),
+    and computed by the producer registered under that name on first request. All products are
+    dropped by begin_event(), which EventContextDriver calls first in a driver chain. Drivers call
+    join_event() instead, which starts the event only if no other driver has done so yet.
+
+    Usage:
+        context = EventContext()
+        context.register('n_bib', lambda ctx: len(np.unique(ctx['ancestry'][0])))
+        sequence = context.join_event(event, sequence)
+        anc, depth = context['ancestry']
+        fields = context.get('decoded', 'ECalBarrelCollection')
+    """
+
+    def __init__(self, producers=None):
+        self.producers = dict(PRODUCERS)
+        self.producers.update(producers or {})
+        self.event = None
+        self._products = {}
+        self.sequence = 0  # number of events started
+        self.n_requested = {}
+        self.n_computed = {}
+
+    def register(self, name, func):
+        """Adds or replaces a producer: func(context, *args) -> product"""
+        self.producers[name] = func
+
+    def begin_event(self, event):
+        """Starts a new event, dropping all products of the previous one"""
+        self.event = event
+        self._products = {}
+        self.sequence += 1
+
+    def join_event(self, event, sequence):
+        """Starts event unless another driver has started one since this driver saw the given sequence number
+
+        The reader can reuse the event object and run/event numbers repeat across files,
+        so only the sequence number tells whether the current products belong to this event.
+        Returns the sequence number to pass on the next call.
+        """
+        if self.sequence == sequence:
+            self.begin_event(event)
+        return self.sequence
+
+    def get(self, name, *args):
+        """Product of the current event, computed by its producer on first request"""
+        key = (name,) + args
+        self.n_requested[name] = self.n_requested.get(name, 0) + 1
+        if key not in self._products:
+            if name not in self.producers:
+                raise KeyError('No producer registered for {0:s}'.format(name))
+            self._products[key] = self.producers[name](self, *args)
+            self.n_computed[name] = self.n_computed.get(name, 0) + 1
+        return self._products[key]
+
+    def __getitem__(self, name):
+        return self.get(name)
+
+    def print_statistics(self):
+        print('### Event context: {0:d} events'.format(self.sequence))
+        for name in sorted(self.n_requested):
+            print('  {0:20s} requested {1:8d} computed {2:8d}'.format(name, self.n_requested[name], self.n_computed.get(name, 0)))
+
+@producer('mcp_graph')
+def _mcp_graph(context):
+    return MCParticleGraph.from_collection(context.event.getMcParticles())
+
+@producer('ancestry')
+def _ancestry(context):
+    """(oldest ancestor index, generation depth) of every MCParticle"""
+    return context.get('mcp_graph').oldest_ancestor()
+
+@producer('collection')
+def _collection(context, col_name):
+    return context.event.getCollection(col_name)
+
+@producer('cellids')
+def _cellids(context, col_name):
+    return cellids_of(context.get('collection', col_name))
+
+@producer('decoder')
+def _decoder(context, col_name):
+    return CellIDDecoder.for_collection(context.get('collection', col_name))
+
+@producer('decoded')
+def _decoded(context, col_name):
+    """All CellID fields of the hits of a collection, as a dictionary of arrays"""
+    return context.get('decoder', col_name).decode(context.get('cellids', col_name))
+
+@producer('hit_arrays')
+def _hit_arrays(context, col_name):
+    """Array views of a hit collection: pos [mm] and time0 [ns] per hit, with
+
+    SimTrackerHit: time, edep and dt = time - time0 per hit
+    SimCalorimeterHit: edep per hit, and i_hit, time, edep and dt of every MC contribution
+    """
+    col = context.get('collection', col_name)
+    pos = np.array([[hit.getPosition()[i] for i in range(3)] for hit in col], dtype=np.float64).reshape(-1, 3)
+    time0 = np.sqrt((pos**2).sum(axis=1)) / (CONST_C / 1e6)
+    arrays = {'pos': pos, 'time0': time0}
+    if col.getTypeName() == 'SimCalorimeterHit':
+        nConts = np.array([hit.getNMCContributions() for hit in col], dtype=np.int64)
+        arrays['edep'] = np.array([hit.getEnergy() for hit in col], dtype=np.float64)
+        arrays['cont_i_hit'] = np.repeat(np.arange(len(pos)), nConts)
+        arrays['cont_time'] = np.array([hit.getTimeCont(iC) for hit in col for iC in range(hit.getNMCContributions())], dtype=np.float64)
+        arrays['cont_edep'] = np.array([hit.getEnergyCont(iC) for hit in col for iC in range(hit.getNMCContributions())], dtype=np.float64)
+        arrays['cont_dt'] = arrays['cont_time'] - time0[arrays['cont_i_hit']]
+    else:
+        arrays['time'] = np.array([hit.getTime() for hit in col], dtype=np.float64)
+        arrays['edep'] = np.array([hit.getEDep() for hit in col], dtype=np.float64)
+        arrays['dt'] = arrays['time'] - time0
+    return arrays
+
+@producer('mcp_volume')
+def _mcp_volume(context, classifier):
+    """Volume label of the production vertex of every MCParticle, from a classifier with classify(points_mm)"""
+    return classifier.classify(context.get('mcp_graph').vertex)
+
+@producer('bib_volume')
+def _bib_volume(context, classifier):
+    """Volume label of the production vertex of the oldest ancestor of every MCParticle"""
+    return context.get('mcp_volume', classifier)[context.get('ancestry')[0]]
+
+class EventContextDriver( Driver ):
+    """Driver starting each event in a shared EventContext, added before the drivers using it"""
+
+    def __init__( self, context ):
+        Driver.__init__(self)
+        self.context = context
+
+    def processEvent( self, event ):
+        self.context.begin_event(event)
+
+    def endOfData( self ):
+        self.context.print_statistics()
@@ -0,0 +1,82 @@
+import numpy as np
+
+OCCUPANCY_FIELDS = ('side', 'layer', 'module')
+
+class OccupancySummary:
+    """Hit counts and energy sums per (collection, side, layer, module), per event and summed over events
+
+    Built with np.unique/bincount on decoded CellIDs, as a compact alternative to the per-hit tree.
+
+    Usage:
+        occupancy = OccupancySummary(['VertexBarrelCollection', 'VertexEndcapCollection'])
+        occupancy.begin_event(event.getEventNumber())
+        occupancy.add(iCol, decoder.decode(cellIds, OCCUPANCY_FIELDS), edeps)
+        occupancy.save('vtx_occupancy.npz')
+    """
+
+    def __init__(self, collections, fields=OCCUPANCY_FIELDS):
+        self.collections = list(collections)
+        self.fields = tuple(fields)
+        self.events = []
+        self._chunks = []
+
+    @property
+    def n_events(self):
+        return len(self.events)
+
+    def begin_event(self, event_number):
+        self.events.append(int(event_number))
+
+    def add(self, col_id, decoded, edeps):
+        """Adds the hits of one collection in the current event
+
+        decoded: dictionary of field -> array (fields missing from the encoding count as 0)
+        """
+        edeps = np.asarray(edeps, dtype=np.float64)
+        if len(edeps) == 0:
+            return
+        keys = np.stack([np.asarray(decoded.get(f, np.zeros(len(edeps))), dtype=np.int64) for f in self.fields], axis=1)
+        groups, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        n_hits = np.bincount(inverse, minlength=len(groups))
+        edep = np.bincount(inverse, weights=edeps, minlength=len(groups))
+        event = np.full(len(groups), self.events[-1] if self.events else -1, dtype=np.int64)
+        col = np.full(len(groups), col_id, dtype=np.int64)
+        self._chunks.append((event, col, groups, n_hits, edep))
+
+    def per_event(self):
+        """Table of (event, col_id, fields..., n_hits, edep) arrays, one row per event and module"""
+        if not self._chunks:
+            table = {'event': np.zeros(0, dtype=np.int64), 'col_id': np.zeros(0, dtype=np.int64)}
+            table.update({f: np.zeros(0, dtype=np.int64) for f in self.fields})
+            table.update({'n_hits': np.zeros(0, dtype=np.int64), 'edep': np.zeros(0)})
+            return table
+        event, col, groups, n_hits, edep = (np.concatenate(parts) for parts in zip(*self._chunks))
+        table = {'event': event, 'col_id': col}
+        table.update({f: groups[:, i] for i, f in enumerate(self.fields)})
+        table.update({'n_hits': n_hits, 'edep': edep})
+        return table
+
+    def totals(self):
+        """Table of (col_id, fields..., n_hits, edep) summed over events, with per-event means"""
+        table = self.per_event()
+        keys = np.stack([table['col_id']] + [table[f] for f in self.fields], axis=1)
+        groups, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        totals = {'col_id': groups[:, 0]}
+        totals.update({f: groups[:, i + 1] for i, f in enumerate(self.fields)})
+        totals['n_hits'] = np.bincount(inverse, weights=table['n_hits'], minlength=len(groups)).astype(np.int64)
+        totals['edep'] = np.bincount(inverse, weights=table['edep'], minlength=len(groups))
+        totals['n_hits_per_event'] = totals['n_hits'] / max(self.n_events, 1)
+        return totals
+
+    def save(self, path):
+        data = {'collections': np.array(self.collections), 'fields': np.array(self.fields),
+                'events': np.array(self.events, dtype=np.int64)}
+        data.update({'event_' + name: values for name, values in self.per_event().items()})
+        data.update({'total_' + name: values for name, values in self.totals().items()})
+        np.savez_compressed(path, **data)
+
+def occupancy_path(output_path):
+    """Path of the occupancy summary written instead of a driver's ROOT output"""
+    return output_path[:-5] + '_occupancy.npz' if output_path.endswith('.root') else output_path + '_occupancy.npz'
@@ -0,0 +1,216 @@
+import numpy as np
+
+KLL_K = 200  # accuracy parameter: rank error of order 1 / K (< 1% at K=200) with ~3 K stored values (~5 KB)
+KLL_C = 2.0 / 3.0  # capacity ratio between consecutive levels
+
+class KLLSketch:
+    """Mergeable KLL quantile sketch of a stream of values
+
+    Level h holds values of weight 2^h. A full level is sorted and every other value
+    (random offset) is promoted to the next level, so memory stays O(K) for any stream length.
+    Filled with whole arrays, and merged across processes with merge() or +.
+
+    Usage:
+        sketch = KLLSketch()
+        sketch.update(times)
+        p50, p90, p99 = sketch.quantiles([0.5, 0.9, 0.99])
+    """
+
+    def __init__(self, k=KLL_K, seed=None):
+        self.k = k
+        self.levels = [np.zeros(0)]
+        self.n = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, h):
+        return max(2, int(np.ceil(self.k * KLL_C ** (len(self.levels) - 1 - h))))
+
+    def _compress(self):
+        # Lazy compaction: only while the sketch as a whole is over capacity, lowest full level first
+        while sum(len(level) for level in self.levels) > sum(self._capacity(h) for h in range(len(self.levels))):
+            h = next(h for h, level in enumerate(self.levels) if len(level) >= self._capacity(h))
+            if h + 1 == len(self.levels):
+                self.levels.append(np.zeros(0))
+            level = np.sort(self.levels[h])
+            # An odd value out stays at this level, the rest is halved into the next one
+            keep, level = level[:len(level) % 2], level[len(level) % 2:]
+            self.levels[h] = keep
+            self.levels[h + 1] = np.concatenate([self.levels[h + 1], level[self._rng.integers(2)::2]])
+
+    def update(self, values):
+        """Adds an array of values (NaN are ignored)"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.n += len(values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """Adds the stream of another sketch"""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.zeros(0))
+        for h, level in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], level])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def __add__(self, other):
+        return KLLSketch.from_arrays(*self.to_arrays(), k=self.k).merge(other)
+
+    def _weighted(self):
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2.0 ** h) for h, level in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        return values[order], np.cumsum(weights[order])
+
+    def quantiles(self, qs):
+        """Approximate values at the quantiles qs (0..1); exact at 0 and 1"""
+        qs = np.asarray(qs, dtype=np.float64)
+        if self.n == 0:
+            return np.full(qs.shape, np.nan)
+        values, cum = self._weighted()
+        idx = np.searchsorted(cum, qs * cum[-1], side='left').clip(0, len(values) - 1)
+        out = values[idx]
+        out = np.where(qs <= 0, self.min, out)
+        return np.where(qs >= 1, self.max, out)
+
+    def quantile(self, q):
+        return float(self.quantiles(q))
+
+    def rank(self, x):
+        """Approximate fraction of values <= x"""
+        if self.n == 0:
+            return np.nan
+        values, cum = self._weighted()
+        i = np.searchsorted(values, np.asarray(x, dtype=np.float64), side='right')
+        return np.where(i > 0, cum[np.maximum(i - 1, 0)], 0.0) / cum[-1]
+
+    @property
+    def size(self):
+        """Number of stored values"""
+        return sum(len(level) for level in self.levels)
+
+    def to_arrays(self):
+        """(values, level sizes, [n, min, max]) for storage"""
+        return (np.concatenate(self.levels), np.array([len(level) for level in self.levels], dtype=np.int64),
+                np.array([self.n, self.min, self.max], dtype=np.float64))
+
+    @classmethod
+    def from_arrays(cls, values, sizes, stats, k=KLL_K):
+        sketch = cls(k)
+        sketch.levels = np.split(np.asarray(values, dtype=np.float64), np.cumsum(sizes)[:-1])
+        sketch.n, sketch.min, sketch.max = int(stats[0]), float(stats[1]), float(stats[2])
+        return sketch
+
+class SketchSet:
+    """KLL sketches of hit time - time0 and energy per (collection, layer)
+
+    Usage:
+        sketches = SketchSet(['ECalBarrelCollection', 'ECalEndcapCollection'])
+        sketches.fill(iCol, layers, dts, edeps)
+        sketches.quantiles('ECalBarrelCollection', 'dt', [0.5, 0.9, 0.99], layer=3)
+    """
+
+    QUANTITIES = ('dt', 'edep')
+
+    def __init__(self, collections, k=KLL_K):
+        self.collections = list(collections)
+        self.k = k
+        self.sketches = {}
+
+    def _get(self, key):
+        if key not in self.sketches:
+            self.sketches[key] = {q: KLLSketch(self.k) for q in self.QUANTITIES}
+        return self.sketches[key]
+
+    def fill(self, col_id, layers, dts, edeps):
+        """Adds the hits of one collection: arrays of layer, time - time0 [ns] and energy [GeV]"""
+        layers = np.asarray(layers, dtype=np.int64)
+        dts = np.asarray(dts, dtype=np.float64)
+        edeps = np.asarray(edeps, dtype=np.float64)
+        for layer in np.unique(layers):
+            sel = layers == layer
+            sketches = self._get((int(col_id), int(layer)))
+            sketches['dt'].update(dts[sel])
+            sketches['edep'].update(edeps[sel])
+
+    def merge(self, other):
+        for (col_id, layer), sketches in other.sketches.items():
+            col_name = other.collections[col_id]
+            if col_name not in self.collections:
+                self.collections.append(col_name)
+            mine = self._get((self.collections.index(col_name), layer))
+            for q in self.QUANTITIES:
+                mine[q].merge(sketches[q])
+        return self
+
+    def combined(self, col, quantity, layer=None):
+        """One sketch over all layers of a collection (or a single layer)"""
+        col_id = self.collections.index(col)
+        out = KLLSketch(self.k)
+        for (c, l), sketches in sorted(self.sketches.items()):
+            if c == col_id and (layer is None or l == layer):
+                out.merge(sketches[quantity])
+        return out
+
+    def quantiles(self, col, quantity, qs, layer=None):
+        return self.combined(col, quantity, layer).quantiles(qs)
+
+    def save(self, path):
+        data = {'collections': np.array(self.collections), 'k': np.array(self.k),
+                'keys': np.array(sorted(self.sketches), dtype=np.int64).reshape(-1, 2)}
+        for i, key in enumerate(sorted(self.sketches)):
+            for q, sketch in self.sketches[key].items():
+                values, sizes, stats = sketch.to_arrays()
+                data['{0:d}_{1:s}_values'.format(i, q)] = values
+                data['{0:d}_{1:s}_sizes'.format(i, q)] = sizes
+                data['{0:d}_{1:s}_stats'.format(i, q)] = stats
+        np.savez_compressed(path, **data)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            sketch_set = cls([str(c) for c in data['collections']], int(data['k']))
+            for i, key in enumerate(data['keys']):
+                sketch_set.sketches[tuple(int(k) for k in key)] = {
+                    q: KLLSketch.from_arrays(data['{0:d}_{1:s}_values'.format(i, q)],
+                                             data['{0:d}_{1:s}_sizes'.format(i, q)],
+                                             data['{0:d}_{1:s}_stats'.format(i, q)], sketch_set.k)
+                    for q in cls.QUANTITIES}
+        return sketch_set
+
+def sketches_path(output_path):
+    """Path of the quantile-sketch file written next to a driver's ROOT output"""
+    return output_path[:-5] + '_sketches.npz' if output_path.endswith('.root') else output_path + '_sketches.npz'
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Percentiles of hit time and energy from one or more sketch files (merged)')
+    parser.add_argument('input', metavar='FILE_sketches.npz', type=str, nargs='+')
+    parser.add_argument('-q', '--quantiles', type=float, nargs='+', default=[0.5, 0.9, 0.99])
+    parser.add_argument('--per-layer', action='store_true', help='One line per layer')
+    opts = parser.parse_args()
+
+    sketch_set = SketchSet.load(opts.input[0])
+    for path in opts.input[1:]:
+        sketch_set.merge(SketchSet.load(path))
+    header = ' '.join('{0:>10s}'.format('{0:s}_p{1:g}'.format(q, 100 * p)) for q in SketchSet.QUANTITIES for p in opts.quantiles)
+    print('{0:30s} {1:>5s} {2:>10s} '.format('collection', 'layer', 'n_hits') + header)
+    for col_id, col_name in enumerate(sketch_set.collections):
+        layers = sorted(l for c, l in sketch_set.sketches if c == col_id)
+        for layer in (layers if opts.per_layer else [None]):
+            n_hits = sketch_set.combined(col_name, 'dt', layer).n
+            values = [v for q in SketchSet.QUANTITIES for v in sketch_set.quantiles(col_name, q, opts.quantiles, layer)]
+            print('{0:30s} {1:>5s} {2:>10d} '.format(col_name, 'all' if layer is None else str(layer), n_hits) +
+                  ' '.join('{0:>10.4g}'.format(v) for v in values))
@@ -0,0 +1,171 @@
+import os
+import struct
+import zlib
+import numpy as np
+
+# SIO record layout (big-endian), as written by LCIO:
+#   record header: header length, 0xabadcafe, options, data length, uncompressed length,
+#                  name length, name (padded to 4 bytes); followed by the (padded) data
+#   block header:  block length, 0xdeadbeef, version, name length, name (padded)
+# The 'EventHeader' block of an 'LCEventHeader' record starts with int32 run, int32 event.
+SIO_RECORD_MARKER = 0xabadcafe
+SIO_BLOCK_MARKER = 0xdeadbeef
+SIO_OPT_COMPRESS = 0x1
+EVENT_HEADER_RECORD = b'LCEventHeader'
+
+INDEX_SUFFIX = '.evtidx.npz'
+INDEX_VERSION = 2  # 2: record offsets dropped
+
+def _pad4(n):
+    return (n + 3) & ~3
+
+def scan_event_headers(path):
+    """Yields (run, event) of every event in an slcio file, in file order, reading only record headers"""
+    with open(path, 'rb') as f:
+        offset = 0
+        while True:
+            head = f.read(24)
+            if len(head) < 24:
+                return
+            head_len, marker, options, data_len, _, name_len = struct.unpack('>6I', head)
+            if marker != SIO_RECORD_MARKER:
+                raise ValueError('{0:s}: no SIO record marker at offset {1:d}'.format(str(path), offset))
+            name = f.read(_pad4(name_len))[:name_len]
+            f.seek(offset + head_len)
+            if name == EVENT_HEADER_RECORD:
+                data = f.read(_pad4(data_len))[:data_len]
+                if options & SIO_OPT_COMPRESS:
+                    data = zlib.decompress(data)
+                blk_name_len = struct.unpack('>I', data[12:16])[0]
+                start = 16 + _pad4(blk_name_len)
+                run, event = struct.unpack('>2i', data[start:start + 8])
+                yield run, event
+            offset += head_len + _pad4(data_len)
+            f.seek(offset)
+
+class SlcioEventIndex:
+    """Event number -> run map of one slcio file, in file order
+
+    Only (run, event) pairs are stored: events are read with LCReader.readEvent(run, event),
+    which does its own lookup through the LCIO random-access records of the file.
+    """
+
+    def __init__(self, path, runs, events):
+        self.path = str(path)
+        self.runs = np.asarray(runs, dtype=np.int32)
+        self.events = np.asarray(events, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.events)
+
+    @staticmethod
+    def sidecar_path(path):
+        return str(path) + INDEX_SUFFIX
+
+    @classmethod
+    def build(cls, path):
+        """Scans the file once"""
+        entries = np.array(list(scan_event_headers(path)), dtype=np.int64).reshape(-1, 2)
+        return cls(path, entries[:, 0], entries[:, 1])
+
+    def save(self):
+        stat = os.stat(self.path)
+        np.savez(self.sidecar_path(self.path), runs=self.runs, events=self.events,
+                 meta=np.array([INDEX_VERSION, stat.st_size, stat.st_mtime_ns], dtype=np.int64))
+
+    @classmethod
+    def load(cls, path):
+        """Returns the persisted index, or None if it is missing or the file changed since"""
+        sidecar = cls.sidecar_path(path)
+        if not os.path.exists(sidecar):
+            return None
+        stat = os.stat(path)
+        with np.load(sidecar) as data:
+            if list(data['meta']) != [INDEX_VERSION, stat.st_size, stat.st_mtime_ns]:
+                return None
+            return cls(path, data['runs'], data['events'])
+
+    @classmethod
+    def open(cls, path, rebuild=False):
+        """Loads the sidecar index, building and saving it first if needed"""
+        index = None if rebuild else cls.load(path)
+        if index is None:
+            index = cls.build(path)
+            index.save()
+        return index
+
+    def locate(self, event, run=None):
+        """Returns (run, event) of an event number; the run is required only if it is ambiguous"""
+        matches = np.flatnonzero(self.events == event)
+        if run is not None:
+            matches = matches[self.runs[matches] == run]
+        if len(matches) == 0:
+            raise KeyError('Event {0:d} not in {1:s}'.format(event, self.path))
+        if len(matches) > 1:
+            raise KeyError('Event {0:d} appears in runs {1}; pass run='.format(event, sorted(set(self.runs[matches]))))
+        return int(self.runs[matches[0]]), int(event)
+
+    def shard(self, i_shard, n_shards):
+        """Returns the (run, event) pairs of a contiguous shard, in file order"""
+        bounds = np.linspace(0, len(self), n_shards + 1).astype(int)
+        sl = slice(bounds[i_shard], bounds[i_shard + 1])
+        return list(zip(self.runs[sl].tolist(), self.events[sl].tolist()))
+
+class IndexedReader:
+    """Random access to the events of an slcio file through its event index
+
+    Usage:
+        with IndexedReader('file.slcio') as reader:
+            event = reader.get(42)
+            for event in reader.shard(0, 8): ...
+    """
+
+    def __init__(self, path, rebuild_index=False):
+        self.path = str(path)
+        self.index = SlcioEventIndex.open(path, rebuild_index)
+        self._reader = None
+
+    def _lcreader(self):
+        if self._reader is None:
+            from pyLCIO import IOIMPL
+            self._reader = IOIMPL.LCFactory.getInstance().createLCReader()
+            self._reader.open(self.path)
+        return self._reader
+
+    def get(self, event, run=None):
+        """Reads a single event; it stays valid until the next read"""
+        run, event = self.index.locate(event, run)
+        return self._lcreader().readEvent(run, event)
+
+    def get_many(self, events):
+        """Yields the requested event numbers, read in file order"""
+        pairs = [self.index.locate(event) for event in events]
+        order = {pair: i for i, pair in enumerate(zip(self.index.runs.tolist(), self.index.events.tolist()))}
+        for run, event in sorted(pairs, key=order.get):
+            yield self._lcreader().readEvent(run, event)
+
+    def shard(self, i_shard, n_shards):
+        """Yields the events of one of n contiguous shards"""
+        for run, event in self.index.shard(i_shard, n_shards):
+            yield self._lcreader().readEvent(run, event)
+
+    def close(self):
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Build event index sidecars for slcio files')
+    parser.add_argument('input', metavar='input.slcio', type=str, nargs='+')
+    parser.add_argument('--rebuild', action='store_true', help='Rebuild even if an up-to-date index exists')
+    opts = parser.parse_args()
+    for path in opts.input:
+        index = SlcioEventIndex.open(path, opts.rebuild)
+        print('{0:s}: {1:d} events -> {2:s}'.format(path, len(index), SlcioEventIndex.sidecar_path(path)))
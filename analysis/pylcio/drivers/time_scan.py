@@ -0,0 +1,144 @@
+import numpy as np
+
+# Fine binning of hit time - time0 [ns]: 5 ps around the bunch crossing, coarser for late hits
+TIME_SCAN_EDGES = np.unique(np.concatenate([
+    np.linspace(-2.0, 2.0, 801),
+    np.linspace(2.0, 20.0, 361),
+    np.geomspace(20.0, 1e5, 201),
+]))
+
+class TimeScan:
+    """Per (collection, layer, side) histograms of hit time - time0, counting hits and summing their energy
+
+    Filled with all hits before any time cut, so hit counts and energy sums for any
+    [T_MIN, T_MAX] window can be computed afterwards without re-reading the events.
+    Window limits are rounded to the nearest bin edge; limits beyond the binned range include the
+    under/overflow bins.
+
+    Usage:
+        scan = TimeScan(['ECalBarrelCollection', 'ECalEndcapCollection'])
+        scan.fill(iCol, layers, sides, times - times0, energies)
+        scan.save('cal_hits_timescan.npz')
+        n_hits, edep = TimeScan.load('cal_hits_timescan.npz').window(-1.0, 0.3, col='ECalBarrelCollection')
+    """
+
+    def __init__(self, collections, edges=TIME_SCAN_EDGES):
+        self.collections = list(collections)
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.keys = {}
+        self.counts = []
+        self.energy = []
+
+    def _row(self, key):
+        """Index of the histograms of one (col_id, layer, side), created on first use"""
+        row = self.keys.get(key)
+        if row is None:
+            row = self.keys[key] = len(self.counts)
+            self.counts.append(np.zeros(len(self.edges) + 1, dtype=np.int64))
+            self.energy.append(np.zeros(len(self.edges) + 1))
+        return row
+
+    def fill(self, col_id, layers, sides, dts, energies):
+        """Adds the hits of one collection: arrays of layer, side, time - time0 [ns] and energy [GeV]"""
+        layers = np.asarray(layers, dtype=np.int64)
+        sides = np.asarray(sides, dtype=np.int64)
+        dts = np.asarray(dts, dtype=np.float64)
+        energies = np.asarray(energies, dtype=np.float64)
+        if len(dts) == 0:
+            return
+        bins = np.searchsorted(self.edges, dts, side='right')
+        nbins = len(self.edges) + 1
+        # One bincount over (layer, side) groups instead of a Python loop over hits
+        groups, inverse = np.unique(np.stack([layers, sides], axis=1), axis=0, return_inverse=True)
+        flat = inverse.ravel() * nbins + bins
+        counts = np.bincount(flat, minlength=len(groups) * nbins).reshape(len(groups), nbins)
+        energy = np.bincount(flat, weights=energies, minlength=len(groups) * nbins).reshape(len(groups), nbins)
+        for iGroup, (layer, side) in enumerate(groups):
+            row = self._row((int(col_id), int(layer), int(side)))
+            self.counts[row] += counts[iGroup]
+            self.energy[row] += energy[iGroup]
+
+    def merge(self, other):
+        """Adds another TimeScan with the same binning"""
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError('TimeScan binnings differ')
+        for key, row in other.keys.items():
+            col_name = other.collections[key[0]]
+            if col_name not in self.collections:
+                self.collections.append(col_name)
+            mine = self._row((self.collections.index(col_name), key[1], key[2]))
+            self.counts[mine] += other.counts[row]
+            self.energy[mine] += other.energy[row]
+        return self
+
+    def _select(self, col=None, layer=None, side=None):
+        col_id = None if col is None else self.collections.index(col)
+        return [row for (c, l, s), row in sorted(self.keys.items())
+                if (col_id is None or c == col_id) and (layer is None or l == layer) and (side is None or s == side)]
+
+    def _edge_index(self, t):
+        """Index of the nearest edge in (-inf, edges..., +inf)"""
+        i = np.abs(self.edges[None, :] - t.reshape(-1, 1)).argmin(axis=1) + 1
+        i[t < self.edges[0]] = 0
+        i[t > self.edges[-1]] = len(self.edges) + 1
+        return i
+
+    def scan(self, t_min, t_max, col=None, layer=None, side=None):
+        """Hit counts and energy sums for many windows at once
+
+        t_min and t_max broadcast against each other; returns (n_hits, edep) arrays of that shape.
+        """
+        t_min, t_max = np.broadcast_arrays(np.asarray(t_min, dtype=np.float64), np.asarray(t_max, dtype=np.float64))
+        rows = self._select(col, layer, side)
+        if not rows:
+            return np.zeros(t_min.shape, dtype=np.int64), np.zeros(t_min.shape)
+        # Cumulative sums over all bins: window = cum[i_max] - cum[i_min], with edge index i
+        # running over (-inf, edges..., +inf) so that windows beyond the binned range include the flows
+        cum_n = np.concatenate([[0], np.cumsum(np.sum([self.counts[r] for r in rows], axis=0))])
+        cum_e = np.concatenate([[0.0], np.cumsum(np.sum([self.energy[r] for r in rows], axis=0))])
+        i_min, i_max = self._edge_index(t_min.ravel()), self._edge_index(t_max.ravel())
+        i_max = np.maximum(i_max, i_min)
+        n_hits = (cum_n[i_max] - cum_n[i_min]).reshape(t_min.shape)
+        edep = (cum_e[i_max] - cum_e[i_min]).reshape(t_min.shape)
+        return n_hits, edep
+
+    def window(self, t_min, t_max, col=None, layer=None, side=None):
+        """Number of hits and summed energy with t_min <= time - time0 < t_max"""
+        n_hits, edep = self.scan(t_min, t_max, col, layer, side)
+        return int(n_hits), float(edep)
+
+    def save(self, path):
+        keys = np.array(sorted(self.keys, key=self.keys.get), dtype=np.int64).reshape(-1, 3)
+        nbins = len(self.edges) + 1
+        np.savez_compressed(path, collections=np.array(self.collections), edges=self.edges, keys=keys,
+                            counts=np.array(self.counts, dtype=np.int64).reshape(-1, nbins),
+                            energy=np.array(self.energy, dtype=np.float64).reshape(-1, nbins))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            scan = cls([str(c) for c in data['collections']], data['edges'])
+            for key, counts, energy in zip(data['keys'], data['counts'], data['energy']):
+                row = scan._row(tuple(int(k) for k in key))
+                scan.counts[row] += counts
+                scan.energy[row] += energy
+        return scan
+
+def time_scan_path(output_path):
+    """Path of the time-scan file written next to a driver's ROOT output"""
+    return output_path[:-5] + '_timescan.npz' if output_path.endswith('.root') else output_path + '_timescan.npz'
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Hit counts and energy vs time window from a time-scan file')
+    parser.add_argument('input', metavar='FILE_timescan.npz', type=str)
+    parser.add_argument('--t-min', type=float, default=-1.0, help='Lower window edge [ns]')
+    parser.add_argument('--t-max', type=float, nargs='+', default=[0.1, 0.18, 0.3, 1.0, 10.0, 10e3], help='Upper window edges [ns]')
+    opts = parser.parse_args()
+
+    scan = TimeScan.load(opts.input)
+    print('{0:30s} '.format('collection') + ' '.join('{0:>20s}'.format('T_MAX={0:g}'.format(t)) for t in opts.t_max))
+    for col_name in scan.collections:
+        n_hits, edep = scan.scan(opts.t_min, opts.t_max, col=col_name)
+        print('{0:30s} '.format(col_name) + ' '.join('{0:>9d} {1:>10.4g}'.format(n, e) for n, e in zip(n_hits, edep)))
@@ -0,0 +1,59 @@
+import ROOT as R
+
+COMPRESSION_ALGORITHMS = {'ZLIB': 1, 'LZMA': 2, 'LZ4': 4, 'ZSTD': 5}
+COMPRESSION = 'ZSTD:5'  # ALGORITHM:LEVEL
+AUTO_FLUSH_BYTES = 32 * 1024**2  # baskets are written to the file every ~32 MB of filled data
+AUTO_SAVE_BYTES = 256 * 1024**2  # the tree header is saved every ~256 MB, so a partial file stays readable
+BASKET_SIZE = 64 * 1024  # bytes per branch buffer
+
+def compression_settings(compression=COMPRESSION):
+    """ROOT compression settings (100 * algorithm + level) from 'ALGORITHM:LEVEL', e.g. 'LZ4:4'"""
+    algorithm, _, level = compression.partition(':')
+    if algorithm.upper() not in COMPRESSION_ALGORITHMS:
+        raise ValueError('Unknown compression algorithm {0:s}, use one of {1:s}'.format(
+            algorithm, ', '.join(COMPRESSION_ALGORITHMS)))
+    return 100 * COMPRESSION_ALGORITHMS[algorithm.upper()] + int(level or 5)
+
+class TreeOutput:
+    """TTree written to its output file while it is being filled
+
+    The file is opened up front, so memory use stays flat: baskets are flushed every
+    auto_flush bytes and the tree header is saved every auto_save bytes, which keeps
+    the output readable up to the last save if the job is interrupted.
+    Without an output path the tree is kept in memory.
+
+    Usage:
+        out = TreeOutput('hits.root', 'tree', 'SimTrackerHit properties', compression='LZ4:4')
+        out.branch('edep', edep_array, 'edep/F')
+        out.tree.Fill()
+        out.close()
+    """
+
+    def __init__(self, path, name='tree', title='', compression=COMPRESSION,
+                 auto_flush=AUTO_FLUSH_BYTES, auto_save=AUTO_SAVE_BYTES, basket_size=BASKET_SIZE):
+        self.path = path
+        self.basket_size = basket_size
+        self.file = None
+        if path is not None:
+            self.file = R.TFile(path, 'RECREATE')
+            if not self.file or self.file.IsZombie():
+                raise IOError('Cannot open output file {0:s}'.format(path))
+            self.file.SetCompressionSettings(compression_settings(compression))
+            self.file.cd()
+        self.tree = R.TTree(name, title)
+        if self.file is not None:
+            # Negative values are byte thresholds rather than entry counts
+            self.tree.SetAutoFlush(-int(auto_flush))
+            self.tree.SetAutoSave(-int(auto_save))
+
+    def branch(self, name, address, leaflist):
+        return self.tree.Branch(name, address, leaflist, self.basket_size)
+
+    def close(self):
+        """Writes the remaining baskets and the final tree header, and closes the file"""
+        if self.file is None:
+            return
+        self.file.cd()
+        self.tree.Write('', R.TObject.kOverwrite)
+        self.file.Close()
+        self.file = None
@@ -5,24 +5,18 @@ from pyLCIO.drivers.Driver import Driver
 from pyLCIO import EVENT, UTIL
 
 from pdb import set_trace
-from utils import get_oldest_mcp_parent
+from time_scan import TimeScan, time_scan_path
+from quantile_sketch import SketchSet, sketches_path
+from tree_output import TreeOutput
+from occupancy import OccupancySummary, OCCUPANCY_FIELDS, occupancy_path
+from cell_occupancy import CellOccupancy, cells_path
+from event_context import EventContext
 
 CONST_C = R.TMath.C()
 # T_MAX = 0.18 # ns
 T_MAX = 10e3 # ns
 T_MIN = -1.0 # ns
 
-def get_oldest_mcp_parent(mcp, nIters=0):
-    """Recursively looks for the oldest parent of the MCParticle"""
-    pars = mcp.getParents()
-    if (len(pars) < 1):
-        return mcp, nIters
-    for par in pars:
-        # Skipping if the particle is its own parent
-        if par is mcp:
-            continue
-        return get_oldest_mcp_parent(par, nIters+1)
-
 class TrkHitsMCPDriver( Driver ):
     """Driver creating histograms of detector hits and their corresponding MCParticles"""
 
@@ -31,15 +25,39 @@ class TrkHitsMCPDriver( Driver ):
     #                         'InnerTrackerBarrelCollection', 'InnerTrackerEndcapCollection',
     #                         'OuterTrackerBarrelCollection', 'OuterTrackerEndcapCollection']
 
-    def __init__( self, output_path=None):
-        """Constructor"""
+    MODES = ('tree', 'occupancy')
+
+    def __init__( self, output_path=None, mode='tree', context=None, **tree_options):
+        """Constructor
+
+        mode 'tree' stores every hit in the TTree, mode 'occupancy' only the per-module summary
+        context is an EventContext sharing derived products with other drivers, by default a private one
+        tree_options are passed to TreeOutput (compression, auto_flush, auto_save, basket_size)
+        """
         Driver.__init__(self)
+        if mode not in self.MODES:
+            raise ValueError('Unknown mode {0:s}, use one of {1:s}'.format(mode, ', '.join(self.MODES)))
         self.output_path = output_path
+        self.mode = mode
+        self.context = EventContext() if context is None else context
+        self.contextSequence = self.context.sequence
+        self.tree_options = tree_options
 
 
     def startOfData( self ):
         """Called by the event loop at the beginning of the loop"""
 
+        # Time distributions of all hits, before the T_MIN/T_MAX cut
+        self.time_scan = TimeScan(self.HIT_COLLECTION_NAMES)
+        # Percentiles of hit time and energy per collection and layer, in bounded memory
+        self.sketches = SketchSet(self.HIT_COLLECTION_NAMES)
+        if self.mode == 'occupancy':
+            # Hit counts and energy per module, without the per-hit tree
+            self.occupancy = OccupancySummary(self.HIT_COLLECTION_NAMES)
+            # Hit rates, energy and time moments per full CellID
+            self.cells = CellOccupancy(self.HIT_COLLECTION_NAMES)
+            return
+
         names_F = ['edep', 'time', 'time0', 'path_len',
                    'pos_r', 'pos_z', 'pos_x', 'pos_y',
                    'mcp_vtx_r', 'mcp_vtx_z', 'mcp_vtx_x', 'mcp_vtx_y',
@@ -51,34 +69,42 @@ class TrkHitsMCPDriver( Driver ):
                    ]
         names_I = ['layer', 'side', 'col_id',
                    'mcp_pdg', 'mcp_bib_pdg', 'mcp_bib_niters', 'mcp_gen', 'mcp_bib_gen']
-        # Creating the TTree with branches
+        # Creating the TTree with branches, written to the output file while filling
         self.data = {}
-        self.tree = R.TTree('tree', 'SimTrackerHit properties')
+        self.output = TreeOutput(self.output_path, 'tree', 'SimTrackerHit properties', **self.tree_options)
+        self.tree = self.output.tree
         for name in names_F:
             self.data[name] = np.zeros(1, dtype=np.float32)
-            self.tree.Branch(name, self.data[name], '{0:s}/F'.format(name))
+            self.output.branch(name, self.data[name], '{0:s}/F'.format(name))
         for name in names_I:
             self.data[name] = np.zeros(1, dtype=np.int32)
-            self.tree.Branch(name, self.data[name], '{0:s}/I'.format(name))
+            self.output.branch(name, self.data[name], '{0:s}/I'.format(name))
 
     def processEvent( self, event ):
         """Called by the event loop for each event"""
 
-        # Get the MCParticle collection from the event
-        mcParticles = event.getMcParticles()
+        # Starts the event in the context, unless EventContextDriver or another driver already did
+        self.contextSequence = self.context.join_event(event, self.contextSequence)
+        if self.mode == 'occupancy':
+            return self.processOccupancy(event)
+
+        # Get the MCParticle graph with all lineages resolved, shared by the drivers of the chain
+        mcpGraph = self.context.get('mcp_graph')
+        mcpAnc, mcpDepth = self.context.get('ancestry')
 
         # Loop over hits
         print('Event: {0:d}'.format(event.getEventNumber()))
+        nUnmatched = 0
         for iCol, col_name in enumerate(self.HIT_COLLECTION_NAMES):
             # print('Event: {0:d} Col: {1:s}'.format(event.getEventNumber(), col_name))
-            col = event.getCollection(col_name)
+            col = self.context.get('collection', col_name)
             # print('  N elements: {0:d}'.format(col.getNumberOfElements()))
-            # Creating the CellID decocder
-            cellIdEncoding = col.getParameters().getStringVal(EVENT.LCIO.CellIDEncoding)
-            cellIdDecoder = UTIL.BitField64(cellIdEncoding)
+            # CellID fields of all hits, decoded once per event
+            cellIdFields = self.context.get('decoded', col_name)
             # Filling the Tracker hit properties
             data = self.data
             nHits = col.getNumberOfElements()
+            scan = {'layer': [], 'side': [], 'dt': [], 'edep': []}
             # print('Checking {1:d} hits from: {0:s}'.format(col_name, nHits))
             for iHit in range(nHits):
                 # if iHit % int(nHits/10) == 0:
@@ -89,19 +115,22 @@ class TrkHitsMCPDriver( Driver ):
                 pos = hit.getPositionVec()
                 t0 = pos.Mag() / (CONST_C / 1e6)
                 data['time0'][0] = t0
+                # Decoded CellID
+                data['col_id'][0] = iCol
+                data['side'][0] = cellIdFields['side'][iHit]
+                data['layer'][0] = cellIdFields['layer'][iHit]
+                data['edep'][0] = hit.getEDep()
+                # Recording every hit for the time scan
+                scan['layer'].append(data['layer'][0])
+                scan['side'].append(data['side'][0])
+                scan['dt'].append(data['time'][0] - t0)
+                scan['edep'].append(data['edep'][0])
                 # Skipping hits outside of the time window
                 if (data['time'][0] - t0) > T_MAX:
                     continue
                 if (data['time'][0] - t0) < T_MIN:
                     continue
-                # Decoding the CellID
-                cellId = int(hit.getCellID0() & 0xffffffff) | (int( hit.getCellID1() ) << 32)
-                cellIdDecoder.setValue(cellId)
-                data['col_id'][0] = iCol
-                data['side'][0] = int(cellIdDecoder['side'].value())
-                data['layer'][0] = int(cellIdDecoder['layer'].value())
                 # Hit general properties
-                data['edep'][0] = hit.getEDep()
                 data['path_len'][0] = hit.getPathLength()
                 data['pos_x'][0] = pos.X()
                 data['pos_y'][0] = pos.Y()
@@ -109,7 +138,12 @@ class TrkHitsMCPDriver( Driver ):
                 data['pos_r'][0] = pos.Perp()
                 # MCParticle properties
                 mcp = hit.getMCParticle()
-                mcp_bib, mcp_bib_niters = get_oldest_mcp_parent(mcp)
+                iMcp = mcpGraph.index_of(mcp, -1) if mcp else -1
+                # Skipping hits whose particle is not in the MCParticle collection
+                if iMcp < 0:
+                    nUnmatched += 1
+                    continue
+                mcp_bib, mcp_bib_niters = mcpGraph.particles[mcpAnc[iMcp]], int(mcpDepth[iMcp])
                 data['mcp_bib_niters'][0] = mcp_bib_niters
                 for prefix, part in {'mcp': mcp, 'mcp_bib': mcp_bib}.items():
                     pos = part.getVertex()
@@ -129,14 +163,45 @@ class TrkHitsMCPDriver( Driver ):
                     data[prefix+'_beta'][0] = lv.Beta()
                     data[prefix+'_gamma'][0] = lv.Gamma()
                 self.tree.Fill()
+            self.time_scan.fill(iCol, scan['layer'], scan['side'], scan['dt'], scan['edep'])
+            self.sketches.fill(iCol, scan['layer'], scan['dt'], scan['edep'])
 
         print('  Tree has {0:d} hits'.format(self.tree.GetEntries()))
+        if nUnmatched:
+            print('  Skipped {0:d} hits with no particle in the MCParticle collection'.format(nUnmatched))
+
+    def processOccupancy( self, event ):
+        """Aggregates hits per (collection, side, layer, module) with array operations, skipping MCParticles"""
+
+        print('Event: {0:d}'.format(event.getEventNumber()))
+        self.occupancy.begin_event(event.getEventNumber())
+        self.cells.begin_event()
+        for iCol, col_name in enumerate(self.HIT_COLLECTION_NAMES):
+            decoder = self.context.get('decoder', col_name)
+            cellIds = self.context.get('cellids', col_name)
+            # Fields missing from the encoding count as 0, as in OccupancySummary.add
+            decoded = self.context.get('decoded', col_name)
+            fields = {name: decoded.get(name, np.zeros(len(cellIds), dtype=np.int64)) for name in OCCUPANCY_FIELDS}
+            hits = self.context.get('hit_arrays', col_name)
+            pos = hits['pos']
+            edep, dt = hits['edep'], hits['dt']
+            self.time_scan.fill(iCol, fields['layer'], fields['side'], dt, edep)
+            self.sketches.fill(iCol, fields['layer'], dt, edep)
+            # Same time window as for the tree
+            sel = (dt >= T_MIN) & (dt <= T_MAX)
+            self.occupancy.add(iCol, {name: values[sel] for name, values in fields.items()}, edep[sel])
+            self.cells.add(iCol, cellIds[sel], edep[sel], dt[sel], pos[sel], decoder.encoding)
 
     def endOfData( self ):
         """Called by the event loop at the end of the loop"""
 
-        # Storing histograms to the output ROOT file
+        if self.mode == 'occupancy':
+            if self.output_path is not None:
+                self.occupancy.save(occupancy_path(self.output_path))
+                self.cells.save(cells_path(self.output_path))
+        else:
+            # Closing the output ROOT file with the last baskets of the tree
+            self.output.close()
         if self.output_path is not None:
-            out_file = R.TFile(self.output_path, 'RECREATE')
-            self.tree.Write()
-            out_file.Close()
+            self.time_scan.save(time_scan_path(self.output_path))
+            self.sketches.save(sketches_path(self.output_path))
@@ -1,26 +1,53 @@
 import argparse
+import importlib
+import os
+import sys
+
+# Available drivers: name -> (module in drivers/, class)
+DRIVERS = {
+	'trk': ('trk_hits_mcp', 'TrkHitsMCPDriver'),
+	'cal': ('cal_hits_mcp', 'CalHitsMCPDriver'),
+}
 
 parser = argparse.ArgumentParser(description='Process hits from a file')
 parser.add_argument('input', metavar='input.slcio', type=str, help='List of input LCIO files', nargs="+")
 parser.add_argument('-m', '--max_events', metavar='N', type=int, help='Maximum number of events to process', default=-1)
-parser.add_argument('-o', dest='output', metavar='OUT.root', type=str, help='Path to the output ROOT file')
+parser.add_argument('-o', dest='output', metavar='OUT.root', type=str, help='Path to the output ROOT file (OUT_<driver>.root with several drivers)')
+parser.add_argument('-d', '--drivers', metavar='NAME', type=str, nargs='+', choices=sorted(DRIVERS), help='Drivers run in one pass over the events: trk, cal (default: cal)', default=['cal'])
 parser.add_argument('-s', '--skip_events', metavar='N', type=int, help='Number of events to skip', default=0)
+parser.add_argument('-e', '--events', metavar='N', type=int, nargs='+', help='Process only these event numbers (indexed random access)', default=None)
+parser.add_argument('--shard', metavar='I/N', type=str, help='Process only shard I of N (indexed random access)', default=None)
+parser.add_argument('--mode', type=str, choices=['tree', 'occupancy'], help='Store every hit in a TTree, or only hit counts and energy per module and per cell (default: tree)', default='tree')
+parser.add_argument('--compression', metavar='ALG:LEVEL', type=str, help='Output compression: ZLIB, LZMA, LZ4 or ZSTD with level (default: ZSTD:5)', default=None)
+parser.add_argument('--basket-size', metavar='BYTES', type=int, help='TTree basket size per branch', default=None)
+parser.add_argument('--auto-flush-mb', metavar='MB', type=float, help='Write baskets to the file every MB of filled data', default=None)
+parser.add_argument('--auto-save-mb', metavar='MB', type=float, help='Save the tree header every MB, for readable partial output', default=None)
 
 opts = parser.parse_args()
+if opts.skip_events and (opts.events or opts.shard):
+	parser.error('-s/--skip_events cannot be combined with --events or --shard')
 
 from pyLCIO.io.EventLoop import EventLoop
 
-#################################
-# Importing the analysis driver #
-#################################
+##################################
+# Importing the analysis drivers #
+##################################
+
+# The driver modules import each other by module name
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'drivers'))
+from event_context import EventContext, EventContextDriver
 
-# from drivers.trk_hits_mcp import TrkHitsMCPDriver as TheDriver
-from drivers.cal_hits_mcp import CalHitsMCPDriver as TheDriver
+def driver_output(output, name):
+	"""Output path of one driver: OUT.root with a single driver, OUT_<name>.root in a chain"""
+	if output is None or len(opts.drivers) == 1:
+		return output
+	base, ext = os.path.splitext(output)
+	return '{0:s}_{1:s}{2:s}'.format(base, name, ext or '.root')
 
 
-########################################
-# Running the driver over input events #
-########################################
+#########################################
+# Running the drivers over input events #
+#########################################
 
 print('### Starting analysis with {0:d} input files:'.format(len(opts.input)))
 
@@ -28,20 +55,66 @@ evLoop = EventLoop()
 for infile in opts.input:
     print('  {0:s}'.format(infile))
     evLoop.addFile(infile)
-print('### Will store output in: {0:s}'.format(opts.output))
 nEvents = evLoop.reader.getNumberOfEvents()
 print('### Total number of events in the files: {0:d}'.format(nEvents))
-driver = TheDriver(opts.output)
-evLoop.add(driver)
+tree_options = {}
+if opts.compression:
+	tree_options['compression'] = opts.compression
+if opts.basket_size:
+	tree_options['basket_size'] = opts.basket_size
+if opts.auto_flush_mb:
+	tree_options['auto_flush'] = int(opts.auto_flush_mb * 1024**2)
+if opts.auto_save_mb:
+	tree_options['auto_save'] = int(opts.auto_save_mb * 1024**2)
+# Products derived from each event (MCParticle lineages, decoded CellIDs) are shared by all drivers
+context = EventContext()
+drivers = [EventContextDriver(context)]
+for name in opts.drivers:
+	module, cls = DRIVERS[name]
+	TheDriver = getattr(importlib.import_module(module), cls)
+	output = driver_output(opts.output, name)
+	print('### Will store {1:s} output of {2:s} in: {0:s}'.format(str(output), opts.mode, cls))
+	drivers.append(TheDriver(output, mode=opts.mode, context=context, **tree_options))
+for driver in drivers:
+	evLoop.add(driver)
 
 if opts.max_events > 0:
 	nEvents = opts.max_events
 
-print('### Starting the loop over {0:d} events'.format(nEvents))
-if opts.skip_events:
-	print('### Skipping {0:d} events'.format(opts.skip_events))
-	evLoop.skipEvents(opts.skip_events)
-evLoop.loop(nEvents)
-evLoop.printStatistics()
-git 
+if opts.events or opts.shard:
+	# Random access through the event index sidecars instead of skipping sequentially
+	from slcio_index import IndexedReader
+	i_shard, n_shards = map(int, opts.shard.split('/')) if opts.shard else (0, 1)
+	for driver in drivers:
+		driver.startOfData()
+	nProcessed = 0
+	eventsFound = set()
+	for infile in opts.input:
+		with IndexedReader(infile) as reader:
+			if opts.events:
+				fileEvents = set(reader.index.events.tolist())
+				requested = [e for e in opts.events if e in fileEvents]
+				eventsFound.update(requested)
+				events = reader.get_many(requested)
+			else:
+				events = reader.shard(i_shard, n_shards)
+			for event in events:
+				if nProcessed >= nEvents:
+					break
+				for driver in drivers:
+					driver.processEvent(event)
+				nProcessed += 1
+	for driver in drivers:
+		driver.endOfData()
+	print('### Processed {0:d} events'.format(nProcessed))
+	eventsMissing = sorted(set(opts.events or []) - eventsFound)
+	if eventsMissing:
+		print('### WARNING: requested events not found in any input file: {0:s}'.format(' '.join(map(str, eventsMissing))))
+else:
+	print('### Starting the loop over {0:d} events'.format(nEvents))
+	if opts.skip_events:
+		print('### Skipping {0:d} events'.format(opts.skip_events))
+		evLoop.skipEvents(opts.skip_events)
+	evLoop.loop(nEvents)
+	evLoop.printStatistics()
 print('### Finished')
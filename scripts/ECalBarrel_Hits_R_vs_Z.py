@@ -1,7 +1,8 @@
 import pyLCIO
 import ROOT
 import glob
-import math
+import numpy as np
+from histograms import Hist
 
 # Set up some options
 max_events = -1
@@ -11,7 +12,7 @@ fnames = glob.glob("/scratch/devlinjenkins/work/reconstruction/Output_REC.000.sl
 
 # Set up histograms
 hists = {}                                                                          
-hists["ECalBarrel_Hits_R_vs_Z"] = ROOT.TH2F("ECalBarrel_Hits_R_vs_Z", "ECalBarrel_Hits_R_vs_Z", 150, 1450, 1900, 150, 0, 2500)
+hists["ECalBarrel_Hits_R_vs_Z"] = Hist((150, 1450, 1900), (150, 0, 2500), name="ECalBarrel_Hits_R_vs_Z", title="ECalBarrel_Hits_R_vs_Z")
                                                                                 #change according to data
 
 # Loop over events
@@ -27,22 +28,22 @@ for f in fnames:
             print("Processing event %i."%i)
 
         # Get the collections we care about
-            collection = event.getCollection("ECalBarrelCollection")
+        collection = event.getCollection("ECalBarrelCollection")
 
         # Loop over the hits and fill histograms
-        for hit in collection:                                                  #loop
-            energy = hit.getEnergy()                                            #get data we care about from collection
-            position = hit.getPosition()                                               
-            x, y, z = position[0], position[1], position[2]                     #given coords
-            radius = math.sqrt(x**2 + y**2)                                      
-            hists["ECalBarrel_Hits_R_vs_Z"].Fill(radius, z, energy)             #fill (x, y, weight)
+        energy = np.array([hit.getEnergy() for hit in collection])              #get data we care about from collection
+        position = np.array([[hit.getPosition()[k] for k in range(3)] for hit in collection]).reshape(-1, 3)
+        x, y, z = position.T                                                    #given coords
+        radius = np.sqrt(x**2 + y**2)
+        hists["ECalBarrel_Hits_R_vs_Z"].fill(radius, z, weights=energy)         #fill all hits at once (x, y, weight)
 
         i+= 1
 
 # Make your plots
 for i, h in enumerate(hists):
     c = ROOT.TCanvas("c%i"%i, "c%i"%i)
-    hists[h].SetXTitle("R [cm]")                                                     #x axis label
-    hists[h].SetYTitle("Z [cm]")                                                     #y axis label
-    hists[h].Draw("COLZ")                                                    
+    th = hists[h].to_root()                                                          #ROOT only for drawing
+    th.SetXTitle("R [cm]")                                                           #x axis label
+    th.SetYTitle("Z [cm]")                                                           #y axis label
+    th.Draw("COLZ")                                                    
     c.SaveAs("%s.png"%h)
\ No newline at end of file
@@ -2,6 +2,8 @@ import pyLCIO
 import ROOT
 import glob
 import math
+import numpy as np
+from histograms import Hist
 
 # Set up some options
 max_events = -1
@@ -11,7 +13,7 @@ fnames = glob.glob("/work/devlinjenkins/MuC-Tutorial/reconstruction/Output_REC.0
 
 # Set up histograms
 hists = {}                                                                          
-hists["ECalBarrel Hits Theta vs Phi"] = ROOT.TH2F("ECalBarrel Hits Theta vs Phi", "ECalBarrel Hits Theta vs Phi", 100, -math.pi, math.pi, 100, -math.pi, math.pi)
+hists["ECalBarrel Hits Theta vs Phi"] = Hist((100, -math.pi, math.pi), (100, -math.pi, math.pi), name="ECalBarrel Hits Theta vs Phi", title="ECalBarrel Hits Theta vs Phi")
                                                                                          #change according to data
 
 # Loop over events
@@ -27,24 +29,24 @@ for f in fnames:
             print("Processing event %i."%i)
 
         # Get the collections we care about
-            ECalbarrel_collection = event.getCollection("ECalBarrelCollection")
+        ECalbarrel_collection = event.getCollection("ECalBarrelCollection")
 
         # Loop over the hits and fill histograms
-        for hit in ECalbarrel_collection:                                                  #loop
-            energy = hit.getEnergy()                                            #get data we care about from collection
-            position = hit.getPosition()                                               
-            x, y, z = position[0], position[1], position[2]                     #given coords
-            radius = math.sqrt(x**2 + y**2 + z**2)        
-            theta = math.acos(z/radius)                                         #calc theta
-            phi = math.atan2(y,x)                                               #calc phi
-            hists["ECalBarrel Hits Theta vs Phi"].Fill(theta, phi, energy)            #fill (x, y, weight)
+        energy = np.array([hit.getEnergy() for hit in ECalbarrel_collection])              #get data we care about from collection
+        position = np.array([[hit.getPosition()[k] for k in range(3)] for hit in ECalbarrel_collection]).reshape(-1, 3)
+        x, y, z = position.T                                                    #given coords
+        radius = np.sqrt(x**2 + y**2 + z**2)
+        theta = np.arccos(z/radius)                                             #calc theta
+        phi = np.arctan2(y,x)                                                   #calc phi
+        hists["ECalBarrel Hits Theta vs Phi"].fill(theta, phi, weights=energy)            #fill all hits at once (x, y, weight)
 
         i+= 1
 
 # Make your plots
 for i, h in enumerate(hists):
     c = ROOT.TCanvas("c%i"%i, "c%i"%i)
-    hists[h].SetXTitle("Theta [rads]")                                          #y axis label
-    hists[h].SetYTitle("Phi [rads]")                                            #y axis label
-    hists[h].Draw("COLZ")                                                       #"COLZ" gives color *must use*
+    th = hists[h].to_root()                                                     #ROOT only for drawing
+    th.SetXTitle("Theta [rads]")                                                #y axis label
+    th.SetYTitle("Phi [rads]")                                                  #y axis label
+    th.Draw("COLZ")                                                             #"COLZ" gives color *must use*
     c.SaveAs("%s.png"%h)
\ No newline at end of file
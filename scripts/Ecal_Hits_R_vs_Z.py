@@ -1,7 +1,8 @@
 import pyLCIO
 import ROOT
 import glob
-import math
+import numpy as np
+from histograms import Hist
 
 # Set up some options
 max_events = -1
@@ -11,7 +12,7 @@ fnames = glob.glob("/scratch/devlinjenkins/work/reconstruction/Output_REC.000.sl
 
 # Set up histograms
 hists = {}                                                                          
-hists["ECal Hits Z vs Radius"] = ROOT.TH2F("ECal Hits Z vs Radius", "ECal Hits Z vs Radius", 150, -3500, 3500, 150, 0, 2500)
+hists["ECal Hits Z vs Radius"] = Hist((150, -3500, 3500), (150, 0, 2500), name="ECal Hits Z vs Radius", title="ECal Hits Z vs Radius")
                                                                                 #change according to data
 
 # Loop over events
@@ -32,21 +33,19 @@ for f in fnames:
             
 
         # Loop over the hits and fill histograms
-        for hit in ECalbarrel_collection:                                       #loop
-            energy = hit.getEnergy()                                            #get data we care about from collection
-            position = hit.getPosition()                                               
-            x, y, z = position[0], position[1], position[2]                     #given coords
-            radius = math.sqrt(x**2 + y**2)                                     #calc radius     
-            hists["ECal Hits Z vs Radius"].Fill(z, radius, energy)              #fill (x, y, weight)
+        energy = np.array([hit.getEnergy() for hit in ECalbarrel_collection])              #get data we care about from collection
+        position = np.array([[hit.getPosition()[k] for k in range(3)] for hit in ECalbarrel_collection]).reshape(-1, 3)
+        x, y, z = position.T                                                    #given coords
+        radius = np.sqrt(x**2 + y**2)                                           #calc radius
+        hists["ECal Hits Z vs Radius"].fill(z, radius, weights=energy)          #fill all hits at once (x, y, weight)
 
         i+= 1
 
-        for hit in ECalEndcap_collection:                                       #loop
-            energy = hit.getEnergy()                                            #get data we care about from collection
-            position = hit.getPosition()                                               
-            x, y, z = position[0], position[1], position[2]                     #given coords
-            radius = math.sqrt(x**2 + y**2)                                     #calc radius
-            hists["ECal Hits Z vs Radius"].Fill(z, radius, energy)              #fill (x, y, weight)
+        energy = np.array([hit.getEnergy() for hit in ECalEndcap_collection])              #get data we care about from collection
+        position = np.array([[hit.getPosition()[k] for k in range(3)] for hit in ECalEndcap_collection]).reshape(-1, 3)
+        x, y, z = position.T                                                    #given coords
+        radius = np.sqrt(x**2 + y**2)                                           #calc radius
+        hists["ECal Hits Z vs Radius"].fill(z, radius, weights=energy)          #fill all hits at once (x, y, weight)
 
         i+= 1
 
@@ -56,8 +55,9 @@ ROOT.gStyle.SetOptStat(0)
 for i, h in enumerate(hists):
     c = ROOT.TCanvas("c%i"%i, "c%i"%i)
     c.SetRightMargin(0.15)                                                      #Increase the right margin
-    hists[h].SetXTitle("Z (mm)")                                                #y axis label
-    hists[h].SetYTitle("R (mm)")                                                #y axis label
-    hists[h].SetZTitle("Energy (GeV)")                                          #z axis label
-    hists[h].Draw("COLZ")                                                       #"COLZ" gives color *must use*
+    th = hists[h].to_root()                                                     #ROOT only for drawing
+    th.SetXTitle("Z (mm)")                                                      #y axis label
+    th.SetYTitle("R (mm)")                                                      #y axis label
+    th.SetZTitle("Energy (GeV)")                                                #z axis label
+    th.Draw("COLZ")                                                             #"COLZ" gives color *must use*
     c.SaveAs("%s.png"%h)
\ No newline at end of file
@@ -2,6 +2,8 @@ import pyLCIO
 import ROOT
 import glob
 import math
+import numpy as np
+from histograms import Hist
 
 # Set up some options
 max_events = -1
@@ -81,7 +83,7 @@ colors = [ROOT.kRed, ROOT.kGreen+1, ROOT.kBlue+1]
 # Loop over files to create histograms
 for idx, f in enumerate(fnames):
     hist_name = f"MCParticle_Pos_Theta_{idx}"
-    hists[hist_name] = ROOT.TH1F(hist_name, "", 50, 0, math.pi)  # No title here
+    hists[hist_name] = Hist((50, 0, math.pi), name=hist_name)  # No title here
 
 # Loop over events
 event_count = 0
@@ -99,22 +101,20 @@ for idx, f in enumerate(fnames):
         collection = event.getCollection("MCParticle")
 
         # Loop over the hits and fill histograms
-        for p in collection:
-            vertex = p.getVertex()
-            x, y, z = vertex[0], vertex[1], vertex[2]
-            radius = math.sqrt(x**2 + y**2 + z**2)
+        vertex = np.array([[p.getVertex()[k] for k in range(3)] for p in collection]).reshape(-1, 3)
+        radius = np.linalg.norm(vertex, axis=1)
 
-            # Check if radius is not zero to avoid division by zero
-            if radius != 0:
-                theta = math.acos(z / radius)
-                hist_name = f"MCParticle_Pos_Theta_{idx}"
-                hists[hist_name].Fill(theta)
+        # Skip vertices at the origin to avoid division by zero
+        nonzero = radius != 0
+        theta = np.arccos(vertex[nonzero, 2] / radius[nonzero])
+        hists[f"MCParticle_Pos_Theta_{idx}"].fill(theta)
 
         event_count += 1
 
     reader.close()
 
 # Make your plots
+root_hists = {name: h.to_root() for name, h in hists.items()}  # ROOT only for drawing
 ROOT.gStyle.SetOptStat(0)
 c = ROOT.TCanvas("c", "c", 2000, 1600)  # 1x1 pixels canvas
 
@@ -129,18 +129,18 @@ c.SetLogy()
 
 # Draw histograms with different colors
 legend = ROOT.TLegend(0.7, 0.7, 0.9, 0.9)
-for idx, hist_name in enumerate(hists):
-    hists[hist_name].SetLineColor(colors[idx % len(colors)])
-    hists[hist_name].SetMinimum(1)    # Set minimum value for y-axis
-    hists[hist_name].SetMaximum(1e8)  # Set maximum value for y-axis
-    hists[hist_name].SetLineWidth(2)  # Set line width
-    hists[hist_name].SetXTitle("MCParticle Prod Pos #theta [rad]")  # x-axis title
+for idx, hist_name in enumerate(root_hists):
+    root_hists[hist_name].SetLineColor(colors[idx % len(colors)])
+    root_hists[hist_name].SetMinimum(1)    # Set minimum value for y-axis
+    root_hists[hist_name].SetMaximum(1e8)  # Set maximum value for y-axis
+    root_hists[hist_name].SetLineWidth(2)  # Set line width
+    root_hists[hist_name].SetXTitle("MCParticle Prod Pos #theta [rad]")  # x-axis title
 
     if idx == 0:
-        hists[hist_name].Draw()
+        root_hists[hist_name].Draw()
     else:
-        hists[hist_name].Draw("SAME")
-    legend.AddEntry(hists[hist_name], descriptive_names[idx], "l")
+        root_hists[hist_name].Draw("SAME")
+    legend.AddEntry(root_hists[hist_name], descriptive_names[idx], "l")
 
 legend.Draw()
 
@@ -2,30 +2,38 @@ import pyLCIO
 import ROOT
 import glob
 import math
+import numpy as np
 import os
 
+from histograms import Hist
+from variant_catalog import open_catalog
+
 # Set up some options
 max_events = -1
 
-# Gather input files
-fnames = [
-    "/home/devlinjenkins/projects/NozzleSimOpti/simulation/geometries/MAIA_v0/mumu_H_bb_100E_MAIA.slcio",
-    "/home/devlinjenkins/projects/NozzleSimOpti/simulation/geometries/MAIA_v0_Blackhole/nozzle_variants_v2/nozzle_z10p5176_rmaxMinus0/mumu_H_bb_100E_MAIA_nozzle_z10p5176_rmaxMinus0.slcio",
-    "/home/devlinjenkins/projects/NozzleSimOpti/simulation/geometries/MAIA_v0_Blackhole/nozzle_variants_v2/nozzle_z10p5176_rmaxMinus0p6/mumu_H_bb_100E_MAIA_nozzle_z10p5176_rmaxMinus0p6.slcio",
-    "/home/devlinjenkins/projects/NozzleSimOpti/simulation/geometries/MAIA_v0_Blackhole/nozzle_variants_v2/nozzle_z10p5176_rmaxMinus0p11/mumu_H_bb_100E_MAIA_nozzle_z10p5176_rmaxMinus0p11.slcio",
-    "/home/devlinjenkins/projects/NozzleSimOpti/simulation/geometries/MAIA_v0_Blackhole/nozzle_variants_v2/nozzle_z10p5176_rmaxMinus0p16/mumu_H_bb_100E_MAIA_nozzle_z10p5176_rmaxMinus0p16.slcio",
-    "/home/devlinjenkins/projects/NozzleSimOpti/simulation/geometries/MAIA_v0_Blackhole/nozzle_variants_v2/nozzle_z10p5176_rmaxMinus0p21/mumu_H_bb_100E_MAIA_nozzle_z10p5176_rmaxMinus0p21.slcio",
-]
+# Gather input files: the geometry without blackhole, then the simulated variants of the sweep
+# from its catalog (built on first use, see variant_catalog.py)
+BASELINE_FILE = "/home/devlinjenkins/projects/NozzleSimOpti/simulation/geometries/MAIA_v0/mumu_H_bb_100E_MAIA.slcio"
+SWEEP_DIR = "/home/devlinjenkins/projects/NozzleSimOpti/simulation/geometries/MAIA_v0_Blackhole/nozzle_variants_v2"
+
+# Legend labels of the variants, by variant name
+VARIANT_LABELS = {
+    "nozzle_z10p5176_rmaxMinus0": "SD=1cm",
+    "nozzle_z10p5176_rmaxMinus0p6": "SD=6cm",
+    "nozzle_z10p5176_rmaxMinus0p11": "SD=11cm",
+    "nozzle_z10p5176_rmaxMinus0p16": "SD=16cm",
+    "nozzle_z10p5176_rmaxMinus0p21": "SD=21cm",
+}
+
+catalog = open_catalog(SWEEP_DIR)
+variants = catalog.query(z_start=10.5176, existing="slcio")
+# Legend order of VARIANT_LABELS (the catalog has no reduction for these legacy names)
+variants.sort(key=lambda v: list(VARIANT_LABELS).index(v["name"]) if v["name"] in VARIANT_LABELS else len(VARIANT_LABELS))
+
+fnames = [BASELINE_FILE] + [str(v["slcio"]) for v in variants]
 
 # Short labels for legend
-short_labels = [
-    "No BH",
-    "SD=1cm",
-    "SD=6cm",
-    "SD=11cm",
-    "SD=16cm",
-    "SD=21cm",
-]
+short_labels = ["No BH"] + [VARIANT_LABELS.get(v["name"], v["name"]) for v in variants]
 
 # Define improved colors for higher contrast and distinguishability
 colors = [
@@ -43,7 +51,7 @@ hists = {}
 # Loop over files to create histograms
 for idx, f in enumerate(fnames):
     hist_name = f"MCParticle_Pos_Theta_{idx}"
-    hists[hist_name] = ROOT.TH1F(hist_name, "", 50, 0, math.pi)
+    hists[hist_name] = Hist((50, 0, math.pi), name=hist_name)
 
 # Check which files exist
 print("\nChecking file existence:")
@@ -76,16 +84,13 @@ for idx in existing_files:
                 collection = event.getCollection("MCParticle")
 
                 # Loop over the hits and fill histograms
-                for p in collection:
-                    vertex = p.getVertex()
-                    x, y, z = vertex[0], vertex[1], vertex[2]
-                    radius = math.sqrt(x**2 + y**2 + z**2)
+                vertex = np.array([[p.getVertex()[k] for k in range(3)] for p in collection]).reshape(-1, 3)
+                radius = np.linalg.norm(vertex, axis=1)
 
-                    # Check if radius is not zero to avoid division by zero
-                    if radius != 0:
-                        theta = math.acos(z / radius)
-                        hist_name = f"MCParticle_Pos_Theta_{idx}"
-                        hists[hist_name].Fill(theta)
+                # Skip vertices at the origin to avoid division by zero
+                nonzero = radius != 0
+                theta = np.arccos(vertex[nonzero, 2] / radius[nonzero])
+                hists[f"MCParticle_Pos_Theta_{idx}"].fill(theta)
 
             except Exception as e:
                 if event_count == 0:  # Only print once
@@ -94,13 +99,14 @@ for idx in existing_files:
             event_count += 1
 
         reader.close()
-        print(f"  Processed {event_count} events, {int(hists[f'MCParticle_Pos_Theta_{idx}'].GetEntries())} particles")
+        print(f"  Processed {event_count} events, {hists[f'MCParticle_Pos_Theta_{idx}'].entries} particles")
         
     except Exception as e:
         print(f"Error processing file {short_labels[idx]}: {e}")
         continue
 
 # Make your plots
+root_hists = {name: h.to_root() for name, h in hists.items()}  # ROOT only for drawing
 ROOT.gStyle.SetOptStat(0)
 
 c1 = ROOT.TCanvas("c1", "c1", 3200, 1600)
@@ -116,32 +122,32 @@ for idx in existing_files:
     hist_name = f"MCParticle_Pos_Theta_{idx}"
     
     # Skip empty histograms
-    if hists[hist_name].GetEntries() == 0:
+    if root_hists[hist_name].GetEntries() == 0:
         print(f"Skipping empty histogram: {short_labels[idx]}")
         continue
     
     # Set color
-    hists[hist_name].SetLineColor(colors[idx])
+    root_hists[hist_name].SetLineColor(colors[idx % len(colors)])
     
     # Set solid line style for all
-    hists[hist_name].SetLineStyle(1)
-    hists[hist_name].SetLineWidth(3 if idx == 0 else 2)
+    root_hists[hist_name].SetLineStyle(1)
+    root_hists[hist_name].SetLineWidth(3 if idx == 0 else 2)
     
     # Set axis properties
-    hists[hist_name].SetMinimum(1)
-    hists[hist_name].SetMaximum(1e8)
-    hists[hist_name].SetXTitle("MCParticle Prod Pos #theta [rad]")
-    hists[hist_name].GetXaxis().SetTitleSize(0.04)
-    hists[hist_name].GetXaxis().SetLabelSize(0.035)
-    hists[hist_name].GetYaxis().SetTitle("Counts")
-    hists[hist_name].GetYaxis().SetTitleSize(0.04)
-    hists[hist_name].GetYaxis().SetLabelSize(0.035)
+    root_hists[hist_name].SetMinimum(1)
+    root_hists[hist_name].SetMaximum(1e8)
+    root_hists[hist_name].SetXTitle("MCParticle Prod Pos #theta [rad]")
+    root_hists[hist_name].GetXaxis().SetTitleSize(0.04)
+    root_hists[hist_name].GetXaxis().SetLabelSize(0.035)
+    root_hists[hist_name].GetYaxis().SetTitle("Counts")
+    root_hists[hist_name].GetYaxis().SetTitleSize(0.04)
+    root_hists[hist_name].GetYaxis().SetLabelSize(0.035)
     
     if not first_drawn:
-        hists[hist_name].Draw("HIST")
+        root_hists[hist_name].Draw("HIST")
         first_drawn = True
     else:
-        hists[hist_name].Draw("HIST SAME")
+        root_hists[hist_name].Draw("HIST SAME")
 
 legend = ROOT.TLegend(0.75, 0.15, 0.985, 0.88)
 legend.SetBorderSize(1)
@@ -155,8 +161,8 @@ legend.SetHeader("Configuration", "C")
 # Add entries for existing files with data
 for idx in existing_files:
     hist_name = f"MCParticle_Pos_Theta_{idx}"
-    if hists[hist_name].GetEntries() > 0:
-        legend.AddEntry(hists[hist_name], short_labels[idx], "l")
+    if root_hists[hist_name].GetEntries() > 0:
+        legend.AddEntry(root_hists[hist_name], short_labels[idx], "l")
 
 legend.Draw()
 
@@ -1,7 +1,8 @@
 import pyLCIO
 import ROOT
 import glob
-import math
+import numpy as np
+from histograms import SparseHist2D, save_hists
 
 # Set up some options
 max_events = -1
@@ -9,9 +10,14 @@ max_events = -1
 # Gather input files
 fnames = glob.glob("/home/devlinjenkins/projects/NozzleSimOpti/simulation/geometries/MAIA_v0_Blackhole/nozzle_varients/nozzle_z10.5176_rmaxMinus10/mumu_H_bb_100E_MAIA_nozzle_z10.5176_rmaxMinus10.slcio")
 
+# Binning of the plots, (lo, hi, bin width) in mm; all are derived from one fine sparse map per histogram
+fine_bin = 0.1                                      # stored resolution [mm], only occupied bins are kept
+full_view = ((-2600, 2600, 104), (0, 400, 8))       # the 50 x 50 overview
+nozzle_view = ((60, 260, 0.5), (0, 100, 0.5))       # first 20 cm of the +z nozzle, from its tip (Nozzle_zmin = 6 cm)
+
 # Set up histograms
 hists = {}
-hists["MCParticle_VertexMap_R_vs_Z_MAIA"] = ROOT.TH2F("MCParticle_VertexMap_R_vs_Z_MAIA", "MCParticle Vertex Map R vs Z of Default MAIA Geometry", 50, -2600, 2600, 50, 0, 400)
+hists["MCParticle_VertexMap_R_vs_Z_MAIA"] = SparseHist2D(fine_bin, fine_bin, name="MCParticle_VertexMap_R_vs_Z_MAIA", title="MCParticle Vertex Map R vs Z of Default MAIA Geometry")
 
 # Loop over events
 event_count = 0
@@ -29,19 +35,22 @@ for f in fnames:
         collection = event.getCollection("MCParticle")
 
         # Loop over the hits and fill histograms
-        for p in collection:
-            vertex = p.getVertex()
-            x, y, z = vertex[0], vertex[1], vertex[2]
-            radius = math.sqrt(x**2 + y**2)
-            hists["MCParticle_VertexMap_R_vs_Z_MAIA"].Fill(z, radius)
+        vertex = np.array([[p.getVertex()[k] for k in range(3)] for p in collection]).reshape(-1, 3)
+        x, y, z = vertex.T
+        radius = np.sqrt(x**2 + y**2)
+        hists["MCParticle_VertexMap_R_vs_Z_MAIA"].fill(z, radius)
 
         event_count += 1
 
     reader.close()
 
+# Keep the fine maps: other zooms and binnings can be made from the .npz without re-reading the files
+save_hists(hists, "MCParticle_VertexMap_R_vs_Z.npz")
+
 # Make your plots
 ROOT.gStyle.SetOptStat(0)
-for i, h in enumerate(hists):
+views = [(h, full_view, "") for h in hists] + [(h, nozzle_view, "_NozzleTip") for h in hists]
+for i, (h, ((zlo, zhi, zbin), (rlo, rhi, rbin)), suffix) in enumerate(views):
     c = ROOT.TCanvas("c%i" % i, "c%i" % i, 2800, 1600)  # Wider canvas
 
     # Set margins to leave space for axis titles
@@ -51,12 +60,14 @@ for i, h in enumerate(hists):
     c.SetTopMargin(0.1)  # % of the canvas height
 
     # Hist formatting
-    entries = hists[h].GetEntries()
-    hists[h].SetXTitle("Vertex Z [mm]")  # x-axis label
-    hists[h].SetYTitle("Vertex R [mm]")  # y-axis label
-    hists[h].SetZTitle("Counts")  # z-axis label
-    hists[h].SetMaximum(1652537)
-    hists[h].Draw("COLZ")
+    entries = hists[h].entries if not suffix else hists[h].region((zlo, zhi), (rlo, rhi)).entries
+    th = hists[h].to_hist((zlo, zhi), (rlo, rhi), zbin, rbin).to_root(name=h + suffix)  # ROOT only for drawing
+    th.SetXTitle("Vertex Z [mm]")  # x-axis label
+    th.SetYTitle("Vertex R [mm]")  # y-axis label
+    th.SetZTitle("Counts")  # z-axis label
+    if not suffix:
+        th.SetMaximum(1652537)
+    th.Draw("COLZ")
     c.SetLogz()  # log scale z-axis
 
     # Add total entries text box
@@ -68,4 +79,4 @@ for i, h in enumerate(hists):
     pave_text.SetBorderSize(1)
     pave_text.Draw()
 
-    c.SaveAs("%s.png" % h)
+    c.SaveAs("%s%s.png" % (h, suffix))
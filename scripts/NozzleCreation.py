@@ -496,70 +496,37 @@ def generate_geometry_iterations_absolute(input_xml, variants_dir, z_start_value
     if organize_variants:
         print(f"Organized variants in {variants_dir}")
 
-# ================================
-# ENTRY POINT
-# ================================
-
-if __name__ == "__main__":
-    input_xml = DEFAULT_INPUT_XML
-    variants_dir = DEFAULT_VARIANTS_DIR
-    
-    # Create directories
-    os.makedirs(variants_dir, exist_ok=True)
-    
-    print(f"Variants directory: {variants_dir}")
-    print(f"Base geometry path: {BASE_GEOMETRY_PATH}")
-
-    # Full iteration set with automatic organization
-    print("\n--- Generating All Combinations ---")
-    generate_geometry_iterations_absolute(
-        input_xml, 
-        variants_dir,
-        z_start_values, 
-        rmax_steps,
-        organize_variants=True  # Enable automatic organization
-    )
-
-
 # ================================
 # OPTIONAL: Auto-run simulation on each generated MAIA.xml
 # ================================
 
 def run_simulations_for_variants(variant_dir, steering_template_path):
-    import shutil
     from pathlib import Path
+    from steering_builder import SteeringConfig, SteeringValidationError
+    from geo_cache import convert_variants
 
     variant_paths = sorted(Path(variant_dir).glob("*/MAIA_*.xml"))
 
+    # Convert all variants to ROOT up front, in parallel; unchanged geometries come from the cache
+    print("[INFO] Running geoConverter...")
+    conversions = convert_variants(variant_paths)
+
     for maia_path in variant_paths:
         variant_folder = maia_path.parent
         print(f"\n[INFO] Processing variant: {maia_path}")
 
-        # Convert to ROOT using geoConverter
-        print("[INFO] Running geoConverter...")
-        cmd_convert = f"geoConverter -compact2tgeo -input {maia_path} -output {maia_path}.root"
-        conversion_result = os.system(cmd_convert)
-        if conversion_result != 0:
+        if conversions[maia_path][3] is not None:
             print(f"[ERROR] geoConverter failed for {maia_path}")
             continue
 
-        # Prepare the steering file
+        # Prepare the steering file (validated: the compact file must exist)
         steer_copy_path = variant_folder / "steer_sim.py"
-        shutil.copy(steering_template_path, steer_copy_path)
-
-        with open(steer_copy_path, 'r') as f:
-            content = f.read()
-
-        # Replace file paths
-        content = content.replace(
-            "/home/devlinjenkins/projects/NozzleSimOpti/simulation/geometries/MAIA_v0_Blackhole/MAIA_v0_blackhole.xml",
-            str(maia_path)
-        )
         output_name = f"mumu_H_bb_100E_{maia_path.stem}.slcio"
-        content = content.replace("mumu_H_bb_100E_MAIA_blackhole.slcio", output_name)
-
-        with open(steer_copy_path, 'w') as f:
-            f.write(content)
+        try:
+            SteeringConfig(steering_template_path).with_job(maia_path.resolve(), output_name).write(steer_copy_path)
+        except SteeringValidationError as e:
+            print(f"[ERROR] {e}")
+            continue
 
         # Run ddsim
         print(f"[INFO] Running ddsim for {steer_copy_path}...")
@@ -569,5 +536,29 @@ def run_simulations_for_variants(variant_dir, steering_template_path):
         else:
             print(f"[SUCCESS] Simulation complete: {output_name}")
 
-# Example usage:
-run_simulations_for_variants(DEFAULT_VARIANTS_DIR, "/home/devlinjenkins/projects/NozzleSimOpti/simulation/steeringFiles/steer_sim_Hbb_MAIA_blackhole_starter.py")
\ No newline at end of file
+# ================================
+# ENTRY POINT
+# ================================
+
+if __name__ == "__main__":
+    input_xml = DEFAULT_INPUT_XML
+    variants_dir = DEFAULT_VARIANTS_DIR
+    
+    # Create directories
+    os.makedirs(variants_dir, exist_ok=True)
+    
+    print(f"Variants directory: {variants_dir}")
+    print(f"Base geometry path: {BASE_GEOMETRY_PATH}")
+
+    # Full iteration set with automatic organization
+    print("\n--- Generating All Combinations ---")
+    generate_geometry_iterations_absolute(
+        input_xml, 
+        variants_dir,
+        z_start_values, 
+        rmax_steps,
+        organize_variants=True  # Enable automatic organization
+    )
+
+    # Optional: convert and simulate every generated variant
+    run_simulations_for_variants(DEFAULT_VARIANTS_DIR, "/home/devlinjenkins/projects/NozzleSimOpti/simulation/steeringFiles/steer_sim_Hbb_MAIA_blackhole_starter.py")
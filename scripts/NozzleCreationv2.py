@@ -7,6 +7,11 @@ import logging
 import subprocess
 import stat
 
+from steering_builder import SteeringExpression, render_steering_files, SteeringValidationError
+from condor_batch import write_cluster_submit, get_submitter
+from batch_overlap_check import overlap_gate
+from variant_catalog import VariantCatalog
+
 ## $ python script.py --test for single test case
 ## $ python script.py --batch --organize for batch generation with organized folders
 
@@ -40,6 +45,44 @@ rmax_reduction_values = [0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5]  #
 # Steering file template path (constructed from BASE_GEOMETRY_PATH)
 STEERING_TEMPLATE_FILENAME = "steer_sim_Hbb_MAIA_blackhole_starter.py"
 
+# Production-cut / kill preset applied to every variant (None keeps the template cuts)
+CUT_PRESET = None
+
+# ================================
+# PRODUCTION-CUT PRESETS
+# ================================
+
+# Global values go into the steering file, region values into the <regions>/<limits>
+# blocks of the variant's MAIA compact file. Showers inside the tungsten dominate the
+# CPU time, so the presets only coarsen NozzleRegion and keep the tracking regions
+# at the Geant4 default.
+CUT_PRESETS = {
+    "baseline": {
+        "rangecut_mm": 0.7,
+        "min_kinetic_energy_mev": 1.0,
+        "regions": {},
+    },
+    "nozzle_coarse": {
+        "rangecut_mm": 0.7,
+        "min_kinetic_energy_mev": 1.0,
+        "regions": {
+            "NozzleRegion": {"cut_mm": 5.0, "threshold_mev": 1.0},
+        },
+    },
+    "nozzle_kill": {
+        "rangecut_mm": 0.7,
+        "min_kinetic_energy_mev": 1.0,
+        "regions": {
+            "NozzleRegion": {
+                "cut_mm": 10.0,
+                "threshold_mev": 1.0,
+                # Geant4 user limits on the region's limitset
+                "limits": {"ekin_min": (1.0, "MeV"), "time_max": (100.0, "ns")},
+            },
+        },
+    },
+}
+
 # ================================
 # GEOMETRY CONSTANTS AND TARGETS
 # ================================
@@ -201,21 +244,92 @@ def validate_configuration(z_start, rmax_reduction, geometry_dict):
 
     return is_valid, messages, final_suggested
 
+# ================================
+# CUT PRESET FUNCTIONS
+# ================================
+
+def get_cut_preset(preset_name):
+    """Return the preset dictionary for preset_name, raising ValueError if unknown."""
+    if preset_name not in CUT_PRESETS:
+        raise ValueError(f"Unknown cut preset '{preset_name}', choose from {sorted(CUT_PRESETS)}")
+    return CUT_PRESETS[preset_name]
+
+def apply_region_cut_preset(root, preset_name):
+    """
+    Apply the region part of a cut preset to a parsed MAIA compact XML tree.
+
+    Sets cut/threshold on the <region> elements and adds the preset limits to the
+    region's limitset (the one referenced by the nozzle detectors, <Region>LimitSet).
+
+    Args:
+        root: Root element of the MAIA compact XML
+        preset_name: Key of CUT_PRESETS
+    """
+    preset = get_cut_preset(preset_name)
+    for region_name, settings in preset["regions"].items():
+        region = root.find(f".//regions/region[@name='{region_name}']")
+        if region is None:
+            logger.warning(f"Region {region_name} not found in compact file, preset {preset_name} not applied to it")
+            continue
+        region.set("lunit", "mm")
+        region.set("eunit", "MeV")
+        region.set("cut", str(settings["cut_mm"]))
+        region.set("threshold", str(settings["threshold_mev"]))
+        logger.info(f"Set {region_name} cut={settings['cut_mm']} mm, threshold={settings['threshold_mev']} MeV")
+
+        limits = settings.get("limits", {})
+        if not limits:
+            continue
+        limitset_name = f"{region_name}LimitSet"
+        limitset = root.find(f".//limits/limitset[@name='{limitset_name}']")
+        if limitset is None:
+            limits_elem = root.find(".//limits")
+            if limits_elem is None:
+                limits_elem = ET.SubElement(root, "limits")
+            limitset = ET.SubElement(limits_elem, "limitset", name=limitset_name)
+        for limit_name, (value, unit) in limits.items():
+            limit = limitset.find(f"limit[@name='{limit_name}']")
+            if limit is None:
+                limit = ET.SubElement(limitset, "limit", name=limit_name)
+            limit.set("particles", "*")
+            limit.set("value", str(value))
+            limit.set("unit", unit)
+            logger.info(f"Set {limitset_name} {limit_name}={value} {unit}")
+
+def cut_preset_steering_overrides(preset_name):
+    """
+    Steering-file overrides applying the global part of a cut preset.
+
+    Returns:
+        Dictionary of SIM setting -> expression, for steering_builder
+    """
+    if preset_name is None:
+        return {}
+    preset = get_cut_preset(preset_name)
+    return {
+        "physics.rangecut": SteeringExpression(f"{preset['rangecut_mm']}*mm"),
+        "part.minimalKineticEnergy": SteeringExpression(f"{preset['min_kinetic_energy_mev']}*MeV"),
+    }
+
 # ================================
 # VARIANT ORGANIZER CLASS
 # ================================
 
 class NozzleVariantOrganizer:
-    def __init__(self, base_geometry_path, output_base_path):
+    def __init__(self, base_geometry_path, output_base_path, cut_preset=None):
         """
         Initialize the organizer with base paths.
         
         Args:
             base_geometry_path: Path to MAIA_v0_Blackhole directory
             output_base_path: Base path where variant folders will be created
+            cut_preset: Optional key of CUT_PRESETS applied to every MAIA.xml
         """
         self.base_geometry_path = Path(base_geometry_path)
         self.output_base_path = Path(output_base_path)
+        self.cut_preset = cut_preset
+        if cut_preset is not None:
+            get_cut_preset(cut_preset)
         
         # Files to exclude from copying
         self.exclude_files = {
@@ -345,6 +459,9 @@ class NozzleVariantOrganizer:
             if not updated:
                 logger.warning("No nozzle include ref found to update in MAIA template")
 
+            if self.cut_preset is not None:
+                apply_region_cut_preset(root, self.cut_preset)
+
             ET.indent(tree, space='\t')
             return '<?xml version="1.0" encoding="utf-8"?>\n' + ET.tostring(root, encoding='unicode')
 
@@ -750,10 +867,39 @@ def adjust_nozzle_for_blackhole(nozzle_geometry, blackhole_rmax_changes, z_start
 # MAIN EXECUTION WITH VALIDATION
 # ================================
 
+def resolve_effective_reduction(z_start, rmax_reduction):
+    """
+    Validate a configuration and return the reduction that will actually be applied.
+
+    Returns:
+        (effective_reduction, error_msg); effective_reduction is None if the
+        configuration cannot be generated at all
+    """
+    combined_base = {**get_nozzle_base_geometry(), **get_blackhole_base_geometry()}
+    is_valid, validation_messages, suggested_reduction = validate_configuration(
+        z_start, rmax_reduction, combined_base
+    )
+    if is_valid:
+        return rmax_reduction, None
+
+    error_msg = f"Invalid configuration for z_start={z_start}, reduction={rmax_reduction}:\n"
+    error_msg += "\n".join(validation_messages)
+    error_msg += f"\nSuggested maximum reduction: {suggested_reduction:.4f} cm"
+    # Optionally, try with suggested reduction
+    if suggested_reduction > 0:
+        return suggested_reduction, error_msg
+    return None, error_msg
+
+def default_variant_name(z_start, effective_reduction):
+    """Folder (and nozzle XML) name of a variant."""
+    return f"Nozzle_zstart_{z_start:.4f}_reduction_{effective_reduction:.4f}"
+
 def generate_variant_with_validation(z_start, rmax_reduction, input_xml_path, output_dir, 
-                                   organizer, variant_name=None):
+                                   organizer, variant_name=None, catalog=None):
     """
     Generate a nozzle variant with full validation.
+
+    If a VariantCatalog is given, the new variant is registered in it.
     
     Returns:
         (success, output_path, message)
@@ -761,31 +907,20 @@ def generate_variant_with_validation(z_start, rmax_reduction, input_xml_path, ou
     # Load base geometries
     nozzle_base = get_nozzle_base_geometry()
     blackhole_base = get_blackhole_base_geometry()
-    combined_base = {**nozzle_base, **blackhole_base}
 
     # Validate configuration
-    is_valid, validation_messages, suggested_reduction = validate_configuration(
-        z_start, rmax_reduction, combined_base
-    )
-
-    effective_reduction = rmax_reduction
-    if not is_valid:
-        error_msg = f"Invalid configuration for z_start={z_start}, reduction={rmax_reduction}:\n"
-        error_msg += "\n".join(validation_messages)
-        error_msg += f"\nSuggested maximum reduction: {suggested_reduction:.4f} cm"
+    effective_reduction, error_msg = resolve_effective_reduction(z_start, rmax_reduction)
+    if error_msg:
         logger.error(error_msg)
-        # Optionally, try with suggested reduction
-        if suggested_reduction > 0:
-            logger.info(f"Attempting with suggested reduction: {suggested_reduction:.4f} cm")
-            effective_reduction = suggested_reduction
-        else:
+        if effective_reduction is None:
             return False, None, error_msg
+        logger.info(f"Attempting with suggested reduction: {effective_reduction:.4f} cm")
 
     # Generate output filename using the final applied reduction
     if variant_name is None:
-        variant_name = f"Nozzle_zstart_{z_start:.4f}_reduction_{effective_reduction:.4f}"
+        variant_name = default_variant_name(z_start, effective_reduction)
 
-    filename = f"Nozzle_zstart_{z_start:.4f}_reduction_{effective_reduction:.4f}.xml"
+    filename = f"{default_variant_name(z_start, effective_reduction)}.xml"
     variant_folder = output_dir / variant_name
     variant_folder.mkdir(parents=True, exist_ok=True)
     output_path = variant_folder / filename
@@ -810,10 +945,22 @@ def generate_variant_with_validation(z_start, rmax_reduction, input_xml_path, ou
         if not output_path.exists():
             raise FileNotFoundError(f"Expected output XML not found: {output_path}")
 
+        # Analytic polycone pre-check: reject broken geometries before any conversion or overlap check
+        from polycone_check import validate_nozzle_xml, format_issues
+        issues = validate_nozzle_xml(output_path)
+        if issues:
+            error_msg = f"Polycone check failed for {output_path.name}:\n{format_issues(issues)}"
+            logger.error(error_msg)
+            return False, None, error_msg
+
         # Create organized folder now that the output file is guaranteed to exist
         variant_folder_path = organizer.create_variant_folder(output_path, variant_name)
         logger.info(f"Created variant folder: {variant_folder_path}")
 
+        if catalog is not None:
+            catalog.register(variant_name, variant_folder_path, z_start, rmax_reduction, effective_reduction,
+                             organizer.cut_preset)
+
         return True, output_path, "Successfully generated variant"
         
     except Exception as e:
@@ -824,19 +971,36 @@ def generate_variant_with_validation(z_start, rmax_reduction, input_xml_path, ou
 # ================================
 # HTCondor Submission File Generation
 # ================================
-def generate_condor_submit_files(variants_dir, steering_template_path):
+def generate_condor_submit_files(variants_dir, steering_template_path, cost_model=None, cut_preset=None,
+                                 require_overlap_check=False):
     """
-    Generate HTCondor submission scripts for each nozzle variant.
+    Generate a single HTCondor cluster submission for all nozzle variants.
+
+    Writes one steering file per variant plus one submit description whose
+    `queue ... from` itemdata lists every variant directory, so the whole sweep is
+    submitted with a single condor_submit. Per-job resource requests are derived
+    from the simulation cost model (see sim_cost_model.py) and jobs are queued
+    longest predicted runtime first. If cut_preset is given, its global cuts are
+    set in every steering file. Variants whose overlap report (batch_overlap_check.py)
+    failed are never queued; with require_overlap_check, unchecked ones are skipped too.
+
+    Returns:
+        Path to the cluster submit file, or None if nothing was generated
     """
     from pathlib import Path
+    from sim_cost_model import load_or_train_cost_model, features_for_variant, condor_requests
     variants_dir = Path(variants_dir)
     
     if not steering_template_path.exists():
         logger.error(f"Steering template not found: {steering_template_path}")
         logger.error("Please update the steering template path in the script")
-        return
-        
-    for variant_folder in variants_dir.iterdir():
+        return None
+
+    if cost_model is None:
+        cost_model = load_or_train_cost_model()
+
+    variant_maia_paths = []
+    for variant_folder in sorted(variants_dir.iterdir()):
         if not variant_folder.is_dir():
             continue
         maia_path = None
@@ -847,46 +1011,54 @@ def generate_condor_submit_files(variants_dir, steering_template_path):
         if not maia_path:
             logger.warning(f"No MAIA xml found in {variant_folder}")
             continue
-
-        steering_dest = variant_folder / "steer_sim.py"
-        with open(steering_template_path, "r", encoding="utf-8") as f:
-            content = f.read()
-        content = content.replace(
-            str(Path(BASE_GEOMETRY_PATH) / "MAIA_v0_blackhole.xml"),
-            str(maia_path)
-        )
-        with open(steering_dest, "w", encoding="utf-8") as f:
-            f.write(content)
-
-        # Write the submit file using RELATIVE paths
-        submit_file = variant_folder / "nozzle_sim.submit"
-        with open(submit_file, "w", encoding="utf-8") as f:
-            f.write(
-                "initialdir = .\n"
-                "executable = ./run_sim.sh\n"
-                "arguments = .\n"
-                f"transfer_input_files = {maia_path.name}, steer_sim.py\n"
-                "output = ./condor.out\n"
-                "error = ./condor.err\n"
-                "log = ./condor.log\n"
-                "request_cpus = 1\n"
-                "request_memory = 2GB\n"
-                "request_disk = 2GB\n"
-                "should_transfer_files = YES\n"
-                "when_to_transfer_output = ON_EXIT\n"
-                "+HasSingularity = true\nrequirements = (HasSingularity == true || HasApptainer == true)\n"
-                "queue\n"
-            )
-        logger.info(f"Generated Condor submit file: {submit_file}")
-
-        # Ensure run_sim.sh is present in each variant directory
-        run_script_source = Path("run_sim.sh")  # Look in current directory
-        run_script_dest = variant_folder / "run_sim.sh"
-        if run_script_source.exists():
+        allowed, reason = overlap_gate(variant_folder, require_report=require_overlap_check)
+        if not allowed:
+            logger.warning(f"Not submitting {variant_folder.name}: {reason}")
+            continue
+        variant_maia_paths.append((variant_folder, maia_path))
+
+    if not variant_maia_paths:
+        logger.warning(f"No variants found in {variants_dir}")
+        return None
+
+    # Render and validate every steering file before the submit file is written
+    steering_jobs = [{
+        "path": variant_folder / "steer_sim.py",
+        "compact_file": maia_path.resolve(),
+        "output_file": f"mumu_H_bb_100E_{maia_path.stem}.slcio",
+    } for variant_folder, maia_path in variant_maia_paths]
+    try:
+        render_steering_files(steering_template_path, steering_jobs, extra=cut_preset_steering_overrides(cut_preset))
+    except SteeringValidationError as e:
+        logger.error(str(e))
+        return None
+
+    # Predict the cost of each variant to size its job
+    jobs = []
+    for variant_folder, maia_path in variant_maia_paths:
+        features = features_for_variant(variant_folder)
+        prediction = cost_model.predict(features) if features else {"wall_time_s": 0.0, "output_mb": 0.0}
+        job = {"variant_dir": variant_folder.resolve(), "maia_file": maia_path.name,
+               "predicted_wall_time_s": prediction["wall_time_s"]}
+        job.update(condor_requests(prediction))
+        jobs.append(job)
+        logger.info(f"Queued {variant_folder.name} "
+                    f"(predicted {prediction['wall_time_s']:.0f} s, {prediction['output_mb']:.0f} MB)")
+
+    # Longest jobs first so the sweep's tail is as short as possible
+    jobs.sort(key=lambda job: job["predicted_wall_time_s"], reverse=True)
+
+    # One shared job script for the whole cluster
+    run_script_source = Path("run_sim.sh")  # Look in current directory
+    run_script_dest = variants_dir / "run_sim.sh"
+    if run_script_source.exists():
+        if run_script_source.resolve() != run_script_dest.resolve():
             shutil.copy(run_script_source, run_script_dest)
-            run_script_dest.chmod(run_script_dest.stat().st_mode | 0o111)  # Ensure it's executable
-        else:
-            logging.warning(f"run_sim.sh not found at {run_script_source}")
+        run_script_dest.chmod(run_script_dest.stat().st_mode | 0o111)  # Ensure it's executable
+    else:
+        logging.warning(f"run_sim.sh not found at {run_script_source}")
+
+    return write_cluster_submit(variants_dir, jobs)
 
 # ================================
 # MAIN EXECUTION
@@ -910,6 +1082,12 @@ apptainer exec /cvmfs/sw.hsf.org/key4hep/releases/nightly/20240118/key4hep-spack
     parser = argparse.ArgumentParser(description='Generate nozzle geometry variants')
     parser.add_argument('--test', action='store_true', help='Run single test case')
     parser.add_argument('--batch', action='store_true', help='Run batch generation (default)')
+    parser.add_argument('--cut-preset', default=CUT_PRESET, choices=sorted(CUT_PRESETS),
+                        help='Production-cut preset applied to compact and steering files')
+    parser.add_argument('--mock-submit', action='store_true',
+                        help='Submit through the local mock condor_submit backend (for testing)')
+    parser.add_argument('--check-overlaps', action='store_true',
+                        help='Convert and overlap-check every variant; only passing variants are submitted')
     
     args = parser.parse_args()
     
@@ -919,14 +1097,15 @@ apptainer exec /cvmfs/sw.hsf.org/key4hep/releases/nightly/20240118/key4hep-spack
     
     output_dir = Path(DEFAULT_VARIANTS_DIR)
     output_dir.mkdir(parents=True, exist_ok=True)
-    organizer = NozzleVariantOrganizer(BASE_GEOMETRY_PATH, output_dir)
+    organizer = NozzleVariantOrganizer(BASE_GEOMETRY_PATH, output_dir, cut_preset=args.cut_preset)
+    catalog = VariantCatalog(output_dir)
     
     if args.test:
         # Run single test case
         logger.info(f"Running test case: z_start={TEST_Z_START}, reduction={TEST_RMAX_REDUCTION}")
         success, path, msg = generate_variant_with_validation(
             TEST_Z_START, TEST_RMAX_REDUCTION, DEFAULT_INPUT_XML, output_dir, 
-            organizer=organizer
+            organizer=organizer, catalog=catalog
         )
         if success:
             logger.info(f"Test successful: {path}")
@@ -948,7 +1127,7 @@ apptainer exec /cvmfs/sw.hsf.org/key4hep/releases/nightly/20240118/key4hep-spack
 
                 success, path, msg = generate_variant_with_validation(
                     z_start, rmax_reduction, DEFAULT_INPUT_XML, output_dir,
-                    organizer=organizer
+                    organizer=organizer, catalog=catalog
                 )
 
                 if success:
@@ -983,23 +1162,29 @@ apptainer exec /cvmfs/sw.hsf.org/key4hep/releases/nightly/20240118/key4hep-spack
         steering_template_path = Path(BASE_GEOMETRY_PATH).parent.parent / "steeringFiles" / STEERING_TEMPLATE_FILENAME
         
         if steering_template_path.exists():
+            if args.check_overlaps:
+                from geo_cache import convert_variants
+                from batch_overlap_check import check_variants
+                logger.info("\nConverting and overlap-checking variants...")
+                conversions = convert_variants(sorted(output_dir.glob("*/MAIA_*.xml")))
+                check_variants([output for output, _, _, error in conversions.values() if error is None])
+
             # Generate HTCondor submission files
             logger.info("\nGenerating HTCondor submission files...")
-            generate_condor_submit_files(output_dir, steering_template_path)
+            submit_file = generate_condor_submit_files(output_dir, steering_template_path,
+                                                       cut_preset=args.cut_preset,
+                                                       require_overlap_check=args.check_overlaps)
             
-            # Submit jobs if requested
-            if SUBMIT_JOBS_AUTOMATICALLY:
-                logger.info("\nSubmitting HTCondor jobs...")
-                for variant_folder in output_dir.iterdir():
-                    if not variant_folder.is_dir():
-                        continue
-                    submit_file = variant_folder / "nozzle_sim.submit"
-                    if submit_file.exists():
-                        logger.info(f"Submitting job: {submit_file}")
-                        subprocess.run(["condor_submit", str(submit_file)])
+            # Submit jobs if requested: the whole sweep goes in as one cluster
+            if submit_file is None:
+                logger.warning("\nNo HTCondor submit file generated")
+            elif SUBMIT_JOBS_AUTOMATICALLY or args.mock_submit:
+                logger.info("\nSubmitting HTCondor cluster...")
+                cluster_id, n_jobs = get_submitter(mock=args.mock_submit).submit(submit_file)
+                logger.info(f"Submitted {n_jobs} jobs to cluster {cluster_id}")
             else:
-                logger.info("\nHTCondor submit files generated. To submit all jobs, run:")
-                logger.info(f"for dir in {output_dir}/*/; do condor_submit $dir/nozzle_sim.submit; done")
+                logger.info("\nHTCondor submit file generated. To submit all jobs, run:")
+                logger.info(f"cd {output_dir} && condor_submit {submit_file.name}")
         else:
             logger.warning(f"\nSteering template not found: {steering_template_path}")
             logger.warning("HTCondor submission files not generated")
@@ -2,6 +2,8 @@ import pyLCIO
 import ROOT
 import glob
 import math
+import numpy as np
+from histograms import Hist
 
 # Set up some options
 max_events = -1
@@ -11,7 +13,7 @@ fnames = glob.glob("/scratch/devlinjenkins/work/reconstruction/Output_REC.000.sl
 
 # Set up histograms
 hists = {}                                                                          
-hists["Reconstructed BJet Locations from Momentum"] = ROOT.TH2F("Reconstructed BJet Locations from Momentum", "Reconstructed BJet Locations from Momentum", 50, 0, math.pi, 50, -math.pi, math.pi)
+hists["Reconstructed BJet Locations from Momentum"] = Hist((50, 0, math.pi), (50, -math.pi, math.pi), name="Reconstructed BJet Locations from Momentum", title="Reconstructed BJet Locations from Momentum")
                                                                                          #change according to data
 
 # Loop over events
@@ -30,30 +32,32 @@ for f in fnames:
         JetOut_collection = event.getCollection("JetOut")
 
         # Loop over the hits and fill histograms
-        for jet in JetOut_collection:                                           #loop
-            energy = jet.getEnergy()                                            #get data we care about from collection
-            momentum = jet.getMomentum()                                        
-            px, py, pz = momentum[0], momentum[1], momentum[2]                 
-            radius = math.sqrt(px**2 + py**2 + pz**2)        
-            theta = math.acos(pz/radius)                                        #calc theta
-            phi = math.atan2(py,px)                                             #calc phi
-            hists["Reconstructed BJet Locations from Momentum"].Fill(theta, phi, energy)      #fill (x, y, weight)
+        energy = np.array([jet.getEnergy() for jet in JetOut_collection])       #get data we care about from collection
+        momentum = np.array([[jet.getMomentum()[k] for k in range(3)] for jet in JetOut_collection]).reshape(-1, 3)
+        px, py, pz = momentum.T
+        radius = np.sqrt(px**2 + py**2 + pz**2)
+        theta = np.arccos(pz/radius)                                            #calc theta
+        phi = np.arctan2(py,px)                                                 #calc phi
+        hists["Reconstructed BJet Locations from Momentum"].fill(theta, phi, weights=energy)  #fill all jets at once (x, y, weight)
 
         i+= 1
     reader.close()
 
 # Make your plots
 ROOT.gStyle.SetOptStat(0)
+root_hists = []
 for i, h in enumerate(hists):
     c = ROOT.TCanvas("c%i"%i, "c%i"%i)
     c.SetRightMargin(0.15)                                                      #Increase the right margin
-    hists[h].SetXTitle("Theta [rads]")                                          #y axis label
-    hists[h].SetYTitle("Phi [rads]")                                            #y axis label
-    hists[h].SetZTitle("Energy [GeV*?]")
-    hists[h].Draw("COLZ")                                                       #"COLZ" gives color *must use*
+    th = hists[h].to_root()                                                     #ROOT only for drawing
+    th.SetXTitle("Theta [rads]")                                                #y axis label
+    th.SetYTitle("Phi [rads]")                                                  #y axis label
+    th.SetZTitle("Energy [GeV*?]")
+    th.Draw("COLZ")                                                             #"COLZ" gives color *must use*
     c.SaveAs("%s.png"%h)
+    root_hists.append(th)
 
 output_file = ROOT.TFile("ECalHistograms.root", "RECREATE")
-for h in hists.values():
-    h.Write()
+for th in root_hists:
+    th.Write()
 output_file.Close()
\ No newline at end of file
@@ -1,40 +1,242 @@
-import ROOT
 import os
+import tempfile
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 
-# Open the ROOT file
-f = ROOT.TFile.Open("/home/devlinjenkins/projects/NozzleSimOpti/simulation/geometries/MuColl_10TeV_v0A_Modded_Nozzle/MuColl_10TeV_Hammer_V1.xml.root")
+try:
+    import imageio.v2 as imageio
+except ImportError:
+    imageio = None
 
-# Try to extract the TGeoManager object
-geo_manager = None
-for key in f.GetListOfKeys():
-    obj = key.ReadObj()
-    if obj.InheritsFrom("TGeoManager"):
-        geo_manager = obj
-        break
+from nozzle_volumes import find_nozzle_volumes, NOZZLE_VOLUME_PREFIXES
 
-if geo_manager is None:
-    raise RuntimeError("TGeoManager not found in the ROOT file.")
+## $ python RootGIF.py spin geometry.xml.root -o spin.gif --workers 8   offscreen spinning animation (.gif or .mp4)
+## $ python RootGIF.py thumbnails sweep_dir --workers 8                  nozzle_thumbnail.png in every variant folder
+## Streaming GIF/MP4 output needs imageio (MP4 also imageio-ffmpeg); without it the frames are kept as PNGs.
+## $ xvfb-run python RootGIF.py spin geometry.xml.root --raytrace   raytraced frames need a (virtual) display
 
-# Set it globally so ROOT knows it's the current geometry
-ROOT.gGeoManager = geo_manager
+logger = logging.getLogger(__name__)
 
-# Draw the geometry using OpenGL
-geo_manager.GetTopVolume().Draw("ogl")
+# ================================
+# CONFIGURABLE PARAMETERS
+# ================================
 
-# Create a canvas for rendering
-c = ROOT.TCanvas("c", "Spinning Geometry", 800, 800)
-c.cd()
+GEOMETRY_FILE = "/home/devlinjenkins/projects/NozzleSimOpti/simulation/geometries/MuColl_10TeV_v0A_Modded_Nozzle/MuColl_10TeV_Hammer_V1.xml.root"
 
-# Output directory for frames
-output_dir = "frames"
-os.makedirs(output_dir, exist_ok=True)
+CANVAS_SIZE = 800
+ANGLE_STEP = 5   # degrees between frames
+THETA = 30       # fixed vertical view angle
+FPS = 12
 
-# Rotate and export frames every 5 degrees
-for angle in range(0, 360, 5):
-    c.SetPhi(angle)     # Rotate horizontally
-    c.SetTheta(30)      # Fixed vertical angle (you can adjust)
-    c.Update()
-    filename = f"{output_dir}/frame_{angle:03d}.png"
-    c.SaveAs(filename)
+# Wireframe frames render in ROOT batch mode. Raytraced frames look like the old OpenGL view, but
+# TGeoPainter::Raytrace does nothing on a batch pad, so they need a display (e.g. xvfb-run).
+RAYTRACE = False
 
-print("✅ Frame export complete.")
+# Nozzle thumbnails: view range (xmin, ymin, zmin, xmax, ymax, zmax) in cm around the +z nozzle
+THUMBNAIL_SIZE = 400
+THUMBNAIL_RANGE = (-30, -30, 0, 30, 30, 250)
+THUMBNAIL_ANGLES = (60, 75)  # (phi, theta): side view along the beam
+THUMBNAIL_COLORS = {"NozzleW": 920, "NozzleBlackhole": 1}  # kGray, kBlack
+THUMBNAIL_FILENAME = "nozzle_thumbnail.png"
+
+# ================================
+# RENDERING (runs inside worker processes)
+# ================================
+
+_canvas = None
+_raytrace = RAYTRACE
+
+def _import_geometry(root_file, raytrace=RAYTRACE):
+    """Import a geometry into this process's gGeoManager (offscreen unless raytracing)."""
+    import ROOT
+    ROOT.gROOT.SetBatch(not raytrace)
+    ROOT.gErrorIgnoreLevel = ROOT.kWarning
+    ROOT.TGeoManager.Import(str(root_file))
+    if not ROOT.gGeoManager:
+        raise RuntimeError(f"TGeoManager not found in {root_file}")
+    return ROOT.gGeoManager
+
+def _draw(canvas, geom, phi, theta, view_range=None, raytrace=RAYTRACE):
+    canvas.cd()
+    canvas.Clear()
+    top = geom.GetTopVolume()
+    top.Draw()
+    view = canvas.GetView()
+    if view_range is not None:
+        view.SetRange(*view_range)
+    view.SetView(phi, theta, 0, 0)
+    if raytrace:
+        if canvas.IsBatch():
+            raise RuntimeError("Raytracing needs a display: run under xvfb-run, or render wireframe frames")
+        top.Raytrace()
+    canvas.Update()
+
+def _png_bytes(canvas):
+    """Render the canvas to PNG and return the bytes; the temporary file is removed at once."""
+    fd, path = tempfile.mkstemp(suffix=".png")
+    os.close(fd)
+    try:
+        canvas.SaveAs(path)
+        with open(path, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(path)
+
+def _init_spin_worker(root_file, size, raytrace):
+    """Pool initializer: every worker imports the geometry once and keeps its own canvas."""
+    global _canvas, _raytrace
+    import ROOT
+    _import_geometry(root_file, raytrace)
+    _canvas = ROOT.TCanvas("c", "Spinning Geometry", size, size)
+    _raytrace = raytrace
+
+def _render_angle(angle):
+    import ROOT
+    _draw(_canvas, ROOT.gGeoManager, angle, THETA, raytrace=_raytrace)
+    return angle, _png_bytes(_canvas)
+
+def _render_thumbnail(job):
+    """Render the nozzle region of one variant. Returns (root_file, output path or None, error)."""
+    root_file, output_path = job
+    try:
+        import ROOT
+        geom = _import_geometry(root_file)
+        nozzle_volumes, _ = find_nozzle_volumes(geom, NOZZLE_VOLUME_PREFIXES)
+        if not nozzle_volumes:
+            raise RuntimeError("no nozzle volumes in geometry")
+        nozzle_names = {v.GetName() for v in nozzle_volumes}
+
+        # Show only the nozzle volumes, at every depth
+        volumes = geom.GetListOfVolumes()
+        for i in range(volumes.GetEntries()):
+            volumes.At(i).SetVisibility(volumes.At(i).GetName() in nozzle_names)
+        for volume in nozzle_volumes:
+            for prefix, color in THUMBNAIL_COLORS.items():
+                if volume.GetName().startswith(prefix):
+                    volume.SetLineColor(color)
+        geom.SetTopVisible(False)
+        geom.SetVisOption(0)
+        geom.SetVisLevel(10)
+
+        canvas = ROOT.TCanvas("thumb", "Nozzle", THUMBNAIL_SIZE, THUMBNAIL_SIZE)
+        _draw(canvas, geom, *THUMBNAIL_ANGLES, view_range=THUMBNAIL_RANGE)
+        canvas.SaveAs(str(output_path))
+        return str(root_file), str(output_path), None
+    except Exception as e:
+        return str(root_file), None, str(e)
+
+# ================================
+# ANIMATION
+# ================================
+
+def _spawn_pool(max_workers, **kwargs):
+    # ROOT keeps global state per process: spawn fresh interpreters rather than forking
+    return ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(),
+                               mp_context=multiprocessing.get_context("spawn"), **kwargs)
+
+def render_spin(root_file=GEOMETRY_FILE, output="spin.gif", angle_step=ANGLE_STEP, fps=FPS,
+                size=CANVAS_SIZE, max_workers=None, raytrace=RAYTRACE):
+    """
+    Render a spinning animation of a geometry offscreen, with angles spread over workers.
+
+    Frames are streamed into the GIF/MP4 writer in angle order as they arrive, so
+    only the frames in flight are held in memory and none are kept on disk. Without
+    imageio the frames are written to a 'frames' directory next to the output instead.
+    Frames are wireframe views rendered in batch mode; raytrace=True needs a display.
+
+    Returns:
+        Path to the animation (or the frames directory)
+    """
+    angles = list(range(0, 360, angle_step))
+    output = Path(output)
+    frames_dir = None
+    writer = None
+    if imageio is None:
+        frames_dir = output.with_name("frames")
+        frames_dir.mkdir(parents=True, exist_ok=True)
+        logger.warning(f"imageio not installed: writing PNG frames to {frames_dir}")
+    elif output.suffix.lower() == ".mp4":
+        writer = imageio.get_writer(output, fps=fps)
+    else:
+        # GIF frame duration is in milliseconds for imageio >= 2.28
+        writer = imageio.get_writer(output, mode="I", duration=1000.0 / fps, loop=0)
+
+    try:
+        with _spawn_pool(max_workers, initializer=_init_spin_worker, initargs=(str(root_file), size, raytrace)) as pool:
+            # map yields in submission order, so frames are appended in angle order
+            for angle, png in pool.map(_render_angle, angles):
+                if writer is not None:
+                    writer.append_data(imageio.imread(png, format="png"))
+                else:
+                    with open(frames_dir / f"frame_{angle:03d}.png", "wb") as f:
+                        f.write(png)
+                logger.debug(f"Frame {angle} deg done")
+    finally:
+        if writer is not None:
+            writer.close()
+
+    result = output if writer is not None else frames_dir
+    logger.info(f"Rendered {len(angles)} frames to {result}")
+    return result
+
+# ================================
+# SWEEP THUMBNAILS
+# ================================
+
+def render_variant_thumbnails(variants_dir, max_workers=None):
+    """
+    Render a nozzle-region thumbnail for every converted variant of a sweep, in parallel.
+
+    Each variant is rendered in its own worker process, since every variant has
+    a different geometry.
+
+    Returns:
+        Dictionary of variant folder name -> thumbnail path (None if rendering failed)
+    """
+    jobs = []
+    for root_file in sorted(Path(variants_dir).glob("*/MAIA_*.xml.root")):
+        jobs.append((str(root_file), str(root_file.with_name(THUMBNAIL_FILENAME))))
+    if not jobs:
+        logger.warning(f"No converted variants (MAIA_*.xml.root) in {variants_dir}")
+        return {}
+
+    thumbnails = {}
+    with _spawn_pool(max_workers, max_tasks_per_child=1) as pool:
+        for root_file, output_path, error in pool.map(_render_thumbnail, jobs):
+            thumbnails[Path(root_file).parent.name] = output_path
+            if error:
+                logger.error(f"Thumbnail failed for {root_file}: {error}")
+    logger.info(f"Rendered {sum(p is not None for p in thumbnails.values())}/{len(jobs)} thumbnails")
+    return thumbnails
+
+# ================================
+# MAIN EXECUTION
+# ================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Offscreen geometry animations and nozzle thumbnails')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    spin = sub.add_parser('spin', help='Spinning animation of one geometry')
+    spin.add_argument('root_file', nargs='?', default=GEOMETRY_FILE)
+    spin.add_argument('-o', '--output', default='spin.gif', help='.gif or .mp4')
+    spin.add_argument('--step', type=int, default=ANGLE_STEP, help='Degrees between frames')
+    spin.add_argument('--fps', type=int, default=FPS)
+    spin.add_argument('--workers', type=int, default=None)
+    spin.add_argument('--raytrace', action='store_true', default=RAYTRACE, help='Raytraced frames (needs a display, e.g. xvfb-run)')
+
+    thumbs = sub.add_parser('thumbnails', help='Nozzle thumbnails for every variant of a sweep')
+    thumbs.add_argument('variants_dir')
+    thumbs.add_argument('--workers', type=int, default=None)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.command == 'spin':
+        render_spin(args.root_file, args.output, args.step, args.fps, max_workers=args.workers, raytrace=args.raytrace)
+    else:
+        render_variant_thumbnails(args.variants_dir, args.workers)
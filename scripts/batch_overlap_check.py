@@ -0,0 +1,278 @@
+import json
+import time
+import logging
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from geo_cache import compact_tree_hash, converted_tree_hash
+from nozzle_volumes import NOZZLE_VOLUME_PREFIXES, is_nozzle_volume, find_nozzle_volumes
+
+## $ python batch_overlap_check.py sweep_dir/*/MAIA_*.xml.root --workers 8   check a converted sweep
+## $ python batch_overlap_check.py MAIA.xml.root --report overlap_report.json  check one variant
+
+logger = logging.getLogger(__name__)
+
+# ================================
+# CONFIGURABLE PARAMETERS
+# ================================
+
+# Only the nozzle volumes (NOZZLE_VOLUME_PREFIXES), their daughters and their neighbours are
+# checked: a mother that is not the top volume is checked with all its daughters, while in
+# the top volume only the nozzle nodes are checked against the siblings they touch
+
+OVERLAP_TOLERANCE = 0.001  # cm, same as highlight_overlaps.py
+SAMPLING_POINTS = 0        # > 0 adds a random-sampling pass with this many points per checked volume
+
+REPORT_FILENAME = "overlap_report.json"
+
+# ================================
+# CHECKING (runs inside a worker process)
+# ================================
+
+def _node_extent(node):
+    """Axis-aligned bounding box of a placed node in the frame of its mother, as (min, max) arrays"""
+    import numpy as np
+    shape = node.GetVolume().GetShape()
+    origin = shape.GetOrigin()
+    half = (shape.GetDX(), shape.GetDY(), shape.GetDZ())
+    matrix = node.GetMatrix()
+    corners = []
+    for signs in itertools.product((-1.0, 1.0), repeat=3):
+        local = np.array([origin[i] + sign * half[i] for i, sign in enumerate(signs)])
+        master = np.zeros(3)
+        matrix.LocalToMaster(local, master)
+        corners.append(master)
+    corners = np.array(corners)
+    return corners.min(axis=0), corners.max(axis=0)
+
+def check_sibling_overlaps(geom, mother, tolerance=OVERLAP_TOLERANCE, prefixes=NOZZLE_VOLUME_PREFIXES):
+    """
+    Check the nozzle nodes of a mother against their sibling nodes, without checking the whole mother.
+
+    Siblings whose bounding boxes do not overlap a nozzle node by more than the tolerance are
+    skipped; the remaining pairs get the same mesh-point check TGeo runs for node pairs.
+
+    Returns:
+        List of TGeoOverlap
+    """
+    checker = geom.GetGeomChecker()
+    nodes = [mother.GetNode(j) for j in range(mother.GetNdaughters())]
+    extents = [_node_extent(node) for node in nodes]
+    is_nozzle = [is_nozzle_volume(node.GetVolume().GetName(), prefixes) for node in nodes]
+    found = []
+    for i, node in enumerate(nodes):
+        if not is_nozzle[i]:
+            continue
+        low1, high1 = extents[i]
+        for j, other in enumerate(nodes):
+            # Pairs of nozzle nodes are checked once
+            if j == i or (is_nozzle[j] and j < i):
+                continue
+            low2, high2 = extents[j]
+            if (low1 >= high2 - tolerance).any() or (low2 >= high1 - tolerance).any():
+                continue
+            overlap = checker.MakeCheckOverlap(f"{mother.GetName()}/{node.GetName()} overlapping {other.GetName()}",
+                                               node.GetVolume(), other.GetVolume(),
+                                               node.GetMatrix(), other.GetMatrix(), True, tolerance)
+            if overlap:
+                found.append(overlap)
+    return found
+
+def check_root_file(root_file, tolerance=OVERLAP_TOLERANCE, sampling_points=SAMPLING_POINTS,
+                    prefixes=NOZZLE_VOLUME_PREFIXES):
+    """
+    Run TGeo overlap checks restricted to the nozzle subtrees of one geometry.
+
+    The top volume is never passed to CheckOverlaps, which would walk the whole detector:
+    nozzle nodes placed there are checked against their siblings only. Only overlaps that
+    involve a nozzle volume fail the check; any others found while checking the other
+    mothers are reported as unrelated.
+
+    Returns:
+        Report dictionary (see write_report)
+    """
+    import ROOT
+    ROOT.gROOT.SetBatch(True)
+    ROOT.gErrorIgnoreLevel = ROOT.kWarning
+
+    start = time.time()
+    ROOT.TGeoManager.Import(str(root_file))
+    geom = ROOT.gGeoManager
+    if not geom:
+        raise RuntimeError(f"Could not import geometry from {root_file}")
+
+    nozzle_volumes, mothers = find_nozzle_volumes(geom, prefixes)
+    if not nozzle_volumes:
+        raise RuntimeError(f"No volumes matching {prefixes} in {root_file}")
+
+    top_name = geom.GetTopVolume().GetName()
+    top_mothers = [v for v in mothers if v.GetName() == top_name]
+    mothers = [v for v in mothers if v.GetName() != top_name]
+
+    geom.ClearOverlaps()
+    for volume in mothers + nozzle_volumes:
+        volume.CheckOverlaps(tolerance, "")
+        if sampling_points > 0:
+            volume.CheckOverlaps(tolerance, f"s{sampling_points}")
+    sibling_overlaps = []
+    for volume in top_mothers:
+        sibling_overlaps.extend(check_sibling_overlaps(geom, volume, tolerance, prefixes))
+
+    found = geom.GetListOfOverlaps()
+    found = [found.At(i) for i in range(found.GetEntries() if found else 0)]
+    found += [ov for ov in sibling_overlaps if not any(ov == other for other in found)]
+
+    overlaps = []
+    for ov in found:
+        vol1, vol2 = ov.GetVolume1(), ov.GetVolume2()
+        name1 = vol1.GetName() if vol1 else None
+        name2 = vol2.GetName() if vol2 else None
+        overlaps.append({
+            "volume1": name1,
+            "volume2": name2,
+            "kind": "extrusion" if ov.IsExtrusion() else "overlap",
+            "distance_cm": float(ov.GetOverlap()),
+            "description": ov.GetTitle(),
+            "involves_nozzle": any(name and is_nozzle_volume(name, prefixes) for name in (name1, name2)),
+        })
+
+    nozzle_overlaps = [ov for ov in overlaps if ov["involves_nozzle"]]
+    return {
+        "root_file": str(root_file),
+        "geometry_hash": converted_tree_hash(root_file),
+        "tolerance_cm": tolerance,
+        "sampling_points": sampling_points,
+        "checked_volumes": sorted(v.GetName() for v in nozzle_volumes),
+        "checked_mothers": sorted(v.GetName() for v in mothers),
+        "sibling_checked_mothers": sorted(v.GetName() for v in top_mothers),
+        "overlaps": nozzle_overlaps,
+        "unrelated_overlaps": [ov for ov in overlaps if not ov["involves_nozzle"]],
+        "passed": not nozzle_overlaps,
+        "seconds": time.time() - start,
+    }
+
+# ================================
+# REPORTS
+# ================================
+
+def report_path_for(root_file):
+    return Path(root_file).with_name(REPORT_FILENAME)
+
+def write_report(report, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return Path(path)
+
+def load_report(variant_folder, geometry_hash=None):
+    """
+    Return the overlap report of a variant folder, or None if it was never checked.
+
+    With geometry_hash (compact_tree_hash of the variant's MAIA XML), a report made from
+    another geometry, or one that does not record its geometry, is treated as missing.
+    """
+    path = Path(variant_folder) / REPORT_FILENAME
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        report = json.load(f)
+    if geometry_hash is not None and report.get("geometry_hash") != geometry_hash:
+        return None
+    return report
+
+def variant_geometry_hash(variant_folder):
+    """compact_tree_hash of the MAIA XML of a variant folder, or None if it has none or cannot be hashed."""
+    maia = next(iter(sorted(Path(variant_folder).glob("MAIA_*.xml"))), None)
+    if maia is None:
+        return None
+    try:
+        return compact_tree_hash(maia)
+    except (ValueError, FileNotFoundError) as e:
+        logger.warning(f"Cannot hash {maia}: {e}")
+        return None
+
+def overlap_gate(variant_folder, require_report=False):
+    """
+    Decide whether a variant may be submitted.
+
+    Only a report made from the variant's current geometry counts; a stale one
+    (e.g. from before the variant was regenerated) is treated as missing.
+
+    Returns:
+        (allowed, reason)
+    """
+    geometry_hash = variant_geometry_hash(variant_folder)
+    report = load_report(variant_folder, geometry_hash) if geometry_hash else None
+    if report is None:
+        return (not require_report), "no overlap report for the current geometry"
+    if report.get("error"):
+        return False, f"overlap check failed: {report['error']}"
+    if not report["passed"]:
+        pairs = ", ".join(f"{ov['volume1']}/{ov['volume2']} ({ov['distance_cm']:.4g} cm)"
+                          for ov in report["overlaps"][:3])
+        return False, f"{len(report['overlaps'])} nozzle overlap(s): {pairs}"
+    return True, "passed"
+
+# ================================
+# BATCH EXECUTION
+# ================================
+
+def _check_job(job):
+    """Worker entry point: check one file and write its report. Returns the report."""
+    root_file, report_path, tolerance, sampling_points = job
+    try:
+        report = check_root_file(root_file, tolerance, sampling_points)
+    except Exception as e:
+        report = {"root_file": str(root_file), "geometry_hash": converted_tree_hash(root_file),
+                  "passed": False, "error": str(e), "overlaps": []}
+    write_report(report, report_path)
+    return report
+
+def check_variants(root_files, max_workers=None, tolerance=OVERLAP_TOLERANCE, sampling_points=SAMPLING_POINTS):
+    """
+    Check many converted variants in parallel, one fresh process per variant.
+
+    ROOT keeps a single global geometry per process, so workers are spawned
+    (not forked) and never reused.
+
+    Returns:
+        Dictionary of root_file -> report; reports are also written next to each file
+    """
+    jobs = [(str(f), str(report_path_for(f)), tolerance, sampling_points) for f in root_files]
+    reports = {}
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"),
+                             max_tasks_per_child=1) as pool:
+        for report in pool.map(_check_job, jobs):
+            reports[report["root_file"]] = report
+            status = "PASS" if report["passed"] else ("ERROR" if report.get("error") else "FAIL")
+            logger.info(f"[{status}] {report['root_file']}: {len(report['overlaps'])} nozzle overlap(s)")
+    n_failed = sum(not report["passed"] for report in reports.values())
+    logger.info(f"Overlap check: {len(reports) - n_failed} passed, {n_failed} failed")
+    return reports
+
+# ================================
+# MAIN EXECUTION
+# ================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Check nozzle volumes of converted variants for overlaps')
+    parser.add_argument('root_files', nargs='+')
+    parser.add_argument('--report', default=None, help='Report path (only with a single input)')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--tolerance', type=float, default=OVERLAP_TOLERANCE, help='Overlap tolerance [cm]')
+    parser.add_argument('--sampling', type=int, default=SAMPLING_POINTS, help='Sampling points per volume')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.report:
+        if len(args.root_files) != 1:
+            parser.error('--report requires exactly one input file')
+        reports = [_check_job((args.root_files[0], args.report, args.tolerance, args.sampling))]
+    else:
+        reports = check_variants(args.root_files, args.workers, args.tolerance, args.sampling).values()
+    if not all(report["passed"] for report in reports):
+        raise SystemExit(1)
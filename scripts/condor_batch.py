@@ -0,0 +1,212 @@
+import re
+import subprocess
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# ================================
+# CONSTANTS
+# ================================
+
+CLUSTER_SUBMIT_FILENAME = "nozzle_sweep.submit"
+ITEMDATA_FILENAME = "nozzle_sweep_items.txt"
+
+# Per-job columns of the itemdata file, in order
+ITEM_COLUMNS = ("variant_dir", "maia_file", "request_cpus", "request_memory_mb", "request_disk_mb", "max_runtime_s")
+
+# ================================
+# SUBMIT DESCRIPTION
+# ================================
+
+def write_cluster_submit(variants_dir, jobs, executable="run_sim.sh"):
+    """
+    Write one submit description that queues every variant as a job of a single cluster.
+
+    Args:
+        variants_dir: Sweep directory; the submit and itemdata files are written here
+        jobs: List of dictionaries with the ITEM_COLUMNS keys, in the order they should be queued
+        executable: Job script, relative to variants_dir
+
+    Returns:
+        Path to the submit file
+    """
+    variants_dir = Path(variants_dir).resolve()
+    itemdata_path = variants_dir / ITEMDATA_FILENAME
+    with open(itemdata_path, "w", encoding="utf-8") as f:
+        for job in jobs:
+            values = [str(job[column]) for column in ITEM_COLUMNS]
+            for value in values:
+                if "," in value or any(c.isspace() for c in value):
+                    raise ValueError(f"itemdata values cannot contain commas or whitespace: {value!r}")
+            f.write(", ".join(values) + "\n")
+
+    submit_path = variants_dir / CLUSTER_SUBMIT_FILENAME
+    with open(submit_path, "w", encoding="utf-8") as f:
+        f.write(
+            f"executable = {variants_dir / executable}\n"
+            "initialdir = $(variant_dir)\n"
+            "arguments = .\n"
+            "transfer_input_files = $(maia_file), steer_sim.py\n"
+            "output = condor.out\n"
+            "error = condor.err\n"
+            f"log = {variants_dir / 'nozzle_sweep.log'}\n"
+            "request_cpus = $(request_cpus)\n"
+            "request_memory = $(request_memory_mb)MB\n"
+            "request_disk = $(request_disk_mb)MB\n"
+            "allowed_execute_duration = $(max_runtime_s)\n"
+            "should_transfer_files = YES\n"
+            "when_to_transfer_output = ON_EXIT\n"
+            "+HasSingularity = true\nrequirements = (HasSingularity == true || HasApptainer == true)\n"
+            f"queue {', '.join(ITEM_COLUMNS)} from {ITEMDATA_FILENAME}\n"
+        )
+    logger.info(f"Wrote cluster submit file for {len(jobs)} jobs: {submit_path}")
+    return submit_path
+
+def write_command_cluster_submit(submit_dir, name, jobs):
+    """
+    Write a cluster submit description running one prepared shell script per job.
+
+    Used by the pipeline's Condor backend for arbitrary stages; files are read and
+    written in place on the shared filesystem, so nothing is transferred.
+
+    Args:
+        submit_dir: Directory for the submit/itemdata/log files
+        name: Stage name, used for the file names
+        jobs: List of dictionaries with 'variant_dir', 'script' and optional 'requests'
+              (as returned by sim_cost_model.condor_requests)
+
+    Returns:
+        Path to the submit file
+    """
+    submit_dir = Path(submit_dir).resolve()
+    columns = ("variant_dir", "script", "request_cpus", "request_memory_mb", "request_disk_mb", "max_runtime_s")
+    defaults = {"request_cpus": 1, "request_memory_mb": 2048, "request_disk_mb": 2048, "max_runtime_s": 86400}
+
+    itemdata_name = f"pipeline_{name}_items.txt"
+    with open(submit_dir / itemdata_name, "w", encoding="utf-8") as f:
+        for job in jobs:
+            row = dict(defaults, **job.get("requests", {}))
+            row["variant_dir"] = Path(job["variant_dir"]).resolve()
+            row["script"] = Path(job["script"]).resolve()
+            values = [str(row[column]) for column in columns]
+            for value in values:
+                if "," in value or any(c.isspace() for c in value):
+                    raise ValueError(f"itemdata values cannot contain commas or whitespace: {value!r}")
+            f.write(", ".join(values) + "\n")
+
+    submit_path = submit_dir / f"pipeline_{name}.submit"
+    with open(submit_path, "w", encoding="utf-8") as f:
+        f.write(
+            "executable = $(script)\n"
+            "initialdir = $(variant_dir)\n"
+            f"output = pipeline_{name}.condor.out\n"
+            f"error = pipeline_{name}.condor.err\n"
+            f"log = {submit_dir / f'pipeline_{name}.log'}\n"
+            "request_cpus = $(request_cpus)\n"
+            "request_memory = $(request_memory_mb)MB\n"
+            "request_disk = $(request_disk_mb)MB\n"
+            "allowed_execute_duration = $(max_runtime_s)\n"
+            "should_transfer_files = NO\n"
+            "+HasSingularity = true\nrequirements = (HasSingularity == true || HasApptainer == true)\n"
+            f"queue {', '.join(columns)} from {itemdata_name}\n"
+        )
+    logger.info(f"Wrote {name} cluster submit file for {len(jobs)} jobs: {submit_path}")
+    return submit_path
+
+# ================================
+# SUBMISSION BACKENDS
+# ================================
+
+class CondorSubmitter:
+    """Submits a submit description with the real condor_submit."""
+
+    def submit(self, submit_path):
+        """
+        Submit a description file.
+
+        Returns:
+            (cluster_id, number_of_jobs)
+        """
+        submit_path = Path(submit_path)
+        result = subprocess.run(["condor_submit", submit_path.name], cwd=submit_path.parent,
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"condor_submit failed for {submit_path}:\n{result.stderr}")
+        match = re.search(r"(\d+) job\(s\) submitted to cluster (\d+)", result.stdout)
+        if not match:
+            raise RuntimeError(f"Could not parse condor_submit output:\n{result.stdout}")
+        return int(match.group(2)), int(match.group(1))
+
+class MockCondorSubmitter:
+    """
+    Local stand-in for condor_submit, for testing sweeps without a pool.
+
+    Parses the submit description and its `queue ... from` itemdata the way
+    condor_submit does for our files and records the expanded job ads.
+    """
+
+    def __init__(self, first_cluster_id=1):
+        self.next_cluster_id = first_cluster_id
+        self.jobs = []
+
+    @staticmethod
+    def _expand(value, macros):
+        return re.sub(r"\$\((\w+)\)", lambda m: macros.get(m.group(1), m.group(0)), value)
+
+    def parse(self, submit_path):
+        """
+        Expand a submit description into job ads.
+
+        Returns:
+            List of dictionaries, one per queued job
+        """
+        submit_path = Path(submit_path)
+        commands = {}
+        queue_line = None
+        with open(submit_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                if line.lower().startswith("queue"):
+                    queue_line = line
+                    continue
+                key, _, value = line.partition("=")
+                commands[key.strip()] = value.strip()
+        if queue_line is None:
+            raise ValueError(f"No queue statement in {submit_path}")
+
+        match = re.match(r"queue\s+(.+?)\s+from\s+(\S+)$", queue_line, re.IGNORECASE)
+        if match:
+            names = [n.strip() for n in match.group(1).split(",")]
+            itemdata_path = submit_path.parent / match.group(2)
+            with open(itemdata_path, "r", encoding="utf-8") as f:
+                items = [dict(zip(names, (v.strip() for v in line.split(",")))) for line in f if line.strip()]
+        else:
+            count = queue_line.split()[1:] or ["1"]
+            items = [{} for _ in range(int(count[0]))]
+
+        jobs = []
+        for proc_id, item in enumerate(items):
+            ad = {key: self._expand(value, item) for key, value in commands.items()}
+            ad["ProcId"] = proc_id
+            jobs.append(ad)
+        return jobs
+
+    def submit(self, submit_path):
+        jobs = self.parse(submit_path)
+        cluster_id = self.next_cluster_id
+        self.next_cluster_id += 1
+        for ad in jobs:
+            ad["ClusterId"] = cluster_id
+            initialdir = Path(ad.get("initialdir", "."))
+            if not initialdir.is_dir():
+                raise RuntimeError(f"initialdir of job {cluster_id}.{ad['ProcId']} does not exist: {initialdir}")
+        self.jobs.extend(jobs)
+        logger.info(f"[mock] {len(jobs)} job(s) submitted to cluster {cluster_id}.")
+        return cluster_id, len(jobs)
+
+def get_submitter(mock=False):
+    """Return the submission backend: the local mock or the real condor_submit."""
+    return MockCondorSubmitter() if mock else CondorSubmitter()
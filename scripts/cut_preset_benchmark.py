@@ -0,0 +1,238 @@
+import xml.etree.ElementTree as ET
+import csv
+import math
+import shutil
+import logging
+from pathlib import Path
+
+import numpy as np
+
+from NozzleCreationv2 import (
+    CUT_PRESETS, apply_region_cut_preset, cut_preset_steering_overrides, BASE_GEOMETRY_PATH,
+    STEERING_TEMPLATE_FILENAME
+)
+from steering_builder import SteeringConfig
+from sim_cost_model import parse_sim_log_time
+
+## $ python cut_preset_benchmark.py prepare path/to/variant_folder bench_dir
+##   -> one copy of the variant per preset, then run ddsim in each (condor or locally)
+## $ python cut_preset_benchmark.py compare bench_dir --reference baseline
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# ================================
+# CONFIGURABLE PARAMETERS
+# ================================
+
+# Collections whose hit distributions must not change when coarsening nozzle cuts
+BENCHMARK_COLLECTIONS = [
+    'ECalBarrelCollection', 'ECalEndcapCollection',
+    'VertexBarrelCollection', 'VertexEndcapCollection',
+    'InnerTrackerBarrelCollection', 'InnerTrackerEndcapCollection',
+]
+
+# Binning of the hit distributions compared between presets
+R_BINS = np.linspace(0, 2000, 101)      # mm
+Z_BINS = np.linspace(-2600, 2600, 105)  # mm
+EDEP_BINS = np.logspace(-7, 0, 71)      # GeV
+
+max_events = -1
+
+# ================================
+# PREPARATION
+# ================================
+
+def prepare_preset_runs(variant_folder, output_dir, steering_template_path, presets=None):
+    """
+    Copy a variant folder once per cut preset and apply the preset to it.
+
+    Args:
+        variant_folder: Generated variant folder (MAIA_*.xml + Nozzle_*.xml + sub-detectors)
+        output_dir: Directory where one folder per preset is created
+        steering_template_path: Steering file template
+        presets: Preset names (default: all CUT_PRESETS)
+
+    Returns:
+        List of created run folders
+    """
+    variant_folder = Path(variant_folder)
+    output_dir = Path(output_dir)
+    presets = presets or sorted(CUT_PRESETS)
+
+    run_folders = []
+    for preset in presets:
+        run_folder = output_dir / f"{variant_folder.name}__cuts_{preset}"
+        if run_folder.exists():
+            shutil.rmtree(run_folder)
+        shutil.copytree(variant_folder, run_folder,
+                        ignore=shutil.ignore_patterns('*.slcio', '*.root', 'sim.log', 'condor.*'))
+
+        maia_path = next(run_folder.glob("MAIA_*.xml"))
+        tree = ET.parse(maia_path)
+        apply_region_cut_preset(tree.getroot(), preset)
+        ET.indent(tree, space='\t')
+        tree.write(maia_path, encoding='utf-8', xml_declaration=True)
+
+        SteeringConfig(steering_template_path).with_job(
+            maia_path.resolve(), f"mumu_H_bb_100E_{run_folder.name}.slcio",
+            extra=cut_preset_steering_overrides(preset)
+        ).write(run_folder / "steer_sim.py")
+
+        logger.info(f"Prepared preset run: {run_folder}")
+        run_folders.append(run_folder)
+    return run_folders
+
+# ================================
+# HIT SUMMARIES
+# ================================
+
+def collect_hit_summary(slcio_path):
+    """
+    Read a simulated file once and summarize the benchmark collections.
+
+    Returns:
+        Dictionary of collection -> {'hits_per_event', 'edep_per_event', 'r', 'z', 'edep'}
+        where r/z/edep are histogram counts on R_BINS/Z_BINS/EDEP_BINS
+    """
+    import pyLCIO
+
+    summary = {col: {'hits': [], 'edep_sum': [],
+                     'r': np.zeros(len(R_BINS) - 1), 'z': np.zeros(len(Z_BINS) - 1),
+                     'edep': np.zeros(len(EDEP_BINS) - 1)}
+               for col in BENCHMARK_COLLECTIONS}
+
+    reader = pyLCIO.IOIMPL.LCFactory.getInstance().createLCReader()
+    reader.open(str(slcio_path))
+    event_count = 0
+    for event in reader:
+        if max_events > 0 and event_count >= max_events:
+            break
+        names = set(event.getCollectionNames())
+        for col_name in BENCHMARK_COLLECTIONS:
+            entry = summary[col_name]
+            if col_name not in names:
+                entry['hits'].append(0)
+                entry['edep_sum'].append(0.0)
+                continue
+            col = event.getCollection(col_name)
+            n = col.getNumberOfElements()
+            pos = np.empty((n, 3))
+            edep = np.empty(n)
+            for i in range(n):
+                hit = col.getElementAt(i)
+                p = hit.getPosition()
+                pos[i] = (p[0], p[1], p[2])
+                edep[i] = hit.getEDep() if hasattr(hit, 'getEDep') else hit.getEnergy()
+            r = np.hypot(pos[:, 0], pos[:, 1])
+            entry['hits'].append(n)
+            entry['edep_sum'].append(float(edep.sum()))
+            entry['r'] += np.histogram(r, R_BINS)[0]
+            entry['z'] += np.histogram(pos[:, 2], Z_BINS)[0]
+            entry['edep'] += np.histogram(edep, EDEP_BINS)[0]
+        event_count += 1
+    reader.close()
+
+    for entry in summary.values():
+        entry['hits_per_event'] = float(np.mean(entry.pop('hits'))) if event_count else 0.0
+        entry['edep_per_event'] = float(np.mean(entry.pop('edep_sum'))) if event_count else 0.0
+    return summary
+
+def shape_distance(counts_a, counts_b):
+    """Kolmogorov distance between two binned distributions (0 = identical shapes)."""
+    if counts_a.sum() == 0 or counts_b.sum() == 0:
+        return math.nan
+    cdf_a = np.cumsum(counts_a) / counts_a.sum()
+    cdf_b = np.cumsum(counts_b) / counts_b.sum()
+    return float(np.max(np.abs(cdf_a - cdf_b)))
+
+# ================================
+# COMPARISON
+# ================================
+
+def compare_presets(bench_dir, reference="baseline", output_csv="cut_preset_benchmark.csv"):
+    """
+    Compare ddsim wall time and downstream hit distributions of every preset to a reference.
+
+    Returns:
+        List of result rows (also written to output_csv)
+    """
+    runs = {}
+    for run_folder in sorted(Path(bench_dir).iterdir()):
+        if not run_folder.is_dir() or "__cuts_" not in run_folder.name:
+            continue
+        preset = run_folder.name.split("__cuts_", 1)[1]
+        outputs = sorted(run_folder.glob("*.slcio"))
+        if not outputs:
+            logger.warning(f"No simulated output in {run_folder}, skipping")
+            continue
+        logger.info(f"Summarizing {run_folder.name}")
+        runs[preset] = {
+            "wall_time_s": parse_sim_log_time(run_folder / "sim.log"),
+            "summary": collect_hit_summary(outputs[0]),
+        }
+
+    if reference not in runs:
+        raise ValueError(f"Reference preset '{reference}' has no finished run in {bench_dir}")
+    ref = runs[reference]
+
+    rows = []
+    for preset, run in runs.items():
+        row = {"preset": preset, "wall_time_s": run["wall_time_s"]}
+        if run["wall_time_s"] and ref["wall_time_s"]:
+            row["speedup"] = ref["wall_time_s"] / run["wall_time_s"]
+        for col_name in BENCHMARK_COLLECTIONS:
+            cur, base = run["summary"][col_name], ref["summary"][col_name]
+            row[f"{col_name}_hits_ratio"] = (cur["hits_per_event"] / base["hits_per_event"]
+                                             if base["hits_per_event"] else math.nan)
+            row[f"{col_name}_edep_ratio"] = (cur["edep_per_event"] / base["edep_per_event"]
+                                             if base["edep_per_event"] else math.nan)
+            row[f"{col_name}_shape_r"] = shape_distance(cur["r"], base["r"])
+            row[f"{col_name}_shape_z"] = shape_distance(cur["z"], base["z"])
+            row[f"{col_name}_shape_edep"] = shape_distance(cur["edep"], base["edep"])
+        rows.append(row)
+
+    fieldnames = list(rows[0].keys()) if rows else []
+    for row in rows:
+        fieldnames += [k for k in row if k not in fieldnames]
+    with open(output_csv, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    logger.info(f"Wrote benchmark table to {output_csv}")
+
+    for row in rows:
+        speedup = row.get("speedup")
+        speedup_str = f"{speedup:.2f}x" if speedup else "n/a"
+        worst_shape = np.nanmax([v for k, v in row.items() if "_shape_" in k] or [math.nan])
+        print(f"{row['preset']:20s} time={row['wall_time_s']} s  speedup={speedup_str}  "
+              f"worst shape distance={worst_shape:.4f}")
+    return rows
+
+# ================================
+# MAIN EXECUTION
+# ================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark production-cut presets')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    prep = sub.add_parser('prepare', help='Create one run folder per preset from a variant folder')
+    prep.add_argument('variant_folder')
+    prep.add_argument('bench_dir')
+    prep.add_argument('--presets', nargs='+', choices=sorted(CUT_PRESETS), default=None)
+    prep.add_argument('--steering-template',
+                      default=str(Path(BASE_GEOMETRY_PATH).parent.parent / "steeringFiles" / STEERING_TEMPLATE_FILENAME))
+
+    comp = sub.add_parser('compare', help='Compare finished preset runs against a reference preset')
+    comp.add_argument('bench_dir')
+    comp.add_argument('--reference', default='baseline')
+    comp.add_argument('-o', '--output', default='cut_preset_benchmark.csv')
+
+    args = parser.parse_args()
+    if args.command == 'prepare':
+        prepare_preset_runs(args.variant_folder, args.bench_dir, args.steering_template, args.presets)
+    else:
+        compare_presets(args.bench_dir, args.reference, args.output)
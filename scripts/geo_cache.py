@@ -0,0 +1,270 @@
+import os
+import time
+import shutil
+import hashlib
+import subprocess
+import logging
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+## $ python geo_cache.py sweep_dir/*/MAIA_*.xml --workers 8    convert a sweep, reusing cached .root files
+## $ python geo_cache.py MAIA.xml --output MAIA.xml.root        convert one compact file (used by pipeline jobs)
+
+logger = logging.getLogger(__name__)
+
+# ================================
+# CONFIGURABLE PARAMETERS
+# ================================
+
+DEFAULT_CACHE_DIR = Path(os.environ.get("NOZZLE_GEO_CACHE", Path.home() / ".cache" / "nozzle_geo"))
+
+GEO_CONVERTER_COMMAND = ["geoConverter", "-compact2tgeo"]
+
+# Compact elements whose 'ref' attribute pulls another file into the geometry
+INCLUDE_TAGS = ("include", "gdmlFile", "alignment", "file")
+
+# Written next to each output so an unchanged variant is skipped without touching the cache
+HASH_SIDECAR_SUFFIX = ".treehash"
+
+# ================================
+# COMPACT TREE HASHING
+# ================================
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def compact_tree_files(xml_path):
+    """
+    Resolve the include tree of a compact file.
+
+    Refs are resolved relative to the including file. Refs to environment-provided
+    files (`${DD4hepINSTALL}/...`) are part of the software release, not the variant,
+    and are returned unresolved.
+
+    Returns:
+        List of (ref, resolved Path or None) in traversal order, starting with ("", xml_path)
+    """
+    xml_path = Path(xml_path).resolve()
+    files = [("", xml_path)]
+    seen = {xml_path}
+    stack = [xml_path]
+    while stack:
+        current = stack.pop()
+        try:
+            root = ET.parse(current).getroot()
+        except ET.ParseError as e:
+            raise ValueError(f"Cannot parse compact file {current}: {e}")
+        for elem in root.iter():
+            if elem.tag not in INCLUDE_TAGS or not elem.get("ref"):
+                continue
+            ref = elem.get("ref")
+            if "${" in ref:
+                files.append((ref, None))
+                continue
+            path = (current.parent / ref).resolve()
+            if path in seen:
+                continue
+            seen.add(path)
+            files.append((ref, path))
+            if path.suffix == ".xml" and path.exists():
+                stack.append(path)
+    return files
+
+def compact_tree_hash(xml_path):
+    """
+    Hash of a compact file and everything it includes.
+
+    Two compact files hash equal exactly when geoConverter would see the same
+    geometry, regardless of where the variant folder lives.
+    """
+    digest = hashlib.sha256()
+    digest.update(" ".join(GEO_CONVERTER_COMMAND).encode())
+    for ref, path in compact_tree_files(xml_path):
+        digest.update(ref.encode())
+        if path is None:
+            # Environment refs: hash the expanded location so a release change invalidates the cache
+            digest.update(os.path.expandvars(ref).encode())
+        elif path.exists():
+            digest.update(_file_digest(path).encode())
+        else:
+            raise FileNotFoundError(f"Compact file {xml_path} includes missing file {path}")
+    return digest.hexdigest()[:32]
+
+# ================================
+# CONVERSION CACHE
+# ================================
+
+class GeoConversionCache:
+    """Content-addressed store of converted TGeo .root files, keyed by compact tree hash."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, tree_hash):
+        return self.cache_dir / tree_hash[:2] / f"{tree_hash}.root"
+
+    def lookup(self, tree_hash):
+        path = self.path_for(tree_hash)
+        return path if path.exists() else None
+
+    def store(self, tree_hash, root_path):
+        """Copy a converted file into the cache (atomically, so concurrent workers never see partial files)."""
+        path = self.path_for(tree_hash)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        shutil.copyfile(root_path, tmp_path)
+        os.replace(tmp_path, path)
+        return path
+
+    def materialize(self, tree_hash, output_path):
+        """Place the cached file at output_path, hard-linking when possible."""
+        cached = self.path_for(tree_hash)
+        output_path = Path(output_path)
+        if output_path.exists() or output_path.is_symlink():
+            output_path.unlink()
+        try:
+            os.link(cached, output_path)
+        except OSError:
+            shutil.copyfile(cached, output_path)
+        return output_path
+
+# ================================
+# CONVERSION
+# ================================
+
+def _read_sidecar(output_path):
+    try:
+        with open(f"{output_path}{HASH_SIDECAR_SUFFIX}", "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def _write_sidecar(output_path, tree_hash):
+    with open(f"{output_path}{HASH_SIDECAR_SUFFIX}", "w", encoding="utf-8") as f:
+        f.write(tree_hash + "\n")
+
+def converted_tree_hash(output_path):
+    """compact_tree_hash of the compact file a .root file was converted from, or None if unknown."""
+    return _read_sidecar(output_path)
+
+def convert_compact(xml_path, output_path=None, cache_dir=DEFAULT_CACHE_DIR, tree_hash=None):
+    """
+    Convert a compact file to a TGeo .root file, reusing a cached conversion if one exists.
+
+    Args:
+        xml_path: Compact (MAIA) XML file
+        output_path: Output .root file (default: <xml_path>.root, as before)
+        cache_dir: Conversion cache directory
+        tree_hash: Precomputed compact_tree_hash of xml_path
+
+    Returns:
+        (output_path, source, seconds) where source is 'up-to-date', 'cache' or 'converted'
+    """
+    start = time.time()
+    xml_path = Path(xml_path)
+    output_path = Path(output_path or f"{xml_path}.root")
+    tree_hash = tree_hash or compact_tree_hash(xml_path)
+
+    if output_path.exists() and _read_sidecar(output_path) == tree_hash:
+        return output_path, "up-to-date", time.time() - start
+
+    cache = GeoConversionCache(cache_dir)
+    if cache.lookup(tree_hash) is not None:
+        cache.materialize(tree_hash, output_path)
+        _write_sidecar(output_path, tree_hash)
+        return output_path, "cache", time.time() - start
+
+    log_path = output_path.with_name("geoConverter.log")
+    with open(log_path, "w", encoding="utf-8") as log:
+        result = subprocess.run(GEO_CONVERTER_COMMAND + ["-input", str(xml_path), "-output", str(output_path)],
+                                stdout=log, stderr=subprocess.STDOUT)
+    if result.returncode != 0 or not output_path.exists():
+        raise RuntimeError(f"geoConverter failed for {xml_path} (see {log_path})")
+    cache.store(tree_hash, output_path)
+    _write_sidecar(output_path, tree_hash)
+    return output_path, "converted", time.time() - start
+
+def _convert_job(job):
+    """Process-pool entry point. Returns (xml_path, output_path, source, seconds, error)."""
+    xml_path, output_path, cache_dir, tree_hash = job
+    try:
+        output, source, seconds = convert_compact(xml_path, output_path, cache_dir, tree_hash)
+        return xml_path, output, source, seconds, None
+    except Exception as e:
+        return xml_path, None, "failed", 0.0, str(e)
+
+def convert_variants(xml_paths, max_workers=None, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Convert many compact files in a process pool.
+
+    Files with identical compact trees are converted once: the first one of each
+    hash runs geoConverter, the others are filled from the cache afterwards.
+
+    Returns:
+        Dictionary of xml_path -> (output_path or None, source or 'failed', seconds, error)
+    """
+    groups = {}
+    results = {}
+    for xml_path in map(Path, xml_paths):
+        try:
+            groups.setdefault(compact_tree_hash(xml_path), []).append(xml_path)
+        except (ValueError, FileNotFoundError) as e:
+            logger.error(f"Cannot hash {xml_path}: {e}")
+            results[xml_path] = (None, "failed", 0.0, str(e))
+
+    def run(jobs):
+        if not jobs:
+            return
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+            for xml_path, output, source, seconds, error in pool.map(_convert_job, jobs):
+                results[Path(xml_path)] = (output, source, seconds, error)
+                if error:
+                    logger.error(f"Conversion failed for {xml_path}: {error}")
+                else:
+                    logger.info(f"{Path(xml_path).name}: {source} ({seconds:.1f} s)")
+
+    # First representative of every tree hash, then the duplicates (now cache hits)
+    run([(str(paths[0]), None, str(cache_dir), tree_hash) for tree_hash, paths in groups.items()])
+    run([(str(path), None, str(cache_dir), tree_hash) for tree_hash, paths in groups.items()
+         for path in paths[1:] if results[paths[0]][3] is None])
+    for paths in groups.values():
+        error = results[paths[0]][3]
+        for path in paths[1:]:
+            results.setdefault(path, (None, "failed", 0.0, error))
+
+    sources = [source for _, source, _, _ in results.values()]
+    logger.info(f"geoConverter: {sources.count('converted')} converted, {sources.count('cache')} from cache, "
+                f"{sources.count('up-to-date')} up to date, {sources.count('failed')} failed")
+    return results
+
+# ================================
+# MAIN EXECUTION
+# ================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Convert compact XML files to TGeo ROOT files with caching')
+    parser.add_argument('xml_files', nargs='+')
+    parser.add_argument('--output', default=None, help='Output file (only with a single input)')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--cache-dir', default=str(DEFAULT_CACHE_DIR))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.output:
+        if len(args.xml_files) != 1:
+            parser.error('--output requires exactly one input file')
+        output, source, seconds = convert_compact(args.xml_files[0], args.output, args.cache_dir)
+        logger.info(f"{output}: {source} ({seconds:.1f} s)")
+    else:
+        results = convert_variants(args.xml_files, args.workers, args.cache_dir)
+        if any(error for _, _, _, error in results.values()):
+            raise SystemExit(1)
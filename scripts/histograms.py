@@ -0,0 +1,416 @@
+import numpy as np
+
+## from histograms import Hist
+## h = Hist((50, 0, math.pi), name="theta")          1-D, 50 regular bins
+## h.fill(thetas, weights=energies)                    bulk fill from arrays
+## total = Hist.load("a.npz") + Hist.load("b.npz")     merge partial results (e.g. from worker processes)
+## total.to_root().Draw()                               ROOT only for rendering
+## fine = SparseHist2D(0.1, 0.1)                        unbounded 0.1 x 0.1 grid, only occupied bins stored
+## fine.to_hist((60, 260), (0, 100), 0.5, 0.5)         dense zoom / rebinned view without re-reading data
+
+# ================================
+# AXES
+# ================================
+
+class Axis:
+    """
+    Binning of one histogram dimension.
+
+    Bin 0 is the underflow and bin nbins + 1 the overflow, as in ROOT; a value equal
+    to the upper edge goes to the overflow and NaN is counted as overflow.
+    """
+
+    def __init__(self, edges, regular=False):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        if self.edges.ndim != 1 or len(self.edges) < 2 or np.any(np.diff(self.edges) <= 0):
+            raise ValueError("Axis edges must be a strictly increasing 1-D array of at least 2 values")
+        self.regular = regular
+
+    @classmethod
+    def regular_bins(cls, nbins, lo, hi):
+        return cls(np.linspace(lo, hi, int(nbins) + 1), regular=True)
+
+    @classmethod
+    def create(cls, spec):
+        """Axis from an Axis, a (nbins, lo, hi) tuple or an array of edges."""
+        if isinstance(spec, Axis):
+            return spec
+        if isinstance(spec, tuple) and len(spec) == 3 and float(spec[0]).is_integer():
+            return cls.regular_bins(*spec)
+        return cls(spec)
+
+    @property
+    def nbins(self):
+        return len(self.edges) - 1
+
+    @property
+    def lo(self):
+        return self.edges[0]
+
+    @property
+    def hi(self):
+        return self.edges[-1]
+
+    @property
+    def centers(self):
+        return 0.5 * (self.edges[1:] + self.edges[:-1])
+
+    def index(self, values):
+        """Bin index (including flow bins) of each value."""
+        values = np.asarray(values, dtype=np.float64)
+        if self.regular:
+            with np.errstate(invalid="ignore"):
+                scaled = (values - self.lo) * (self.nbins / (self.hi - self.lo))
+                idx = np.floor(np.clip(scaled, -1, self.nbins)).astype(np.int64) + 1
+        else:
+            idx = np.searchsorted(self.edges, values, side="right")
+        idx[np.isnan(values)] = self.nbins + 1
+        return idx
+
+    def __eq__(self, other):
+        return isinstance(other, Axis) and np.array_equal(self.edges, other.edges)
+
+# ================================
+# HISTOGRAMS
+# ================================
+
+class Hist:
+    """
+    N-dimensional weighted histogram backed by NumPy arrays.
+
+    Stores the sum of weights and of squared weights per bin (flow bins included),
+    plus the number of entries. Histograms with equal binning are merged with +.
+
+    Args:
+        *axes: One Axis, (nbins, lo, hi) tuple or edge array per dimension
+        name, title: Used for the ROOT conversion
+    """
+
+    def __init__(self, *axes, name="", title=""):
+        if not axes:
+            raise ValueError("A histogram needs at least one axis")
+        self.axes = [Axis.create(axis) for axis in axes]
+        self.name = name
+        self.title = title
+        shape = tuple(axis.nbins + 2 for axis in self.axes)
+        self.sumw = np.zeros(shape)
+        self.sumw2 = np.zeros(shape)
+        self.entries = 0
+
+    @property
+    def ndim(self):
+        return len(self.axes)
+
+    def fill(self, *values, weights=None):
+        """
+        Fill many values at once.
+
+        Args:
+            *values: One array per dimension (scalars are broadcast)
+            weights: Optional weight per value (or a scalar)
+        """
+        if len(values) != self.ndim:
+            raise ValueError(f"Expected {self.ndim} value arrays, got {len(values)}")
+        arrays = np.broadcast_arrays(*[np.asarray(v, dtype=np.float64) for v in values])
+        if arrays[0].size == 0:
+            return self
+        idx = tuple(axis.index(a.ravel()) for axis, a in zip(self.axes, arrays))
+        flat = np.ravel_multi_index(idx, self.sumw.shape)
+        if weights is None:
+            counts = np.bincount(flat, minlength=self.sumw.size).reshape(self.sumw.shape)
+            self.sumw += counts
+            self.sumw2 += counts
+        else:
+            w = np.broadcast_to(np.asarray(weights, dtype=np.float64), arrays[0].shape).ravel()
+            self.sumw += np.bincount(flat, weights=w, minlength=self.sumw.size).reshape(self.sumw.shape)
+            self.sumw2 += np.bincount(flat, weights=w * w, minlength=self.sumw.size).reshape(self.sumw.shape)
+        self.entries += flat.size
+        return self
+
+    def _inner(self, array, flow):
+        return array if flow else array[tuple(slice(1, -1) for _ in self.axes)]
+
+    def values(self, flow=False):
+        return self._inner(self.sumw, flow)
+
+    def variances(self, flow=False):
+        return self._inner(self.sumw2, flow)
+
+    def errors(self, flow=False):
+        return np.sqrt(self.variances(flow))
+
+    def integral(self, flow=False):
+        return float(self.values(flow).sum())
+
+    def empty_like(self):
+        return Hist(*self.axes, name=self.name, title=self.title)
+
+    def copy(self):
+        h = self.empty_like()
+        h.sumw, h.sumw2, h.entries = self.sumw.copy(), self.sumw2.copy(), self.entries
+        return h
+
+    def _check_compatible(self, other):
+        if not isinstance(other, Hist) or len(other.axes) != len(self.axes) or \
+                any(a != b for a, b in zip(self.axes, other.axes)):
+            raise ValueError("Histograms with different binning cannot be merged")
+
+    def __iadd__(self, other):
+        self._check_compatible(other)
+        self.sumw += other.sumw
+        self.sumw2 += other.sumw2
+        self.entries += other.entries
+        return self
+
+    def __add__(self, other):
+        return self.copy().__iadd__(other)
+
+    def __radd__(self, other):
+        # Allows sum() over a list of histograms
+        return self.copy() if other == 0 else self.__add__(other)
+
+    # ---- serialization ----
+
+    def to_dict(self, prefix=""):
+        data = {f"{prefix}kind": np.array("Hist"), f"{prefix}sumw": self.sumw, f"{prefix}sumw2": self.sumw2,
+                f"{prefix}entries": np.array(self.entries),
+                f"{prefix}meta": np.array([self.name, self.title])}
+        for i, axis in enumerate(self.axes):
+            data[f"{prefix}edges{i}"] = axis.edges
+            data[f"{prefix}regular{i}"] = np.array(axis.regular)
+        return data
+
+    @classmethod
+    def from_dict(cls, data, prefix=""):
+        axes = []
+        while f"{prefix}edges{len(axes)}" in data:
+            i = len(axes)
+            axes.append(Axis(data[f"{prefix}edges{i}"], regular=bool(data[f"{prefix}regular{i}"])))
+        name, title = (str(x) for x in data[f"{prefix}meta"])
+        h = cls(*axes, name=name, title=title)
+        h.sumw = np.array(data[f"{prefix}sumw"], dtype=np.float64)
+        h.sumw2 = np.array(data[f"{prefix}sumw2"], dtype=np.float64)
+        h.entries = int(data[f"{prefix}entries"])
+        return h
+
+    def save(self, path):
+        np.savez_compressed(path, **self.to_dict())
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls.from_dict(data)
+
+    # ---- ROOT ----
+
+    def to_root(self, name=None, title=None):
+        """
+        Convert to a ROOT TH1F/TH2F/TH3F (flow bins and errors included) for drawing or writing.
+        """
+        import ROOT
+        name = name or self.name or "h"
+        title = self.title if title is None else title
+        cls = {1: ROOT.TH1F, 2: ROOT.TH2F, 3: ROOT.TH3F}.get(self.ndim)
+        if cls is None:
+            raise ValueError(f"No ROOT histogram class for {self.ndim} dimensions")
+        args = []
+        for axis in self.axes:
+            args += [axis.nbins, axis.edges] if not axis.regular else [axis.nbins, axis.lo, axis.hi]
+        h = cls(name, title, *args)
+        content = self.sumw.T.ravel()  # ROOT global bin = x + (nx + 2) * (y + (ny + 2) * z)
+        errors = np.sqrt(self.sumw2.T.ravel())
+        for ibin in np.flatnonzero(content != 0):
+            h.SetBinContent(int(ibin), float(content[ibin]))
+            h.SetBinError(int(ibin), float(errors[ibin]))
+        h.SetEntries(self.entries)
+        return h
+
+# ================================
+# SPARSE HISTOGRAMS
+# ================================
+
+# Pending fills are merged into the sorted bin arrays once they exceed this many entries
+SPARSE_COMPACT_SIZE = 1000000
+
+class SparseHist2D:
+    """
+    Unbounded 2-D histogram on a fine regular grid that only stores occupied bins.
+
+    Bin (i, j) covers [i * x_width, (i + 1) * x_width) x [j * y_width, (j + 1) * y_width)
+    and is keyed by one int64 (i in the upper, j in the lower 32 bits). There is no
+    range and no flow bin; zoomed or coarser dense views are derived with to_hist().
+
+    Args:
+        x_width, y_width: Fine bin widths
+        name, title: Used for the derived dense histograms
+    """
+
+    def __init__(self, x_width, y_width, name="", title=""):
+        if x_width <= 0 or y_width <= 0:
+            raise ValueError("Bin widths must be positive")
+        self.widths = (float(x_width), float(y_width))
+        self.name = name
+        self.title = title
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.sumw = np.zeros(0)
+        self.sumw2 = np.zeros(0)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self._pending = []
+        self._n_pending = 0
+
+    @staticmethod
+    def _encode(i, j):
+        return (i.astype(np.int64) << 32) | (j.astype(np.int64) & 0xffffffff)
+
+    @staticmethod
+    def _decode(keys):
+        return keys >> 32, (keys & 0xffffffff).astype(np.uint32).view(np.int32).astype(np.int64)
+
+    def fill(self, x, y, weights=None):
+        """Fill many (x, y) values at once; NaN values are dropped."""
+        x, y = np.broadcast_arrays(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64))
+        x, y = x.ravel(), y.ravel()
+        w = np.ones(len(x)) if weights is None else \
+            np.broadcast_to(np.asarray(weights, dtype=np.float64), x.shape).ravel()
+        valid = ~(np.isnan(x) | np.isnan(y))
+        if not valid.all():
+            x, y, w = x[valid], y[valid], w[valid]
+        if len(x) == 0:
+            return self
+        keys = self._encode(np.floor(x / self.widths[0]), np.floor(y / self.widths[1]))
+        self._pending.append((keys, w, w * w, np.ones(len(keys), dtype=np.int64)))
+        self._n_pending += len(keys)
+        if self._n_pending > SPARSE_COMPACT_SIZE:
+            self._compact()
+        return self
+
+    def _compact(self):
+        if not self._pending:
+            return
+        keys, sumw, sumw2, counts = (np.concatenate([current] + [p[k] for p in self._pending])
+                                     for k, current in enumerate((self.keys, self.sumw, self.sumw2, self.counts)))
+        self.keys, inverse = np.unique(keys, return_inverse=True)
+        self.sumw = np.bincount(inverse, weights=sumw, minlength=len(self.keys))
+        self.sumw2 = np.bincount(inverse, weights=sumw2, minlength=len(self.keys))
+        self.counts = np.bincount(inverse, weights=counts, minlength=len(self.keys)).astype(np.int64)
+        self._pending, self._n_pending = [], 0
+
+    @property
+    def entries(self):
+        self._compact()
+        return int(self.counts.sum())
+
+    @property
+    def n_occupied(self):
+        self._compact()
+        return len(self.keys)
+
+    def bins(self):
+        """
+        Occupied bins.
+
+        Returns:
+            (bin centers x, bin centers y, sumw, sumw2) arrays
+        """
+        self._compact()
+        i, j = self._decode(self.keys)
+        return (i + 0.5) * self.widths[0], (j + 0.5) * self.widths[1], self.sumw, self.sumw2
+
+    def _subset(self, keep):
+        h = SparseHist2D(*self.widths, name=self.name, title=self.title)
+        h.keys, h.sumw, h.sumw2, h.counts = self.keys[keep], self.sumw[keep], self.sumw2[keep], self.counts[keep]
+        return h
+
+    def region(self, x_range, y_range):
+        """Sparse copy restricted to the fine bins whose centers lie in [lo, hi) on both axes."""
+        x, y, _, _ = self.bins()
+        return self._subset((x >= x_range[0]) & (x < x_range[1]) & (y >= y_range[0]) & (y < y_range[1]))
+
+    def to_hist(self, x_range, y_range, x_width=None, y_width=None, name=None, title=None):
+        """
+        Dense Hist over a region, rebinned from the stored fine bins.
+
+        Each fine bin goes whole into the bin containing its center, so ranges and widths
+        that are multiples of the fine widths give exact results. Fine bins outside the
+        region end up in the flow bins.
+
+        Args:
+            x_range, y_range: (lo, hi) of the region
+            x_width, y_width: Bin widths of the view (default: the fine widths)
+        """
+        x_width = self.widths[0] if x_width is None else x_width
+        y_width = self.widths[1] if y_width is None else y_width
+        axes = [Axis.regular_bins(max(1, int(round((r[1] - r[0]) / w))), r[0], r[1])
+                for r, w in ((x_range, x_width), (y_range, y_width))]
+        h = Hist(*axes, name=name or self.name, title=self.title if title is None else title)
+        x, y, sumw, sumw2 = self.bins()
+        flat = np.ravel_multi_index((axes[0].index(x), axes[1].index(y)), h.sumw.shape)
+        h.sumw += np.bincount(flat, weights=sumw, minlength=h.sumw.size).reshape(h.sumw.shape)
+        h.sumw2 += np.bincount(flat, weights=sumw2, minlength=h.sumw.size).reshape(h.sumw.shape)
+        h.entries = self.entries
+        return h
+
+    def __iadd__(self, other):
+        if not isinstance(other, SparseHist2D) or other.widths != self.widths:
+            raise ValueError("Sparse histograms with different bin widths cannot be merged")
+        other._compact()
+        self._pending.append((other.keys, other.sumw, other.sumw2, other.counts))
+        self._n_pending += len(other.keys)
+        self._compact()
+        return self
+
+    def _compacted_copy(self):
+        self._compact()
+        return self._subset(slice(None))
+
+    def __add__(self, other):
+        return self._compacted_copy().__iadd__(other)
+
+    def __radd__(self, other):
+        # Allows sum() over a list of histograms
+        return self._compacted_copy() if other == 0 else self.__add__(other)
+
+    def __getstate__(self):
+        self._compact()
+        return self.__dict__
+
+    # ---- serialization ----
+
+    def to_dict(self, prefix=""):
+        self._compact()
+        return {f"{prefix}kind": np.array("SparseHist2D"), f"{prefix}keys": self.keys,
+                f"{prefix}sumw": self.sumw, f"{prefix}sumw2": self.sumw2, f"{prefix}counts": self.counts,
+                f"{prefix}widths": np.array(self.widths), f"{prefix}meta": np.array([self.name, self.title])}
+
+    @classmethod
+    def from_dict(cls, data, prefix=""):
+        name, title = (str(x) for x in data[f"{prefix}meta"])
+        h = cls(*data[f"{prefix}widths"], name=name, title=title)
+        h.keys = np.array(data[f"{prefix}keys"], dtype=np.int64)
+        h.sumw = np.array(data[f"{prefix}sumw"], dtype=np.float64)
+        h.sumw2 = np.array(data[f"{prefix}sumw2"], dtype=np.float64)
+        h.counts = np.array(data[f"{prefix}counts"], dtype=np.int64)
+        return h
+
+    def save(self, path):
+        np.savez_compressed(path, **self.to_dict())
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls.from_dict(data)
+
+HIST_KINDS = {"Hist": Hist, "SparseHist2D": SparseHist2D}
+
+def save_hists(hists, path):
+    """Save a dictionary of name -> Hist (or SparseHist2D) into one NPZ file."""
+    data = {"names": np.array(list(hists))}
+    for i, hist in enumerate(hists.values()):
+        data.update(hist.to_dict(prefix=f"h{i}_"))
+    np.savez_compressed(path, **data)
+
+def load_hists(path):
+    """Load a dictionary of name -> histogram saved with save_hists."""
+    with np.load(path) as data:
+        return {str(name): HIST_KINDS[str(data.get(f"h{i}_kind", "Hist"))].from_dict(data, prefix=f"h{i}_")
+                for i, name in enumerate(data["names"])}
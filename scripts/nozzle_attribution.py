@@ -0,0 +1,264 @@
+import sys
+import csv
+import logging
+from pathlib import Path
+
+import numpy as np
+
+from nozzle_polycones import read_polycone_zplanes, find_nozzle_xml
+from geo_cache import compact_tree_files
+from polycone_query import Polycone
+
+## $ python nozzle_attribution.py sweep_dir/*/ --max-events 10 -o attribution.csv   per-volume BIB origin of every variant
+## Needs pyLCIO (key4hep stack) to read the .slcio files; the geometry side only needs NumPy.
+
+logger = logging.getLogger(__name__)
+
+DRIVERS_DIR = Path(__file__).resolve().parent.parent / "analysis" / "pylcio" / "drivers"
+sys.path.insert(0, str(DRIVERS_DIR))
+from mcp_graph import MCParticleGraph  # noqa: E402
+
+# ================================
+# CONFIGURABLE PARAMETERS
+# ================================
+
+# Polycone detectors a vertex can be attributed to. A vertex inside several of them
+# (only possible in overlapping geometries) is given the first one in this order.
+# NozzleKillZone is the bore inside the tungsten of the Hammer geometries.
+VOLUME_PREFIXES = ("NozzleBlackhole", "NozzleW", "NozzleKillZone", "NozzleBCH", "Beampipe")
+OTHER = "other"
+VOLUME_LABELS = VOLUME_PREFIXES + (OTHER,)
+
+MM_TO_CM = 0.1  # LCIO positions are in mm, compact profiles in cm
+
+TRACKER_HIT_COLLECTIONS = ['VertexBarrelCollection', 'VertexEndcapCollection',
+                           'InnerTrackerBarrelCollection', 'InnerTrackerEndcapCollection',
+                           'OuterTrackerBarrelCollection', 'OuterTrackerEndcapCollection']
+CALORIMETER_HIT_COLLECTIONS = ['ECalBarrelCollection', 'ECalEndcapCollection',
+                               'HCalBarrelCollection', 'HCalEndcapCollection']
+
+SUMMARY_FILENAME = "nozzle_attribution.csv"
+SUMMARY_FIELDS = ["volume", "n_events", "n_particles", "particle_energy_gev", "n_hits", "hit_edep_gev"]
+
+# ================================
+# GEOMETRY
+# ================================
+
+def load_variant_profiles(variant_folder, prefixes=VOLUME_PREFIXES):
+    """
+    Read the polycone profiles a variant is simulated with.
+
+    Follows the include tree of the variant's MAIA compact file, so only the Nozzle
+    and Beampipe XMLs that are actually used are read. Without a MAIA file the
+    folder's Nozzle XML (and Beampipe XML, if any) are used.
+
+    Returns:
+        Dictionary of detector name -> list of (z, rmin, rmax) in cm
+    """
+    variant_folder = Path(variant_folder)
+    maia = sorted(variant_folder.glob("MAIA_*.xml"))
+    if maia:
+        xml_files = [path for _, path in compact_tree_files(maia[0])
+                     if path is not None and path.suffix == ".xml" and path.exists()]
+    else:
+        xml_files = [find_nozzle_xml(variant_folder)] + sorted(variant_folder.glob("Beampipe_*.xml"))
+        xml_files = [path for path in xml_files if path is not None]
+    profiles = {}
+    for xml_path in xml_files:
+        # Most of the tree is subdetectors with no polycones; skip them without parsing their constants
+        if "DD4hep_PolyconeSupport" not in xml_path.read_text(encoding="utf-8", errors="ignore"):
+            continue
+        profiles.update(read_polycone_zplanes(xml_path, prefixes=prefixes))
+    if not any(name.startswith("Nozzle") for name in profiles):
+        raise FileNotFoundError(f"No nozzle polycones found for {variant_folder}")
+    return profiles
+
+class VolumeClassifier:
+    """Labels points with the polycone volume they lie in."""
+
+    def __init__(self, profiles, prefixes=VOLUME_PREFIXES):
+        self.prefixes = tuple(prefixes)
+        self.labels = self.prefixes + (OTHER,)
+        self.polycones = [(self.prefixes.index(prefix), Polycone(name, planes))
+                          for name, planes in profiles.items()
+                          for prefix in self.prefixes if name.startswith(prefix)]
+
+    @classmethod
+    def for_variant(cls, variant_folder, prefixes=VOLUME_PREFIXES):
+        return cls(load_variant_profiles(variant_folder, prefixes), prefixes)
+
+    def classify(self, points_mm):
+        """
+        Args:
+            points_mm: (n, 3) array of positions in mm (LCIO units)
+
+        Returns:
+            Array of label indices into self.labels
+        """
+        points = np.asarray(points_mm, dtype=np.float64).reshape(-1, 3) * MM_TO_CM
+        z = points[:, 2]
+        r = np.hypot(points[:, 0], points[:, 1])
+        labels = np.full(len(points), len(self.prefixes), dtype=np.int8)
+        # Lower label index wins, so fill from the lowest priority up
+        for label, polycone in sorted(self.polycones, key=lambda item: -item[0]):
+            labels[polycone.contains(z, r)] = label
+        return labels
+
+    def contains(self, prefix):
+        """Containment callable for MCParticleGraph.originated_in"""
+        label = self.prefixes.index(prefix)
+        return lambda points_mm: self.classify(points_mm) == label
+
+# ================================
+# EVENT ATTRIBUTION
+# ================================
+
+def collect_hits(event, graph, tracker_collections=TRACKER_HIT_COLLECTIONS,
+                 calorimeter_collections=CALORIMETER_HIT_COLLECTIONS):
+    """
+    Gather the MCParticle index and deposited energy of every hit (calorimeter hits per contribution).
+
+    Returns:
+        (particle indices, energies in GeV, number of hits whose particle is not in the graph)
+    """
+    names = set(event.getCollectionNames())
+    indices, edeps = [], []
+    for col_name in tracker_collections:
+        if col_name not in names:
+            continue
+        for hit in event.getCollection(col_name):
+            mcp = hit.getMCParticle()
+            if mcp:
+                indices.append(graph.index_of(mcp, -1))
+                edeps.append(hit.getEDep())
+    for col_name in calorimeter_collections:
+        if col_name not in names:
+            continue
+        for hit in event.getCollection(col_name):
+            for iC in range(hit.getNMCContributions()):
+                mcp = hit.getParticleCont(iC)
+                if mcp:
+                    indices.append(graph.index_of(mcp, -1))
+                    edeps.append(hit.getEnergyCont(iC))
+    indices = np.array(indices, dtype=np.int64)
+    edeps = np.array(edeps, dtype=np.float64)
+    matched = indices >= 0
+    return indices[matched], edeps[matched], int((~matched).sum())
+
+class AttributionSummary:
+    """Per-volume particle and hit counts and energy flow, accumulated over events."""
+
+    def __init__(self, labels=VOLUME_LABELS):
+        self.labels = tuple(labels)
+        n = len(self.labels)
+        self.n_events = 0
+        self.n_particles = np.zeros(n, dtype=np.int64)
+        self.particle_energy = np.zeros(n)
+        self.n_hits = np.zeros(n, dtype=np.int64)
+        self.hit_edep = np.zeros(n)
+        self.n_unmatched_hits = 0
+
+    def add_event(self, graph, classifier, hit_indices, hit_edeps):
+        """
+        Attribute one event: every particle by its own production vertex, every hit
+        by the production vertex of its particle's oldest ancestor.
+
+        Returns:
+            (particle labels, hit labels)
+        """
+        n = len(self.labels)
+        particle_labels = classifier.classify(graph.vertex)
+        ancestors, _ = graph.oldest_ancestor()
+        hit_labels = particle_labels[ancestors[hit_indices]]
+        self.n_events += 1
+        self.n_particles += np.bincount(particle_labels, minlength=n)
+        self.particle_energy += np.bincount(particle_labels, weights=graph.energy, minlength=n)
+        self.n_hits += np.bincount(hit_labels, minlength=n)
+        self.hit_edep += np.bincount(hit_labels, weights=hit_edeps, minlength=n)
+        return particle_labels, hit_labels
+
+    def rows(self):
+        return [{
+            "volume": label,
+            "n_events": self.n_events,
+            "n_particles": int(self.n_particles[i]),
+            "particle_energy_gev": float(self.particle_energy[i]),
+            "n_hits": int(self.n_hits[i]),
+            "hit_edep_gev": float(self.hit_edep[i]),
+        } for i, label in enumerate(self.labels)]
+
+def attribute_file(slcio_path, classifier, max_events=-1):
+    """Run the attribution over the events of one .slcio file."""
+    from pyLCIO import IOIMPL
+
+    summary = AttributionSummary(classifier.labels)
+    reader = IOIMPL.LCFactory.getInstance().createLCReader()
+    reader.open(str(slcio_path))
+    try:
+        for event in reader:
+            if 0 <= max_events <= summary.n_events:
+                break
+            graph = MCParticleGraph.from_event(event)
+            hit_indices, hit_edeps, n_unmatched = collect_hits(event, graph)
+            summary.add_event(graph, classifier, hit_indices, hit_edeps)
+            summary.n_unmatched_hits += n_unmatched
+    finally:
+        reader.close()
+    if summary.n_unmatched_hits:
+        logger.warning(f"{slcio_path}: {summary.n_unmatched_hits} hit(s) point to particles outside the MCParticle collection")
+    return summary
+
+# ================================
+# SUMMARY TABLES
+# ================================
+
+def write_summary(rows, path, extra_fields=()):
+    fields = list(extra_fields) + SUMMARY_FIELDS
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+    return Path(path)
+
+def attribute_variant(variant_folder, max_events=-1):
+    """
+    Attribute the simulated events of one variant and write its summary table.
+
+    Returns:
+        List of summary rows, or None if the variant has no .slcio file
+    """
+    variant_folder = Path(variant_folder)
+    slcio_files = sorted(variant_folder.glob("*.slcio"))
+    if not slcio_files:
+        logger.warning(f"No .slcio file in {variant_folder}")
+        return None
+    classifier = VolumeClassifier.for_variant(variant_folder)
+    summary = attribute_file(slcio_files[0], classifier, max_events)
+    rows = summary.rows()
+    write_summary(rows, variant_folder / SUMMARY_FILENAME)
+    logger.info(f"{variant_folder.name}: " + ", ".join(
+        f"{row['volume']} {row['n_hits']} hits" for row in rows))
+    return rows
+
+# ================================
+# MAIN EXECUTION
+# ================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Attribute MCParticles and hits to the volume their BIB ancestor was produced in')
+    parser.add_argument('variant_folders', nargs='+')
+    parser.add_argument('--max-events', type=int, default=-1)
+    parser.add_argument('-o', '--output', default=None, help='Combined table of all variants (CSV)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    combined = []
+    for folder in args.variant_folders:
+        rows = attribute_variant(folder, args.max_events)
+        for row in rows or []:
+            combined.append({"variant": Path(folder).name, **row})
+    if args.output:
+        write_summary(combined, args.output, extra_fields=["variant"])
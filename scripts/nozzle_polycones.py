@@ -0,0 +1,138 @@
+import xml.etree.ElementTree as ET
+import math
+from pathlib import Path
+
+from NozzleCreationv2 import parse_units
+
+# ================================
+# CONSTANTS
+# ================================
+
+# Absolute (non tip-relative) values of the constants used in the Nozzle XMLs.
+# Nozzle_zmin and Nozzle_zmax live in the top-level MAIA/MuColl compact file,
+# so they are never found in the Nozzle XML <define> block itself.
+COMPACT_CONSTANTS = {
+    'Nozzle_zmin': (6.0, 'cm'),
+    'Nozzle_zmax': (600.0, 'cm'),
+    'Nozzle_kink_z': (100.0, 'cm'),
+    'Nozzle_kink_max_r': (17.57473619, 'cm'),
+}
+
+# Conversion of DD4hep length units to cm
+UNIT_TO_CM = {
+    '': 1.0,
+    'cm': 1.0,
+    'mm': 0.1,
+    'm': 100.0,
+    'um': 1e-4,
+}
+
+# ================================
+# XML READING
+# ================================
+
+def read_constants(root, constants=None):
+    """
+    Collect <constant> definitions from a compact XML tree.
+
+    Args:
+        root: Root element of the parsed XML
+        constants: Optional starting constants (not modified)
+
+    Returns:
+        Dictionary of name -> (value, unit), as used by parse_units
+    """
+    merged = dict(COMPACT_CONSTANTS if constants is None else constants)
+    for const in root.findall('.//define/constant'):
+        name = const.get('name')
+        value = const.get('value')
+        if name is None or value is None:
+            continue
+        merged[name] = parse_units(value, merged)
+    return merged
+
+def to_cm(value_str, constants):
+    """Parse a DD4hep length expression and return it in cm."""
+    value, unit = parse_units(value_str, constants)
+    return value * UNIT_TO_CM.get(unit, 1.0)
+
+def read_polycone_zplanes(xml_path, constants=None, prefixes=None):
+    """
+    Read the <zplane> lists of every DD4hep_PolyconeSupport detector in a Nozzle XML.
+
+    Args:
+        xml_path: Path to the Nozzle XML file
+        constants: Optional constants used to resolve symbolic z values
+        prefixes: Optional iterable of detector name prefixes to keep
+
+    Returns:
+        Dictionary of detector name -> list of (z, rmin, rmax) in cm, in file order
+    """
+    root = ET.parse(xml_path).getroot()
+    constants = read_constants(root, constants)
+
+    profiles = {}
+    for detector in root.findall('.//detector'):
+        name = detector.get('name', '')
+        if detector.get('type') != 'DD4hep_PolyconeSupport':
+            continue
+        if prefixes is not None and not any(name.startswith(p) for p in prefixes):
+            continue
+        planes = []
+        for zplane in detector.findall('zplane'):
+            planes.append((
+                to_cm(zplane.get('z'), constants),
+                to_cm(zplane.get('rmin'), constants),
+                to_cm(zplane.get('rmax'), constants),
+            ))
+        profiles[name] = planes
+    return profiles
+
+def profiles_from_geometry_dict(geometry_dict, z_offset=0.0):
+    """
+    Convert a NozzleCreationv2 geometry dictionary to zplane lists.
+
+    Args:
+        geometry_dict: Dictionary of (name, z) -> (rmin, rmax)
+        z_offset: Offset added to every z (e.g. NOZZLE_TIP_ORIGINAL_Z to undo the tip offset;
+                  offset_geometry_dict shifts both sides by the same amount, like modify_geometry_file undoes it)
+
+    Returns:
+        Dictionary of detector name -> list of (z, rmin, rmax) sorted by |z|
+    """
+    profiles = {}
+    for (name, z), (rmin, rmax) in geometry_dict.items():
+        profiles.setdefault(name, []).append((z + z_offset, rmin, rmax))
+    for name in profiles:
+        profiles[name].sort(key=lambda plane: abs(plane[0]))
+    return profiles
+
+# ================================
+# VOLUMES
+# ================================
+
+def polycone_volume(zplanes):
+    """
+    Volume of a polycone given its zplanes, in cm^3.
+
+    Each section between consecutive zplanes is a conical shell; sections of zero
+    length (the coincident-z kink planes) contribute nothing.
+    """
+    volume = 0.0
+    for (z1, rmin1, rmax1), (z2, rmin2, rmax2) in zip(zplanes, zplanes[1:]):
+        h = abs(z2 - z1)
+        if h == 0:
+            continue
+        outer = rmax1 * rmax1 + rmax1 * rmax2 + rmax2 * rmax2
+        inner = rmin1 * rmin1 + rmin1 * rmin2 + rmin2 * rmin2
+        volume += math.pi * h / 3.0 * (outer - inner)
+    return volume
+
+def total_volume(profiles, prefix):
+    """Sum of polycone volumes of all detectors whose name starts with prefix."""
+    return sum(polycone_volume(planes) for name, planes in profiles.items() if name.startswith(prefix))
+
+def find_nozzle_xml(variant_folder):
+    """Return the Nozzle XML file of a variant folder, or None."""
+    candidates = sorted(Path(variant_folder).glob('Nozzle_*.xml'))
+    return candidates[0] if candidates else None
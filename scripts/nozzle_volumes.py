@@ -0,0 +1,35 @@
+# ================================
+# CONSTANTS
+# ================================
+
+# Volumes modified by the nozzle generators, by name prefix
+NOZZLE_VOLUME_PREFIXES = ("NozzleW", "NozzleBlackhole")
+
+# ================================
+# TGEO LOOKUP
+# ================================
+
+def is_nozzle_volume(name, prefixes=NOZZLE_VOLUME_PREFIXES):
+    return any(name.startswith(prefix) for prefix in prefixes)
+
+def find_nozzle_volumes(geom, prefixes=NOZZLE_VOLUME_PREFIXES):
+    """
+    Find the nozzle volumes of a TGeo geometry and the volumes that place them.
+
+    Walks the list of unique volumes instead of the full node tree, so the cost
+    scales with the number of volume types, not with the number of placed modules.
+
+    Returns:
+        (nozzle_volumes, mother_volumes) as lists of TGeoVolume
+    """
+    nozzle, mothers = {}, {}
+    volumes = geom.GetListOfVolumes()
+    for i in range(volumes.GetEntries()):
+        volume = volumes.At(i)
+        if is_nozzle_volume(volume.GetName(), prefixes):
+            nozzle[volume.GetName()] = volume
+        for j in range(volume.GetNdaughters()):
+            if is_nozzle_volume(volume.GetNode(j).GetVolume().GetName(), prefixes):
+                mothers[volume.GetName()] = volume
+                break
+    return list(nozzle.values()), list(mothers.values())
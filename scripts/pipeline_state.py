@@ -0,0 +1,187 @@
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# ================================
+# CONSTANTS
+# ================================
+
+STATE_DB_FILENAME = "pipeline_state.sqlite"
+
+# Files larger than this are fingerprinted by size and mtime instead of content
+# (simulated .slcio files are hundreds of MB)
+CONTENT_HASH_MAX_BYTES = 16 * 1024 * 1024
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+SUBMITTED = "submitted"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS variants (
+    variant_hash TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    params TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stages (
+    variant_hash TEXT NOT NULL REFERENCES variants(variant_hash),
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,
+    input_hash TEXT,
+    outputs TEXT,
+    backend TEXT,
+    message TEXT,
+    started REAL,
+    finished REAL,
+    duration_s REAL,
+    PRIMARY KEY (variant_hash, stage)
+);
+"""
+
+# ================================
+# HASHING
+# ================================
+
+def hash_values(*values):
+    """Stable short hash of JSON-serializable values."""
+    payload = json.dumps(values, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+def file_fingerprint(path):
+    """
+    Fingerprint of a file: content hash for small files, size + mtime for large ones.
+
+    Returns:
+        Fingerprint string, or None if the file does not exist
+    """
+    path = Path(path)
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    if stat.st_size > CONTENT_HASH_MAX_BYTES:
+        return f"stat:{stat.st_size}:{stat.st_mtime_ns}"
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+def variant_hash(params):
+    """Key of a variant in the state store, from the parameters that define its geometry."""
+    return hash_values(params)
+
+# ================================
+# STATE STORE
+# ================================
+
+class PipelineStateStore:
+    """
+    SQLite record of every variant and stage of a sweep.
+
+    Each (variant, stage) row stores the status, the hash of the stage inputs it was
+    run with, the fingerprints of its outputs and its timing. A stage is up to date
+    when it finished successfully with the current input hash and its outputs still
+    match, which is what makes reruns incremental.
+    """
+
+    def __init__(self, sweep_dir, filename=STATE_DB_FILENAME):
+        self.path = Path(sweep_dir) / filename
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def register_variant(self, variant_hash, name, params):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO variants (variant_hash, name, params, created) VALUES (?, ?, ?, ?)",
+                (variant_hash, name, json.dumps(params, sort_keys=True), time.time())
+            )
+
+    def get(self, variant_hash, stage):
+        """Return the stage record as a dictionary, or None if the stage never ran."""
+        row = self.conn.execute("SELECT * FROM stages WHERE variant_hash = ? AND stage = ?",
+                                (variant_hash, stage)).fetchone()
+        if row is None:
+            return None
+        record = dict(row)
+        record["outputs"] = json.loads(record["outputs"]) if record["outputs"] else {}
+        return record
+
+    def set(self, variant_hash, stage, status, input_hash=None, outputs=None, backend=None, message=None,
+            started=None, finished=None, duration_s=None):
+        """Insert or replace the record of a stage."""
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO stages (variant_hash, stage, status, input_hash, outputs, backend, message,"
+                " started, finished, duration_s) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (variant_hash, stage, status, input_hash, json.dumps(outputs or {}), backend, message,
+                 started, finished, duration_s)
+            )
+
+    def mark_done(self, variant_hash, stage, input_hash, output_paths, backend=None, started=None, duration_s=None):
+        """Record a successful stage with fingerprints of its outputs."""
+        outputs = {str(path): file_fingerprint(path) for path in output_paths}
+        self.set(variant_hash, stage, DONE, input_hash, outputs, backend, None, started, time.time(), duration_s)
+
+    def is_up_to_date(self, variant_hash, stage, input_hash):
+        """True if the stage finished with these inputs and its outputs are unchanged."""
+        record = self.get(variant_hash, stage)
+        if record is None or record["status"] != DONE or record["input_hash"] != input_hash:
+            return False
+        return all(file_fingerprint(path) == fingerprint for path, fingerprint in record["outputs"].items())
+
+    def invalidate(self, variant_hash, stages):
+        """Forget the given stages of a variant so they run again."""
+        with self.conn:
+            self.conn.executemany("DELETE FROM stages WHERE variant_hash = ? AND stage = ?",
+                                  [(variant_hash, stage) for stage in stages])
+
+    def summary(self):
+        """
+        Count stage records by status.
+
+        Returns:
+            Dictionary of (stage, status) -> count
+        """
+        rows = self.conn.execute("SELECT stage, status, COUNT(*) AS n FROM stages GROUP BY stage, status")
+        return {(row["stage"], row["status"]): row["n"] for row in rows}
+
+    def timings(self, stage):
+        """Return (variant name, duration_s) of every finished run of a stage."""
+        rows = self.conn.execute(
+            "SELECT v.name, s.duration_s FROM stages s JOIN variants v USING (variant_hash)"
+            " WHERE s.stage = ? AND s.status = ? AND s.duration_s IS NOT NULL ORDER BY s.duration_s DESC",
+            (stage, DONE)
+        )
+        return [(row["name"], row["duration_s"]) for row in rows]
+
+# ================================
+# MAIN EXECUTION
+# ================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Show the pipeline state of a sweep')
+    parser.add_argument('sweep_dir')
+    args = parser.parse_args()
+
+    if not (Path(args.sweep_dir) / STATE_DB_FILENAME).exists():
+        raise SystemExit(f"No {STATE_DB_FILENAME} in {args.sweep_dir}")
+    store = PipelineStateStore(args.sweep_dir)
+    for (stage, status), count in sorted(store.summary().items()):
+        print(f"{stage:10s} {status:10s} {count}")
+    store.close()
@@ -0,0 +1,234 @@
+import json
+import logging
+from itertools import combinations
+from pathlib import Path
+
+import numpy as np
+
+from nozzle_polycones import read_polycone_zplanes, profiles_from_geometry_dict, find_nozzle_xml
+
+## $ python polycone_check.py path/to/Nozzle_*.xml        validate one nozzle XML
+## $ python polycone_check.py sweep_dir/*/                 validate every variant folder of a sweep
+
+logger = logging.getLogger(__name__)
+
+# ================================
+# CONFIGURABLE PARAMETERS
+# ================================
+
+# Polycones that are checked, ordered from the beam outwards: on each side every
+# volume must lie radially inside the volumes after it wherever both exist
+RADIAL_ORDER = ("NozzleBlackhole", "NozzleW", "NozzleBCH")
+
+# inner prefix -> outer prefix whose z-range must contain the inner volume
+Z_CONTAINMENT = {"NozzleBlackhole": "NozzleW"}
+
+MIN_THICKNESS = 0.0001  # cm, same as MIN_THICKNESS_PRESERVATION in NozzleCreationv2
+TOLERANCE = 1e-6        # cm, radial overlap below this counts as touching
+
+# ================================
+# PROFILES
+# ================================
+
+def _prefix_of(name):
+    for prefix in RADIAL_ORDER:
+        if name.startswith(prefix):
+            return prefix
+    return None
+
+def _side_of(planes):
+    return "left" if sum(z for z, _, _ in planes) < 0 else "right"
+
+def _issue(check, volumes, z, detail):
+    return {"check": check, "volumes": list(volumes), "z_cm": None if z is None else float(z), "detail": detail}
+
+def check_polycone(name, planes, min_thickness=MIN_THICKNESS):
+    """
+    Check a single polycone.
+
+    Covers: all planes on one side of the IP, |z| non-decreasing, at most two planes
+    at the same z (the step of a kink), 0 <= rmin <= rmax and a minimum thickness at
+    every plane but the first (the tip and the blackhole start are allowed to be points).
+
+    Returns:
+        List of issue dictionaries
+    """
+    issues = []
+    if len(planes) < 2:
+        return [_issue("planes", [name], None, f"{len(planes)} zplane(s), a polycone needs at least 2")]
+    z = np.array([p[0] for p in planes])
+    rmin = np.array([p[1] for p in planes])
+    rmax = np.array([p[2] for p in planes])
+    az = np.abs(z)
+
+    if np.any(z > 0) and np.any(z < 0):
+        issues.append(_issue("side", [name], None, "zplanes on both sides of the IP"))
+
+    steps = np.diff(az)
+    for i in np.flatnonzero(steps < 0):
+        issues.append(_issue("monotonic_z", [name], z[i + 1],
+                             f"|z| decreases from {az[i]:.6g} to {az[i + 1]:.6g} cm"))
+    for i in np.flatnonzero((steps[:-1] == 0) & (steps[1:] == 0)):
+        issues.append(_issue("coincident_planes", [name], z[i], "more than two zplanes at the same z"))
+
+    for i in np.flatnonzero(rmin < 0):
+        issues.append(_issue("negative_rmin", [name], z[i], f"rmin = {rmin[i]:.6g} cm"))
+    for i in np.flatnonzero(rmin > rmax):
+        issues.append(_issue("inverted_radii", [name], z[i], f"rmin {rmin[i]:.6g} > rmax {rmax[i]:.6g} cm"))
+    thin = (rmax - rmin < min_thickness - TOLERANCE) & (rmin <= rmax)
+    thin[0] = False
+    for i in np.flatnonzero(thin):
+        issues.append(_issue("thickness", [name], z[i],
+                             f"thickness {rmax[i] - rmin[i]:.3g} cm < {min_thickness:.3g} cm"))
+    return issues
+
+def _evaluate(az, r, zs, limit):
+    """
+    Interpolate a piecewise-linear radius at |z| positions, as a one-sided limit.
+
+    At the coincident planes of a kink the radius is discontinuous, so 'before'
+    takes the value approaching from smaller |z| and 'after' from larger |z|.
+    """
+    if limit == "after":
+        i = np.searchsorted(az, zs, side="right") - 1
+        j = i + 1
+    else:
+        j = np.searchsorted(az, zs, side="left")
+        i = j - 1
+    t = (zs - az[i]) / (az[j] - az[i])
+    return r[i] + (r[j] - r[i]) * t
+
+def check_pair(inner_name, inner_planes, outer_name, outer_planes, tolerance=TOLERANCE):
+    """
+    Check that one polycone lies radially inside another wherever both exist.
+
+    Both profiles are linear between the union of their breakpoints, so checking
+    the ordering at both ends of every such segment is exact: if the inner volume
+    is below the outer one at both ends it is below it along the whole segment.
+
+    Returns:
+        List of issue dictionaries
+    """
+    profiles = []
+    for planes in (inner_planes, outer_planes):
+        az = np.abs([p[0] for p in planes])
+        profiles.append((az, np.array([p[1] for p in planes]), np.array([p[2] for p in planes])))
+    (az_a, rmin_a, rmax_a), (az_b, rmin_b, rmax_b) = profiles
+
+    start, end = max(az_a[0], az_b[0]), min(az_a[-1], az_b[-1])
+    if end <= start:
+        return []
+    breakpoints = np.unique(np.concatenate([az_a, az_b, [start, end]]))
+    breakpoints = breakpoints[(breakpoints >= start) & (breakpoints <= end)]
+    seg_start, seg_end = breakpoints[:-1], breakpoints[1:]
+
+    # Clearance between the inner volume's rmax and the outer volume's rmin at both segment ends
+    gap_start = _evaluate(az_b, rmin_b, seg_start, "after") - _evaluate(az_a, rmax_a, seg_start, "after")
+    gap_end = _evaluate(az_b, rmin_b, seg_end, "before") - _evaluate(az_a, rmax_a, seg_end, "before")
+
+    issues = []
+    for k in np.flatnonzero((gap_start < -tolerance) | (gap_end < -tolerance)):
+        at_start = gap_start[k] < gap_end[k]
+        z = seg_start[k] if at_start else seg_end[k]
+        gap = min(gap_start[k], gap_end[k])
+        issues.append(_issue("intersection", [inner_name, outer_name], z,
+                             f"{inner_name} rmax exceeds {outer_name} rmin by {-gap:.6g} cm "
+                             f"between |z| = {seg_start[k]:.6g} and {seg_end[k]:.6g} cm"))
+    return issues
+
+def check_z_containment(inner_name, inner_planes, outer_name, outer_planes, tolerance=TOLERANCE):
+    """Check that the z-range of the inner polycone lies within that of the outer one."""
+    inner = np.abs([p[0] for p in inner_planes])
+    outer = np.abs([p[0] for p in outer_planes])
+    issues = []
+    if inner.min() < outer.min() - tolerance:
+        issues.append(_issue("containment", [inner_name, outer_name], inner.min(),
+                             f"{inner_name} starts at |z| = {inner.min():.6g} cm, before {outer_name} "
+                             f"({outer.min():.6g} cm)"))
+    if inner.max() > outer.max() + tolerance:
+        issues.append(_issue("containment", [inner_name, outer_name], inner.max(),
+                             f"{inner_name} ends at |z| = {inner.max():.6g} cm, after {outer_name} "
+                             f"({outer.max():.6g} cm)"))
+    return issues
+
+# ================================
+# VALIDATION
+# ================================
+
+def validate_profiles(profiles, min_thickness=MIN_THICKNESS, tolerance=TOLERANCE):
+    """
+    Validate nozzle polycones analytically.
+
+    Args:
+        profiles: Dictionary of detector name -> list of (z, rmin, rmax) in cm
+        min_thickness: Minimum rmax - rmin at every plane but the first [cm]
+        tolerance: Radial overlap allowed between neighbouring volumes [cm]
+
+    Returns:
+        List of issue dictionaries (empty if the geometry is valid)
+    """
+    checked = {name: planes for name, planes in profiles.items() if _prefix_of(name)}
+    issues = []
+    valid = {}
+    for name, planes in checked.items():
+        polycone_issues = check_polycone(name, planes, min_thickness)
+        issues.extend(polycone_issues)
+        # Pairwise checks need monotonic single-sided profiles
+        if not any(i["check"] in ("planes", "side", "monotonic_z") for i in polycone_issues):
+            valid[name] = planes
+
+    for (name_a, planes_a), (name_b, planes_b) in combinations(valid.items(), 2):
+        if _side_of(planes_a) != _side_of(planes_b):
+            continue
+        prefix_a, prefix_b = _prefix_of(name_a), _prefix_of(name_b)
+        if RADIAL_ORDER.index(prefix_a) > RADIAL_ORDER.index(prefix_b):
+            (name_a, planes_a, prefix_a), (name_b, planes_b, prefix_b) = \
+                (name_b, planes_b, prefix_b), (name_a, planes_a, prefix_a)
+        issues.extend(check_pair(name_a, planes_a, name_b, planes_b, tolerance))
+        if Z_CONTAINMENT.get(prefix_a) == prefix_b:
+            issues.extend(check_z_containment(name_a, planes_a, name_b, planes_b, tolerance))
+    return issues
+
+def validate_nozzle_xml(xml_path, **kwargs):
+    """Validate the polycones of a Nozzle XML file."""
+    return validate_profiles(read_polycone_zplanes(xml_path, prefixes=RADIAL_ORDER), **kwargs)
+
+def validate_geometry_dict(geometry_dict, z_offset=0.0, **kwargs):
+    """Validate a NozzleCreationv2 (name, z) -> (rmin, rmax) dictionary."""
+    return validate_profiles(profiles_from_geometry_dict(geometry_dict, z_offset), **kwargs)
+
+def format_issues(issues):
+    return "\n".join(f"  [{i['check']}] {', '.join(i['volumes'])}: {i['detail']}" for i in issues)
+
+# ================================
+# MAIN EXECUTION
+# ================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Analytic pre-check of nozzle polycones')
+    parser.add_argument('paths', nargs='+', help='Nozzle XML files or variant folders')
+    parser.add_argument('--json', default=None, help='Write all issues to this JSON file')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    results = {}
+    for path in map(Path, args.paths):
+        xml_path = find_nozzle_xml(path) if path.is_dir() else path
+        if xml_path is None:
+            logger.warning(f"No Nozzle XML in {path}")
+            continue
+        issues = validate_nozzle_xml(xml_path)
+        results[str(xml_path)] = issues
+        if issues:
+            logger.error(f"{xml_path}: {len(issues)} issue(s)\n{format_issues(issues)}")
+        else:
+            logger.info(f"{xml_path}: OK")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if any(results.values()):
+        raise SystemExit(1)
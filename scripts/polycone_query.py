@@ -0,0 +1,253 @@
+import logging
+
+import numpy as np
+
+from nozzle_polycones import read_polycone_zplanes
+
+## $ python polycone_query.py path/to/Nozzle_*.xml --z 100 --r 10   which polycone contains (z, r) [cm], and how deep
+## All queries take NumPy arrays of z and r = sqrt(x^2 + y^2) in cm and are vectorized over points.
+
+logger = logging.getLogger(__name__)
+
+# ================================
+# CONFIGURABLE PARAMETERS
+# ================================
+
+CHUNK_SIZE = 200000  # points per block in distance queries (memory is CHUNK_SIZE x number of edges)
+
+# ================================
+# SINGLE POLYCONE
+# ================================
+
+class Polycone:
+    """
+    A DD4hep_PolyconeSupport solid, as a piecewise-linear (z, rmin, rmax) profile.
+
+    Planes are stored by increasing z. Two planes at the same z (a kink) split the
+    profile into separate segments: inside a segment the radii are linear in z, and
+    at the kink plane itself the solid covers both adjacent cross-sections.
+    """
+
+    def __init__(self, name, planes):
+        self.name = name
+        planes = np.asarray(planes, dtype=np.float64).reshape(-1, 3)
+        if len(planes) < 2:
+            raise ValueError(f"{name}: a polycone needs at least 2 zplanes")
+        if planes[0, 0] > planes[-1, 0]:
+            planes = planes[::-1]
+        if np.any(np.diff(planes[:, 0]) < 0):
+            raise ValueError(f"{name}: zplanes are not ordered in z")
+        self.z, self.rmin, self.rmax = planes[:, 0].copy(), planes[:, 1].copy(), planes[:, 2].copy()
+
+        # Segments of non-zero length between consecutive planes
+        seg = np.flatnonzero(np.diff(self.z) > 0)
+        if len(seg) == 0:
+            raise ValueError(f"{name}: all zplanes are at the same z")
+        self.seg_z0, self.seg_z1 = self.z[seg], self.z[seg + 1]
+        self.seg_rmin0, self.seg_rmin1 = self.rmin[seg], self.rmin[seg + 1]
+        self.seg_rmax0, self.seg_rmax1 = self.rmax[seg], self.rmax[seg + 1]
+        self._edges = self._boundary_edges()
+
+    @property
+    def zmin(self):
+        return self.z[0]
+
+    @property
+    def zmax(self):
+        return self.z[-1]
+
+    def _segment_radii(self, k, z):
+        t = (z - self.seg_z0[k]) / (self.seg_z1[k] - self.seg_z0[k])
+        rmin = self.seg_rmin0[k] + (self.seg_rmin1[k] - self.seg_rmin0[k]) * t
+        rmax = self.seg_rmax0[k] + (self.seg_rmax1[k] - self.seg_rmax0[k]) * t
+        return rmin, rmax
+
+    def _segments_at(self, z):
+        """
+        Segment indices covering each z, from both sides.
+
+        Returns:
+            (before, after): segment ending at or running through z, and segment starting at
+            or running through z; -1 where there is none. They differ only at plane positions.
+        """
+        n_seg = len(self.seg_z0)
+        after = np.searchsorted(self.seg_z0, z, side="right") - 1
+        after = np.where((after >= 0) & (z <= self.seg_z1[np.clip(after, 0, n_seg - 1)]), after, -1)
+        before = np.searchsorted(self.seg_z1, z, side="left")
+        before = np.where((before < n_seg) & (z >= self.seg_z0[np.clip(before, 0, n_seg - 1)]), before, -1)
+        return before, after
+
+    def radii(self, z, side="after"):
+        """
+        Inner and outer radius at each z, NaN outside the polycone.
+
+        At a kink plane the radii are discontinuous: 'before' takes the limit from
+        smaller z and 'after' from larger z.
+        """
+        z = np.asarray(z, dtype=np.float64)
+        before, after = self._segments_at(z)
+        k = after if side == "after" else before
+        # Fall back to the other side at the first/last plane
+        k = np.where(k >= 0, k, before if side == "after" else after)
+        rmin, rmax = self._segment_radii(np.clip(k, 0, None), z)
+        return np.where(k >= 0, rmin, np.nan), np.where(k >= 0, rmax, np.nan)
+
+    def thickness(self, z, side="after"):
+        """Radial thickness rmax - rmin at each z, 0 outside the polycone."""
+        rmin, rmax = self.radii(z, side)
+        return np.nan_to_num(rmax - rmin, nan=0.0)
+
+    def contains(self, z, r):
+        """
+        Point-in-polycone test (boundary included).
+
+        A point at a kink plane is inside if it is in the cross-section on either side,
+        which is exactly the closed solid, with no interpolation across the kink.
+        """
+        z = np.asarray(z, dtype=np.float64)
+        r = np.asarray(r, dtype=np.float64)
+        inside = np.zeros(np.broadcast(z, r).shape, dtype=bool)
+        for k in self._segments_at(z):
+            rmin, rmax = self._segment_radii(np.clip(k, 0, None), z)
+            inside |= (k >= 0) & (r >= rmin) & (r <= rmax)
+        return inside
+
+    def _boundary_edges(self):
+        """
+        Boundary of the (z, r) cross-section as line segments (z0, r0, z1, r1).
+
+        Consists of the rmax and rmin lines of every segment (rmin only where it is
+        off the axis) and, at every plane position, the radial faces: the symmetric
+        difference of the cross-sections just before and just after it.
+        """
+        edges = []
+        for k in range(len(self.seg_z0)):
+            edges.append((self.seg_z0[k], self.seg_rmax0[k], self.seg_z1[k], self.seg_rmax1[k]))
+            if self.seg_rmin0[k] > 0 or self.seg_rmin1[k] > 0:
+                edges.append((self.seg_z0[k], self.seg_rmin0[k], self.seg_z1[k], self.seg_rmin1[k]))
+        for z in np.unique(self.z):
+            ending = np.flatnonzero(self.seg_z1 == z)
+            starting = np.flatnonzero(self.seg_z0 == z)
+            a = (self.seg_rmin1[ending[0]], self.seg_rmax1[ending[0]]) if len(ending) else None
+            b = (self.seg_rmin0[starting[0]], self.seg_rmax0[starting[0]]) if len(starting) else None
+            for r0, r1 in _interval_symmetric_difference(a, b):
+                if r1 > r0:
+                    edges.append((z, r0, z, r1))
+        return np.array(edges, dtype=np.float64).reshape(-1, 4)
+
+    def distance(self, z, r):
+        """Unsigned distance [cm] from each point to the surface of the polycone."""
+        z = np.asarray(z, dtype=np.float64).ravel()
+        r = np.asarray(r, dtype=np.float64).ravel()
+        out = np.empty(len(z))
+        ez0, er0, ez1, er1 = self._edges.T
+        dz, dr = ez1 - ez0, er1 - er0
+        length2 = np.where(dz * dz + dr * dr > 0, dz * dz + dr * dr, 1.0)
+        for start in range(0, len(z), CHUNK_SIZE):
+            pz = z[start:start + CHUNK_SIZE, None]
+            pr = r[start:start + CHUNK_SIZE, None]
+            t = np.clip(((pz - ez0) * dz + (pr - er0) * dr) / length2, 0.0, 1.0)
+            d2 = (pz - ez0 - t * dz) ** 2 + (pr - er0 - t * dr) ** 2
+            out[start:start + CHUNK_SIZE] = np.sqrt(d2.min(axis=1))
+        return out
+
+    def signed_distance(self, z, r):
+        """Distance to the surface [cm], negative inside the polycone."""
+        d = self.distance(z, r)
+        return np.where(self.contains(np.ravel(z), np.ravel(r)), -d, d)
+
+def _interval_symmetric_difference(a, b):
+    """Symmetric difference of two closed intervals (either may be None) as a list of intervals."""
+    if a is None or b is None:
+        return [x for x in (a, b) if x is not None]
+    if a[1] < b[0] or b[1] < a[0]:
+        return [a, b]
+    return [(min(a[0], b[0]), max(a[0], b[0])), (min(a[1], b[1]), max(a[1], b[1]))]
+
+# ================================
+# POLYCONE SETS
+# ================================
+
+class PolyconeQuery:
+    """
+    Vectorized geometry queries over the polycone detectors of a Nozzle (or Beampipe) XML.
+
+    Usage:
+        query = PolyconeQuery.from_xml("Nozzle_10deg_base.xml")
+        inside = query.contains("NozzleW_right", z, r)
+        names = query.volume_names(query.classify(z, r))
+    """
+
+    def __init__(self, profiles):
+        self.polycones = {name: Polycone(name, planes) for name, planes in profiles.items()}
+
+    @classmethod
+    def from_xml(cls, xml_paths, prefixes=None, constants=None):
+        """Build from one or more XML files; symbolic z values are resolved with parse_units."""
+        if isinstance(xml_paths, (str, bytes)) or not hasattr(xml_paths, "__iter__"):
+            xml_paths = [xml_paths]
+        profiles = {}
+        for xml_path in xml_paths:
+            profiles.update(read_polycone_zplanes(xml_path, constants, prefixes))
+        return cls(profiles)
+
+    def names(self, prefix=""):
+        return [name for name in self.polycones if name.startswith(prefix)]
+
+    def __getitem__(self, name):
+        return self.polycones[name]
+
+    def contains(self, prefix, z, r):
+        """True where a point is inside any polycone whose name starts with prefix."""
+        inside = np.zeros(np.broadcast(np.asarray(z), np.asarray(r)).shape, dtype=bool)
+        for name in self.names(prefix):
+            inside |= self.polycones[name].contains(z, r)
+        return inside
+
+    def distance(self, prefix, z, r):
+        """Distance to the nearest surface of the polycones starting with prefix."""
+        return np.min([self.polycones[name].distance(z, r) for name in self.names(prefix)], axis=0)
+
+    def thickness(self, prefix, z, side="after"):
+        """Summed radial thickness of the polycones starting with prefix at each z."""
+        return np.sum([self.polycones[name].thickness(z, side) for name in self.names(prefix)], axis=0)
+
+    def classify(self, z, r, order=None):
+        """
+        Index of the polycone each point lies in, -1 outside all of them.
+
+        Args:
+            order: Polycone names in order of precedence for points inside several (default: all, in file order)
+        """
+        order = list(self.polycones) if order is None else list(order)
+        labels = np.full(np.broadcast(np.asarray(z), np.asarray(r)).shape, -1, dtype=np.int16)
+        for i in reversed(range(len(order))):
+            labels[self.polycones[order[i]].contains(z, r)] = i
+        return labels
+
+    def volume_names(self, labels, order=None):
+        names = np.array((list(self.polycones) if order is None else list(order)) + [""], dtype=object)
+        return names[labels]
+
+# ================================
+# MAIN EXECUTION
+# ================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Point queries against the polycones of Nozzle XMLs')
+    parser.add_argument('xml_files', nargs='+')
+    parser.add_argument('--z', type=float, required=True, help='z [cm]')
+    parser.add_argument('--r', type=float, required=True, help='r [cm]')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    query = PolyconeQuery.from_xml(args.xml_files)
+    z, r = np.array([args.z]), np.array([args.r])
+    for name, polycone in query.polycones.items():
+        if polycone.zmin <= args.z <= polycone.zmax:
+            inside = polycone.contains(z, r)[0]
+            logger.info(f"{name}: {'inside' if inside else 'outside'}, distance {polycone.distance(z, r)[0]:.4g} cm, "
+                        f"thickness {polycone.thickness(z)[0]:.4g} cm")
@@ -0,0 +1,302 @@
+import json
+import math
+import re
+import logging
+from pathlib import Path
+
+import numpy as np
+
+from NozzleCreationv2 import (
+    get_nozzle_base_geometry, get_blackhole_base_geometry, NOZZLE_TIP_ORIGINAL_Z
+)
+from nozzle_polycones import (
+    read_polycone_zplanes, profiles_from_geometry_dict, total_volume, find_nozzle_xml
+)
+
+logger = logging.getLogger(__name__)
+
+## $ python sim_cost_model.py --fit path/to/variants_dir   to refit the model from finished variants
+## $ python sim_cost_model.py path/to/variants_dir         to print predictions for a sweep
+
+# ================================
+# CONFIGURABLE PARAMETERS
+# ================================
+
+DEFAULT_MODEL_PATH = Path(__file__).with_name("sim_cost_model.json")
+
+# Ridge penalty on the (standardized) feature weights; keeps the fit sane with few runs
+RIDGE_LAMBDA = 0.1
+
+# Condor request derivation
+RUNTIME_SAFETY_FACTOR = 2.0     # requested runtime = predicted wall time * factor
+MIN_RUNTIME_S = 1800
+BASE_MEMORY_MB = 2048           # ddsim + geometry footprint
+MEMORY_PER_OUTPUT_MB = 2.0      # extra memory per MB of predicted LCIO output
+DISK_SAFETY_FACTOR = 1.5
+MIN_DISK_MB = 2048
+
+FEATURE_NAMES = ["tungsten_volume", "blackhole_volume", "log_z_start", "reduction"]
+
+# ================================
+# HISTORICAL PERFORMANCE DATA
+# ================================
+
+# 100-event mumu -> H bb runs (analysis/pylcio/drivers/times.py and scripts/files_sizes.py).
+# Only the two runs whose geometry matches the NozzleCreationv2 base geometries are used:
+# "Default" is the full tungsten nozzle, "Blackhole Nozzle" the starter blackhole.
+HISTORICAL_RUNS = [
+    {"name": "Default", "blackhole": False, "wall_time_s": 800.95, "output_mb": 258.08},
+    {"name": "Blackhole Nozzle", "blackhole": True, "wall_time_s": 547.21, "output_mb": 242.03},
+]
+
+# ================================
+# FEATURES
+# ================================
+
+def features_from_profiles(profiles, z_start, reduction):
+    """
+    Build the cost-model feature dictionary from polycone profiles.
+
+    Args:
+        profiles: Dictionary of detector name -> list of (z, rmin, rmax) in cm
+        z_start: Blackhole start position relative to the tip [cm]
+        reduction: Blackhole rmax reduction [cm]
+    """
+    return {
+        "tungsten_volume": total_volume(profiles, "NozzleW"),
+        "blackhole_volume": total_volume(profiles, "NozzleBlackhole"),
+        "log_z_start": math.log10(max(z_start, 1e-6)),
+        "reduction": reduction,
+    }
+
+def parse_variant_name(name):
+    """Extract (z_start, reduction) from a NozzleCreationv2 variant name, or (None, None)."""
+    match = re.search(r"zstart_([0-9.]+)_reduction_([0-9.]+)", name)
+    if not match:
+        return None, None
+    return float(match.group(1)), float(match.group(2))
+
+def features_for_variant(variant_folder):
+    """
+    Compute cost-model features for a generated variant folder.
+
+    Returns:
+        Feature dictionary, or None if the folder has no Nozzle XML
+    """
+    variant_folder = Path(variant_folder)
+    nozzle_xml = find_nozzle_xml(variant_folder)
+    if nozzle_xml is None:
+        return None
+    profiles = read_polycone_zplanes(nozzle_xml, prefixes=("NozzleW", "NozzleBlackhole"))
+
+    z_start, reduction = parse_variant_name(variant_folder.name)
+    if z_start is None:
+        # Fall back to the geometry itself: blackhole start relative to the tip, no reduction info
+        blackhole_z = [abs(z) for name, planes in profiles.items()
+                       if name.startswith("NozzleBlackhole") for z, _, _ in planes]
+        z_start = (min(blackhole_z) - NOZZLE_TIP_ORIGINAL_Z) if blackhole_z else 0.0
+        reduction = 0.0
+    return features_from_profiles(profiles, z_start, reduction)
+
+def historical_features(run):
+    """Features of one of the HISTORICAL_RUNS, derived from the base geometries."""
+    nozzle = profiles_from_geometry_dict(get_nozzle_base_geometry(), NOZZLE_TIP_ORIGINAL_Z)
+    blackhole = profiles_from_geometry_dict(get_blackhole_base_geometry(), NOZZLE_TIP_ORIGINAL_Z)
+    z_start = min(abs(z) for planes in blackhole.values() for z, _, _ in planes) - NOZZLE_TIP_ORIGINAL_Z
+    if run["blackhole"]:
+        return features_from_profiles({**nozzle, **blackhole}, z_start, 0.0)
+    # Default nozzle: the blackhole region is plain tungsten
+    features = features_from_profiles(nozzle, z_start, 0.0)
+    features["tungsten_volume"] += total_volume(blackhole, "NozzleBlackhole")
+    features["blackhole_volume"] = 0.0
+    return features
+
+# ================================
+# SIM.LOG HARVESTING
+# ================================
+
+def parse_sim_log_time(log_path):
+    """Return the ddsim total wall time in seconds from a sim.log, or None."""
+    try:
+        with open(log_path, "r", encoding="utf-8", errors="replace") as f:
+            text = f.read()
+    except OSError:
+        return None
+    matches = re.findall(r"Total Time:\s*([0-9.]+)\s*s", text)
+    return float(matches[-1]) if matches else None
+
+def collect_variant_runs(variants_dir):
+    """
+    Collect finished runs (sim.log + .slcio) from a variants directory as training records.
+
+    Returns:
+        List of dictionaries with 'name', 'features', 'wall_time_s' and 'output_mb'
+    """
+    runs = []
+    for variant_folder in sorted(Path(variants_dir).iterdir()):
+        if not variant_folder.is_dir():
+            continue
+        wall_time = parse_sim_log_time(variant_folder / "sim.log")
+        outputs = list(variant_folder.glob("*.slcio"))
+        if wall_time is None or not outputs:
+            continue
+        features = features_for_variant(variant_folder)
+        if features is None:
+            continue
+        runs.append({
+            "name": variant_folder.name,
+            "features": features,
+            "wall_time_s": wall_time,
+            "output_mb": sum(p.stat().st_size for p in outputs) / 1e6,
+        })
+    return runs
+
+# ================================
+# COST MODEL
+# ================================
+
+class SimCostModel:
+    """Ridge-regression model of ddsim wall time and output size per nozzle variant."""
+
+    TARGETS = ("wall_time_s", "output_mb")
+
+    def __init__(self, mean=None, scale=None, weights=None, n_runs=0):
+        self.mean = np.zeros(len(FEATURE_NAMES)) if mean is None else np.asarray(mean, dtype=float)
+        self.scale = np.ones(len(FEATURE_NAMES)) if scale is None else np.asarray(scale, dtype=float)
+        self.weights = weights or {}
+        self.n_runs = n_runs
+
+    @staticmethod
+    def _matrix(feature_dicts):
+        return np.array([[f[name] for name in FEATURE_NAMES] for f in feature_dicts], dtype=float)
+
+    def fit(self, runs, ridge_lambda=RIDGE_LAMBDA):
+        """
+        Fit the model.
+
+        Args:
+            runs: List of dictionaries with 'features' and one entry per target
+            ridge_lambda: Penalty on the standardized feature weights (not the intercept)
+        """
+        x = self._matrix([run["features"] for run in runs])
+        self.mean = x.mean(axis=0)
+        self.scale = x.std(axis=0)
+        self.scale[self.scale == 0] = 1.0
+        design = np.hstack([np.ones((len(runs), 1)), (x - self.mean) / self.scale])
+
+        penalty = ridge_lambda * np.eye(design.shape[1])
+        penalty[0, 0] = 0.0
+        for target in self.TARGETS:
+            y = np.array([run[target] for run in runs], dtype=float)
+            self.weights[target] = np.linalg.solve(design.T @ design + penalty, design.T @ y).tolist()
+        self.n_runs = len(runs)
+        return self
+
+    def predict(self, features):
+        """
+        Predict the cost of a single variant.
+
+        Returns:
+            Dictionary with 'wall_time_s' and 'output_mb'
+        """
+        x = (self._matrix([features])[0] - self.mean) / self.scale
+        row = np.concatenate([[1.0], x])
+        return {target: max(float(row @ np.asarray(self.weights[target])), 0.0) for target in self.TARGETS}
+
+    def save(self, path=DEFAULT_MODEL_PATH):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "features": FEATURE_NAMES,
+                "mean": self.mean.tolist(),
+                "scale": self.scale.tolist(),
+                "weights": self.weights,
+                "n_runs": self.n_runs,
+            }, f, indent=2)
+        logger.info(f"Saved cost model ({self.n_runs} runs) to {path}")
+
+    @classmethod
+    def load(cls, path=DEFAULT_MODEL_PATH):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("features") != FEATURE_NAMES:
+            raise ValueError(f"Cost model at {path} was trained on different features: {data.get('features')}")
+        return cls(data["mean"], data["scale"], data["weights"], data.get("n_runs", 0))
+
+def train_cost_model(variants_dirs=(), ridge_lambda=RIDGE_LAMBDA):
+    """Fit a model on HISTORICAL_RUNS plus any finished runs found in variants_dirs."""
+    runs = [dict(run, features=historical_features(run)) for run in HISTORICAL_RUNS]
+    for variants_dir in variants_dirs:
+        harvested = collect_variant_runs(variants_dir)
+        logger.info(f"Harvested {len(harvested)} finished runs from {variants_dir}")
+        runs.extend(harvested)
+    return SimCostModel().fit(runs, ridge_lambda)
+
+def load_or_train_cost_model(path=DEFAULT_MODEL_PATH):
+    """Load the saved model, or train one on the historical data if none exists."""
+    if Path(path).exists():
+        try:
+            return SimCostModel.load(path)
+        except (ValueError, KeyError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unusable cost model {path}: {e}")
+    return train_cost_model()
+
+# ================================
+# CONDOR RESOURCE REQUESTS
+# ================================
+
+def condor_requests(prediction):
+    """
+    Derive HTCondor resource requests from a cost prediction.
+
+    Returns:
+        Dictionary with request_cpus, request_memory_mb, request_disk_mb and max_runtime_s
+    """
+    return {
+        "request_cpus": 1,  # ddsim runs single-threaded in our steering files
+        "request_memory_mb": int(math.ceil(BASE_MEMORY_MB + MEMORY_PER_OUTPUT_MB * prediction["output_mb"])),
+        "request_disk_mb": int(math.ceil(max(MIN_DISK_MB, DISK_SAFETY_FACTOR * prediction["output_mb"]))),
+        "max_runtime_s": int(math.ceil(max(MIN_RUNTIME_S, RUNTIME_SAFETY_FACTOR * prediction["wall_time_s"]))),
+    }
+
+def predict_variants(variants_dir, model=None):
+    """
+    Predict the cost of every variant folder, ordered longest-first.
+
+    Returns:
+        List of (variant_folder, prediction) tuples
+    """
+    model = model or load_or_train_cost_model()
+    predictions = []
+    for variant_folder in Path(variants_dir).iterdir():
+        if not variant_folder.is_dir():
+            continue
+        features = features_for_variant(variant_folder)
+        if features is None:
+            continue
+        predictions.append((variant_folder, model.predict(features)))
+    predictions.sort(key=lambda item: item[1]["wall_time_s"], reverse=True)
+    return predictions
+
+# ================================
+# MAIN EXECUTION
+# ================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Predict ddsim cost of nozzle variants')
+    parser.add_argument('variants_dir', help='Directory with generated variant folders')
+    parser.add_argument('--fit', action='store_true', help='Refit the model including finished runs in variants_dir')
+    parser.add_argument('--model', default=str(DEFAULT_MODEL_PATH), help='Path of the model JSON file')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.fit:
+        model = train_cost_model([args.variants_dir])
+        model.save(args.model)
+    else:
+        model = load_or_train_cost_model(args.model)
+
+    for variant_folder, prediction in predict_variants(args.variants_dir, model):
+        print(f"{variant_folder.name:60s} {prediction['wall_time_s']:9.1f} s {prediction['output_mb']:9.1f} MB")
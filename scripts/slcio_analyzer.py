@@ -2,11 +2,84 @@ import pyLCIO
 import ROOT
 import os
 import glob
-import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+import numpy as np
+
+from histograms import Hist, SparseHist2D, save_hists
+from variant_catalog import VariantCatalog, CATALOG_FILENAME
+
+# The R vs Z vertex map is kept as a sparse map at VERTEX_MAP_BIN_MM; the plotted views
+# are rebinned from it as (z range, r range, z bin, r bin) in mm
+VERTEX_MAP_BIN_MM = 0.1
+VERTEX_MAP_VIEW = ((-2600, 2600), (0, 400), 104, 8)
+NOZZLE_TIP_VIEW = ((60, 260), (0, 100), 0.5, 0.5)  # first 20 cm of the +z nozzle (Nozzle_zmin = 6 cm)
+
+def fill_file_histograms(file_path, hists, max_events=-1):
+    """
+    Fill the histograms of create_histograms with the MCParticles of one file.
+
+    Each event is filled in bulk from NumPy arrays. Also used as the process-pool entry
+    point (the histograms are plain NumPy arrays, so they pickle cheaply).
+
+    Returns:
+        (hists, number of events processed)
+    """
+    event_count = 0
+    reader = pyLCIO.IOIMPL.LCFactory.getInstance().createLCReader()
+    reader.open(file_path)
+
+    for event in reader:
+        if max_events > 0 and event_count >= max_events:
+            break
+
+        if event_count % 1000 == 0:
+            print(f"    Processing event {event_count} of {os.path.basename(file_path)}...")
+
+        # Process MCParticle collection
+        try:
+            collection = event.getCollection("MCParticle")
+
+            vertex = np.array([[particle.getVertex()[k] for k in range(3)] for particle in collection]).reshape(-1, 3)
+            x, y, z = vertex.T
+            radius = np.sqrt(x**2 + y**2)
+            energy = np.array([particle.getEnergy() for particle in collection])
+
+            # Fill histograms
+            hists["r_vs_z"].fill(z, radius)
+            hists["z_dist"].fill(z)
+            hists["r_dist"].fill(radius)
+            hists["energy"].fill(energy)
+
+        except Exception as e:
+            print(f"    Warning: Could not process MCParticle collection: {e}")
+
+        event_count += 1
+
+    reader.close()
+    return hists, event_count
+
+def fill_files_histograms(file_list, hists, max_events=-1):
+    """
+    Fill the histograms with several files in order, stopping after max_events in total.
+
+    Returns:
+        (hists, number of events processed)
+    """
+    event_count = 0
+    for file_path in file_list:
+        print(f"  Processing file: {os.path.basename(file_path)}")
+        remaining = max_events - event_count if max_events > 0 else -1
+        _, n_events = fill_file_histograms(file_path, hists, remaining)
+        event_count += n_events
+        if max_events > 0 and event_count >= max_events:
+            break
+    return hists, event_count
+
 class SLCIOAnalyzer:
-    def __init__(self, base_dir, output_dir="plots", max_events=-1):
+    def __init__(self, base_dir, output_dir="plots", max_events=-1, workers=1):
         """
         Initialize the SLCIO analyzer.
         
@@ -14,10 +87,12 @@ class SLCIOAnalyzer:
             base_dir: Base directory to search for .slcio files
             output_dir: Directory to save output plots
             max_events: Maximum number of events to process (-1 for all)
+            workers: Worker processes reading files of all datasets in parallel
         """
         self.base_dir = base_dir
         self.output_dir = output_dir
         self.max_events = max_events
+        self.workers = workers
         self.datasets = {}
         
         # Create output directory if it doesn't exist
@@ -28,7 +103,19 @@ class SLCIOAnalyzer:
         ROOT.gROOT.SetBatch(True)  # Run in batch mode (no display)
     
     def find_slcio_files(self):
-        """Find all .slcio files in the base directory and subdirectories."""
+        """
+        Find all .slcio files in the base directory and subdirectories.
+
+        If the base directory is a sweep with a variant catalog, the datasets are
+        read from the catalog (named after the variants) instead of walking the tree.
+        """
+        if os.path.exists(os.path.join(self.base_dir, CATALOG_FILENAME)):
+            catalog = VariantCatalog(self.base_dir)
+            for entry in catalog.query(existing="slcio"):
+                self.datasets.setdefault(entry["name"], []).append(str(entry["slcio"]))
+            catalog.close()
+            return self.datasets
+
         pattern = os.path.join(self.base_dir, "**/*.slcio")
         files = glob.glob(pattern, recursive=True)
         
@@ -65,32 +152,31 @@ class SLCIOAnalyzer:
         # Create different histogram types
         hist_name_base = f"MCParticle_VertexMap_R_vs_Z_{dataset_name}"
         
-        # 2D histogram: R vs Z
-        hists["r_vs_z"] = ROOT.TH2F(
-            hist_name_base,
-            f"MCParticle Vertex Map R vs Z - {dataset_name}",
-            50, -2600, 2600,  # Z axis bins
-            50, 0, 400        # R axis bins
+        # 2D histogram: R vs Z, sparse at sub-mm resolution (views are derived in save_plots)
+        hists["r_vs_z"] = SparseHist2D(
+            VERTEX_MAP_BIN_MM, VERTEX_MAP_BIN_MM,
+            name=hist_name_base,
+            title=f"MCParticle Vertex Map R vs Z - {dataset_name}"
         )
         
         # Additional 1D histograms
-        hists["z_dist"] = ROOT.TH1F(
-            f"MCParticle_Z_Distribution_{dataset_name}",
-            f"MCParticle Z Distribution - {dataset_name}",
-            100, -2600, 2600
+        hists["z_dist"] = Hist(
+            (100, -2600, 2600),
+            name=f"MCParticle_Z_Distribution_{dataset_name}",
+            title=f"MCParticle Z Distribution - {dataset_name}"
         )
         
-        hists["r_dist"] = ROOT.TH1F(
-            f"MCParticle_R_Distribution_{dataset_name}",
-            f"MCParticle R Distribution - {dataset_name}",
-            100, 0, 400
+        hists["r_dist"] = Hist(
+            (100, 0, 400),
+            name=f"MCParticle_R_Distribution_{dataset_name}",
+            title=f"MCParticle R Distribution - {dataset_name}"
         )
         
         # Energy histogram (if available)
-        hists["energy"] = ROOT.TH1F(
-            f"MCParticle_Energy_{dataset_name}",
-            f"MCParticle Energy - {dataset_name}",
-            100, 0, 100  # Adjust range as needed
+        hists["energy"] = Hist(
+            (100, 0, 100),  # Adjust range as needed
+            name=f"MCParticle_Energy_{dataset_name}",
+            title=f"MCParticle Energy - {dataset_name}"
         )
         
         return hists
@@ -102,57 +188,60 @@ class SLCIOAnalyzer:
         
         # Create histograms for this dataset
         hists = self.create_histograms(dataset_name)
-        
-        event_count = 0
-        
-        for file_path in file_list:
-            print(f"  Processing file: {os.path.basename(file_path)}")
-            
-            reader = pyLCIO.IOIMPL.LCFactory.getInstance().createLCReader()
-            reader.open(file_path)
-            
-            for event in reader:
-                if self.max_events > 0 and event_count >= self.max_events:
-                    break
-                
-                if event_count % 1000 == 0:
-                    print(f"    Processing event {event_count}...")
-                
-                # Process MCParticle collection
-                try:
-                    collection = event.getCollection("MCParticle")
-                    
-                    for particle in collection:
-                        vertex = particle.getVertex()
-                        x, y, z = vertex[0], vertex[1], vertex[2]
-                        radius = math.sqrt(x**2 + y**2)
-                        energy = particle.getEnergy()
-                        
-                        # Fill histograms
-                        hists["r_vs_z"].Fill(z, radius)
-                        hists["z_dist"].Fill(z)
-                        hists["r_dist"].Fill(radius)
-                        hists["energy"].Fill(energy)
-                
-                except Exception as e:
-                    print(f"    Warning: Could not process MCParticle collection: {e}")
-                
-                event_count += 1
-            
-            reader.close()
-            
-            if self.max_events > 0 and event_count >= self.max_events:
-                break
+        _, event_count = fill_files_histograms(file_list, hists, self.max_events)
         
         print(f"  Total events processed: {event_count}")
         
         return hists, event_count
     
+    def process_datasets(self):
+        """
+        Fill the histograms of all datasets, with the files spread over worker processes.
+
+        Without an event limit every file is its own job. With a limit, the files of a
+        dataset stay in one job so that the limit applies to the dataset as a whole.
+        Each job fills its own empty histograms, merged per dataset with +.
+
+        Returns:
+            Dictionary of dataset name -> (hists, number of events processed)
+        """
+        if self.workers <= 1:
+            return {name: self.process_dataset(name, file_list) for name, file_list in self.datasets.items()}
+        
+        results = {name: (self.create_histograms(name), 0) for name in self.datasets}
+        jobs = []
+        for name, file_list in self.datasets.items():
+            groups = [[file_path] for file_path in file_list] if self.max_events <= 0 else [file_list]
+            jobs += [(name, group) for group in groups]
+        print(f"\nProcessing {len(jobs)} job(s) with {self.workers} workers")
+        
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as pool:
+            futures = [(name, pool.submit(fill_files_histograms, group, self.create_histograms(name), self.max_events))
+                       for name, group in jobs]
+            for name, future in futures:
+                job_hists, n_events = future.result()
+                hists, event_count = results[name]
+                for key in hists:
+                    hists[key] += job_hists[key]
+                results[name] = (hists, event_count + n_events)
+        
+        for name, (_, event_count) in results.items():
+            print(f"  {name}: {event_count} events processed")
+        return results
+    
     def save_plots(self, dataset_name, hists, event_count):
         """Save plots for a specific dataset."""
         dataset_dir = os.path.join(self.output_dir, dataset_name)
         Path(dataset_dir).mkdir(parents=True, exist_ok=True)
         
+        # Keep the mergeable arrays; ROOT is only used for drawing
+        save_hists(hists, os.path.join(dataset_dir, "histograms.npz"))
+        vertex_map = hists["r_vs_z"]
+        hists = {key: hist.to_root() for key, hist in hists.items() if key != "r_vs_z"}
+        hists["r_vs_z"] = vertex_map.to_hist(*VERTEX_MAP_VIEW).to_root()
+        hists["r_vs_z_nozzle_tip"] = vertex_map.to_hist(*NOZZLE_TIP_VIEW, name=f"{vertex_map.name}_NozzleTip").to_root()
+        
         # Save 2D histogram
         c1 = ROOT.TCanvas(f"c_{dataset_name}_2d", f"c_{dataset_name}_2d", 1400, 1000)
         c1.SetLeftMargin(0.12)
@@ -181,6 +270,23 @@ class SLCIOAnalyzer:
         c1.SaveAs(os.path.join(dataset_dir, "vertex_map_r_vs_z.png"))
         c1.SaveAs(os.path.join(dataset_dir, "vertex_map_r_vs_z.pdf"))
         
+        # Zoom on the nozzle tip, from the same fine map
+        c1z = ROOT.TCanvas(f"c_{dataset_name}_2d_tip", f"c_{dataset_name}_2d_tip", 1400, 1000)
+        c1z.SetLeftMargin(0.12)
+        c1z.SetRightMargin(0.15)
+        c1z.SetBottomMargin(0.12)
+        c1z.SetTopMargin(0.08)
+        
+        h2d_tip = hists["r_vs_z_nozzle_tip"]
+        h2d_tip.SetXTitle("Vertex Z [mm]")
+        h2d_tip.SetYTitle("Vertex R [mm]")
+        h2d_tip.SetZTitle("Counts")
+        h2d_tip.Draw("COLZ")
+        c1z.SetLogz()
+        
+        c1z.SaveAs(os.path.join(dataset_dir, "vertex_map_nozzle_tip.png"))
+        c1z.SaveAs(os.path.join(dataset_dir, "vertex_map_nozzle_tip.pdf"))
+        
         # Save 1D histograms
         # Z distribution
         c2 = ROOT.TCanvas(f"c_{dataset_name}_z", f"c_{dataset_name}_z", 1000, 800)
@@ -285,9 +391,8 @@ class SLCIOAnalyzer:
         for name in self.datasets:
             print(f"  - {name}: {len(self.datasets[name])} file(s)")
         
-        # Process each dataset
-        for dataset_name, file_list in self.datasets.items():
-            hists, event_count = self.process_dataset(dataset_name, file_list)
+        # Process all datasets, in parallel over files with several workers
+        for dataset_name, (hists, event_count) in self.process_datasets().items():
             self.save_plots(dataset_name, hists, event_count)
         
         # Create comparison plots
@@ -298,14 +403,24 @@ class SLCIOAnalyzer:
 
 # Example usage
 if __name__ == "__main__":
+    import argparse
+    
     # Set your base directory here
     base_directory = "/home/devlinjenkins/projects/NozzleSimOpti/simulation/geometries/MAIA_v0_Blackhole/nozzle_varients"
     
+    parser = argparse.ArgumentParser(description='MCParticle vertex, energy and R vs Z plots for every dataset of .slcio files')
+    parser.add_argument('base_dir', nargs='?', default=base_directory)
+    parser.add_argument('-o', '--output-dir', default="slcio_analysis_plots")
+    parser.add_argument('--max-events', type=int, default=-1, help='Events per dataset (-1 for all)')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes reading files of all datasets in parallel')
+    args = parser.parse_args()
+    
     # Create analyzer instance
     analyzer = SLCIOAnalyzer(
-        base_dir=base_directory,
-        output_dir="slcio_analysis_plots",
-        max_events=-1  # Process all events, set to positive number to limit
+        base_dir=args.base_dir,
+        output_dir=args.output_dir,
+        max_events=args.max_events,  # Process all events, set to positive number to limit
+        workers=args.workers
     )
     
     # Run the analysis
@@ -0,0 +1,198 @@
+import ast
+import copy
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# ================================
+# CONSTANTS
+# ================================
+
+# Settings that are overridden per job; everything else comes from the template
+JOB_SETTINGS = ("compactFile", "outputFile", "numberOfEvents", "skipNEvents", "random.seed")
+
+class SteeringValidationError(ValueError):
+    """Raised when one or more rendered steering files would not describe a valid job."""
+
+class SteeringExpression(str):
+    """A raw Python expression (e.g. '0.7*mm') rendered verbatim instead of repr()'d."""
+
+    def __repr__(self):
+        return str(self)
+
+# ================================
+# STEERING CONFIG
+# ================================
+
+class SteeringConfig:
+    """
+    A DD4hepSimulation steering file loaded as a mapping of SIM settings.
+
+    The template is parsed with ast: every top-level `SIM.<a>.<b> = <expr>` assignment
+    becomes a setting keyed by its dotted name ('compactFile', 'random.seed', ...).
+    Rendering rewrites exactly those assignments, so a setting can never be silently
+    left at its template value the way a failed string replace would.
+    """
+
+    def __init__(self, template_path):
+        self.template_path = Path(template_path)
+        with open(self.template_path, "r", encoding="utf-8") as f:
+            self.source = f.read()
+        self.lines = self.source.splitlines()
+        self.settings = {}   # dotted key -> (first line, last line, source expression)
+        self.overrides = {}  # dotted key -> python value or SteeringExpression
+        self._parse()
+
+    @staticmethod
+    def _dotted_name(node):
+        parts = []
+        while isinstance(node, ast.Attribute):
+            parts.append(node.attr)
+            node = node.value
+        if isinstance(node, ast.Name) and node.id == "SIM" and parts:
+            return ".".join(reversed(parts))
+        return None
+
+    def _parse(self):
+        tree = ast.parse(self.source, filename=str(self.template_path))
+        has_sim = False
+        for node in tree.body:
+            if not isinstance(node, ast.Assign) or len(node.targets) != 1:
+                continue
+            target = node.targets[0]
+            if isinstance(target, ast.Name) and target.id == "SIM":
+                has_sim = isinstance(node.value, ast.Call) and getattr(node.value.func, "id", "") == "DD4hepSimulation"
+                continue
+            key = self._dotted_name(target)
+            if key is not None:
+                self.settings[key] = (node.lineno, node.end_lineno, ast.get_source_segment(self.source, node.value))
+        if not has_sim:
+            raise SteeringValidationError(f"{self.template_path} does not create SIM = DD4hepSimulation()")
+
+    def get(self, key):
+        """Return the current value of a setting: the override, else the template expression."""
+        if key in self.overrides:
+            return self.overrides[key]
+        if key in self.settings:
+            return SteeringExpression(self.settings[key][2])
+        raise KeyError(key)
+
+    def set(self, key, value):
+        """Override a setting; strings are quoted, SteeringExpression values are written verbatim."""
+        self.overrides[key] = value
+        return self
+
+    def with_job(self, compact_file, output_file, number_of_events=None, skip_n_events=None, seed=None,
+                 extra=None):
+        """
+        Return a copy of this config with the per-job settings overridden.
+
+        Args:
+            compact_file: Compact (MAIA) XML file of the variant
+            output_file: LCIO output file name
+            number_of_events, skip_n_events, seed: Optional overrides of the template values
+            extra: Optional dictionary of further dotted-key overrides
+        """
+        job = copy.copy(self)
+        job.overrides = dict(self.overrides)
+        job.set("compactFile", str(compact_file))
+        job.set("outputFile", str(output_file))
+        if number_of_events is not None:
+            job.set("numberOfEvents", int(number_of_events))
+        if skip_n_events is not None:
+            job.set("skipNEvents", int(skip_n_events))
+        if seed is not None:
+            job.set("random.seed", int(seed))
+        for key, value in (extra or {}).items():
+            job.set(key, value)
+        return job
+
+    def validate(self):
+        """
+        Check that the config describes a runnable job.
+
+        Returns:
+            List of error messages (empty if valid)
+        """
+        errors = []
+        for key in self.overrides:
+            if key not in self.settings:
+                errors.append(f"SIM.{key} does not exist in template {self.template_path.name}")
+
+        compact = self.overrides.get("compactFile")
+        if compact is None:
+            errors.append("compactFile is not set for this job")
+        elif not Path(compact).is_file():
+            errors.append(f"compactFile does not exist: {compact}")
+
+        output = self.overrides.get("outputFile")
+        if output is not None and not str(output).endswith(".slcio"):
+            errors.append(f"outputFile must be an .slcio file: {output}")
+
+        for key, minimum in (("numberOfEvents", -1), ("skipNEvents", 0), ("random.seed", 0)):
+            value = self.overrides.get(key)
+            if value is not None and (not isinstance(value, int) or value < minimum):
+                errors.append(f"{key} must be an integer >= {minimum}: {value!r}")
+        return errors
+
+    def render(self):
+        """Return the steering file text with all overrides applied."""
+        lines = list(self.lines)
+        # Replace from the bottom so earlier line numbers stay valid
+        replaced = sorted(((self.settings[key], key) for key in self.overrides if key in self.settings),
+                          reverse=True)
+        for (first, last, _), key in replaced:
+            lines[first - 1:last] = [f"SIM.{key} = {self.overrides[key]!r}"]
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Validate and write the steering file, raising SteeringValidationError on failure."""
+        errors = self.validate()
+        if errors:
+            raise SteeringValidationError(f"Invalid steering file {path}:\n  " + "\n  ".join(errors))
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        return Path(path)
+
+# ================================
+# BULK RENDERING
+# ================================
+
+def render_steering_files(template_path, jobs, extra=None):
+    """
+    Render a batch of steering files from one template.
+
+    Every job is validated before any file is written, so a bad path aborts the
+    whole batch instead of emitting a job that simulates the wrong geometry.
+
+    Args:
+        template_path: Base DD4hepSimulation steering file
+        jobs: Iterable of dictionaries with 'path', 'compact_file', 'output_file' and
+              optional 'number_of_events', 'skip_n_events', 'seed', 'extra'
+        extra: Overrides applied to every job (e.g. a cut preset)
+
+    Returns:
+        List of written steering file paths
+    """
+    base = SteeringConfig(template_path)
+    configs = []
+    errors = []
+    for job in jobs:
+        job_extra = dict(extra or {})
+        job_extra.update(job.get("extra") or {})
+        config = base.with_job(job["compact_file"], job["output_file"], job.get("number_of_events"),
+                               job.get("skip_n_events"), job.get("seed"), job_extra)
+        job_errors = config.validate()
+        if job_errors:
+            errors.append(f"{job['path']}: " + "; ".join(job_errors))
+        configs.append((job["path"], config))
+
+    if errors:
+        raise SteeringValidationError("Steering validation failed:\n  " + "\n  ".join(errors))
+
+    written = []
+    for path, config in configs:
+        written.append(config.write(path))
+        logger.debug(f"Wrote steering file: {path}")
+    return written
@@ -3,14 +3,23 @@
 # Navigate to the variant directory if not already there
 cd /home/devlinjenkins/projects/NozzleSimOpti/simulation/geometries/MAIA_v0_Blackhole/nozzle_variants_v3
 
-echo "Submitting all Condor jobs for nozzle variants..."
+echo "Submitting the nozzle sweep as a single Condor cluster..."
 
-# Use find with null separation to handle spaces and avoid prefix duplication
-find . -type f -name "nozzle_sim.submit" -print0 | while IFS= read -r -d '' submit_file; do
-  echo "Submitting: $submit_file"
-  if ! condor_submit "$submit_file"; then
-    echo "Failed to submit: $submit_file"
+# NozzleCreationv2.py writes one submit description for the whole sweep;
+# every variant directory is a line of nozzle_sweep_items.txt
+if [ -f nozzle_sweep.submit ]; then
+  if ! condor_submit nozzle_sweep.submit; then
+    echo "Failed to submit: nozzle_sweep.submit"
+    exit 1
   fi
-done
+else
+  # Sweeps generated before the cluster submit file existed
+  find . -type f -name "nozzle_sim.submit" -print0 | while IFS= read -r -d '' submit_file; do
+    echo "Submitting: $submit_file"
+    if ! condor_submit "$submit_file"; then
+      echo "Failed to submit: $submit_file"
+    fi
+  done
+fi
 
-echo "All available jobs have been submitted."
\ No newline at end of file
+echo "All available jobs have been submitted."
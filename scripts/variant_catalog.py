@@ -0,0 +1,302 @@
+import re
+import json
+import time
+import sqlite3
+import logging
+from pathlib import Path
+
+from pipeline_state import variant_hash
+
+## $ python variant_catalog.py index nozzle_variants_v3                    (re)build the catalog of an existing sweep
+## $ python variant_catalog.py query nozzle_variants_v3 --z-start 10.5176  list matching variants as JSON lines
+## $ python variant_catalog.py query nozzle_variants_v3 --with slcio       only variants whose .slcio exists
+
+logger = logging.getLogger(__name__)
+
+# ================================
+# CONSTANTS
+# ================================
+
+CATALOG_FILENAME = "variant_catalog.sqlite"
+
+# Derived products registered for every variant ({maia} is the compact file name)
+PRODUCT_FILES = {
+    "geometry_root": "{maia}.root",
+    "overlap_report": "overlap_report.json",
+    "cal_hits": "cal_hits.root",
+    "nozzle_attribution": "nozzle_attribution.csv",
+    "thumbnail": "nozzle_thumbnail.png",
+}
+
+# Folder names of the generator (Nozzle_zstart_0.0010_reduction_0.0500) and of the
+# earlier hand-made sweeps (nozzle_z10.5176_rmaxMinus10, nozzle_z10p5176_rmaxMinus0p6).
+# The fractional rmaxMinus values of the v2 sweep are not reductions in cm (they were
+# labelled SD=6/11/16/21cm), so only their z_start is recovered.
+VARIANT_NAME_PATTERNS = [
+    re.compile(r"zstart_(?P<z_start>[0-9.p]+)_reduction_(?P<reduction>[0-9.p]+)"),
+    re.compile(r"_z(?P<z_start>[0-9.p]+)_rmaxMinus[0-9]+p[0-9]+$"),
+    re.compile(r"_z(?P<z_start>[0-9.p]+)_rmaxMinus(?P<reduction>[0-9]+)$"),
+]
+
+PATH_COLUMNS = ("dir", "compact_xml", "nozzle_xml", "steering", "slcio", "sim_log")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS variants (
+    variant_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    z_start REAL,
+    rmax_reduction REAL,
+    effective_reduction REAL,
+    cut_preset TEXT,
+    geometry_hash TEXT,
+    dir TEXT NOT NULL,
+    compact_xml TEXT,
+    nozzle_xml TEXT,
+    steering TEXT,
+    slcio TEXT,
+    sim_log TEXT,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS products (
+    variant_id TEXT NOT NULL REFERENCES variants(variant_id),
+    kind TEXT NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (variant_id, kind)
+);
+CREATE INDEX IF NOT EXISTS variants_z_start ON variants (z_start);
+CREATE INDEX IF NOT EXISTS variants_reduction ON variants (effective_reduction);
+"""
+
+def parse_variant_name(name):
+    """
+    Recover (z_start, reduction) from a variant folder name.
+
+    Returns:
+        (z_start, reduction) in cm; None for values the name has no known pattern for
+    """
+    for pattern in VARIANT_NAME_PATTERNS:
+        match = pattern.search(name)
+        if match:
+            values = match.groupdict()
+            return tuple(None if values.get(key) is None else float(values[key].replace("p", "."))
+                         for key in ("z_start", "reduction"))
+    return None, None
+
+def _path_of(entry, key):
+    return entry[key] if key in PATH_COLUMNS else entry["products"].get(key)
+
+# ================================
+# CATALOG
+# ================================
+
+class VariantCatalog:
+    """
+    SQLite index of the variants of a sweep: parameters, geometry hash and the paths
+    of every input and product.
+
+    Paths are stored relative to the sweep directory, so the sweep can be moved or
+    mounted elsewhere; entries are returned with absolute Path objects.
+
+    Usage:
+        catalog = VariantCatalog("nozzle_variants_v3")
+        for variant in catalog.query(z_start=10.5176, existing="slcio"):
+            print(variant["name"], variant["slcio"])
+    """
+
+    def __init__(self, sweep_dir, filename=CATALOG_FILENAME):
+        self.sweep_dir = Path(sweep_dir).resolve()
+        self.path = self.sweep_dir / filename
+        self.sweep_dir.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def _relative(self, path):
+        if path is None:
+            return None
+        path = Path(path).resolve()
+        try:
+            return str(path.relative_to(self.sweep_dir))
+        except ValueError:
+            return str(path)
+
+    def _absolute(self, path):
+        return None if path is None else self.sweep_dir / path
+
+    def register(self, name, variant_dir=None, z_start=None, rmax_reduction=None, effective_reduction=None,
+                 cut_preset=None, hash_geometry=True):
+        """
+        Add or update a variant, deriving all of its file paths from its folder.
+
+        Args:
+            name: Variant (folder) name
+            variant_dir: Variant folder (default: <sweep_dir>/<name>)
+            z_start, rmax_reduction: Requested parameters [cm]
+            effective_reduction: Reduction actually applied (default: rmax_reduction)
+            cut_preset: Production-cut preset of the variant
+            hash_geometry: Store the compact tree hash (reads every included file)
+
+        Returns:
+            variant_id (the key used by the pipeline state store)
+        """
+        variant_dir = Path(variant_dir) if variant_dir is not None else self.sweep_dir / name
+        if effective_reduction is None:
+            effective_reduction = rmax_reduction
+        if z_start is None or effective_reduction is None:
+            # Folders whose parameters are unknown are only identified by their name
+            variant_id = variant_hash({"name": name})
+        else:
+            variant_id = variant_hash({"z_start": z_start, "reduction": effective_reduction, "cut_preset": cut_preset})
+
+        maia = next(iter(sorted(variant_dir.glob("MAIA_*.xml"))), None)
+        nozzle = next(iter(sorted(variant_dir.glob("Nozzle_*.xml"))), None)
+        geometry_hash = None
+        if maia is not None and hash_geometry:
+            from geo_cache import compact_tree_hash
+            try:
+                geometry_hash = compact_tree_hash(maia)
+            except (ValueError, FileNotFoundError) as e:
+                logger.warning(f"Cannot hash the compact tree of {name}: {e}")
+        slcio = variant_dir / f"mumu_H_bb_100E_{maia.stem}.slcio" if maia is not None else None
+
+        with self.conn:
+            self.conn.execute("DELETE FROM products WHERE variant_id IN "
+                              "(SELECT variant_id FROM variants WHERE name = ?)", (name,))
+            self.conn.execute("DELETE FROM variants WHERE name = ?", (name,))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO variants (variant_id, name, z_start, rmax_reduction, effective_reduction,"
+                " cut_preset, geometry_hash, dir, compact_xml, nozzle_xml, steering, slcio, sim_log, created)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (variant_id, name, z_start, rmax_reduction, effective_reduction, cut_preset, geometry_hash,
+                 self._relative(variant_dir), self._relative(maia), self._relative(nozzle),
+                 self._relative(variant_dir / "steer_sim.py"), self._relative(slcio),
+                 self._relative(variant_dir / "sim.log"), time.time())
+            )
+            if maia is not None:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO products (variant_id, kind, path) VALUES (?, ?, ?)",
+                    [(variant_id, kind, self._relative(variant_dir / pattern.format(maia=maia.name)))
+                     for kind, pattern in PRODUCT_FILES.items()]
+                )
+        return variant_id
+
+    def add_product(self, name, kind, path):
+        """Record (or move) a derived product of a variant."""
+        with self.conn:
+            updated = self.conn.execute(
+                "INSERT OR REPLACE INTO products (variant_id, kind, path)"
+                " SELECT variant_id, ?, ? FROM variants WHERE name = ?", (kind, self._relative(path), name)
+            ).rowcount
+        if not updated:
+            raise KeyError(f"Variant {name} is not in {self.path}")
+
+    def _entry(self, row):
+        entry = dict(row)
+        for column in PATH_COLUMNS:
+            entry[column] = self._absolute(entry[column])
+        entry["products"] = {kind: self._absolute(path) for kind, path in self.conn.execute(
+            "SELECT kind, path FROM products WHERE variant_id = ?", (entry["variant_id"],))}
+        return entry
+
+    def get(self, name):
+        """Return the entry of a variant, or None."""
+        row = self.conn.execute("SELECT * FROM variants WHERE name = ?", (name,)).fetchone()
+        return None if row is None else self._entry(row)
+
+    def query(self, z_start=None, reduction=None, cut_preset=None, name_like=None, existing=None, tolerance=1e-6):
+        """
+        Select variants by parameters.
+
+        Args:
+            z_start, reduction: Values to match (effective reduction), within tolerance [cm]
+            cut_preset: Production-cut preset
+            name_like: SQL LIKE pattern on the variant name
+            existing: Path column or product kind that must exist on disk (e.g. 'slcio', 'cal_hits')
+            tolerance: Matching tolerance for the float parameters
+
+        Returns:
+            List of entries ordered by z_start, then reduction
+        """
+        clauses, args = [], []
+        for column, value in (("z_start", z_start), ("effective_reduction", reduction)):
+            if value is not None:
+                clauses.append(f"ABS({column} - ?) <= ?")
+                args += [value, tolerance]
+        if cut_preset is not None:
+            clauses.append("cut_preset = ?")
+            args.append(cut_preset)
+        if name_like is not None:
+            clauses.append("name LIKE ?")
+            args.append(name_like)
+        sql = "SELECT * FROM variants"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY z_start, effective_reduction, name"
+        entries = [self._entry(row) for row in self.conn.execute(sql, args)]
+        if existing is not None:
+            entries = [entry for entry in entries if (path := _path_of(entry, existing)) and path.exists()]
+        return entries
+
+    def index_sweep(self, hash_geometry=True):
+        """
+        Register every variant folder of an existing sweep (one directory walk).
+
+        Parameters are recovered from the folder names; folders without a compact
+        file are skipped.
+
+        Returns:
+            Number of variants registered
+        """
+        count = 0
+        for variant_dir in sorted(self.sweep_dir.iterdir()):
+            if not variant_dir.is_dir() or not any(variant_dir.glob("MAIA_*.xml")):
+                continue
+            z_start, reduction = parse_variant_name(variant_dir.name)
+            self.register(variant_dir.name, variant_dir, z_start, reduction, hash_geometry=hash_geometry)
+            count += 1
+        logger.info(f"Indexed {count} variant(s) in {self.path}")
+        return count
+
+def open_catalog(sweep_dir):
+    """Open the catalog of a sweep, indexing the sweep first if it has none yet."""
+    exists = (Path(sweep_dir) / CATALOG_FILENAME).exists()
+    catalog = VariantCatalog(sweep_dir)
+    if not exists:
+        catalog.index_sweep()
+    return catalog
+
+# ================================
+# MAIN EXECUTION
+# ================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Catalog of the variants of a nozzle sweep')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    index = sub.add_parser('index', help='Register every variant folder of a sweep')
+    index.add_argument('sweep_dir')
+    index.add_argument('--no-hash', action='store_true', help='Skip the compact tree hashes')
+
+    query = sub.add_parser('query', help='Print matching variants as JSON lines')
+    query.add_argument('sweep_dir')
+    query.add_argument('--z-start', type=float, default=None)
+    query.add_argument('--reduction', type=float, default=None)
+    query.add_argument('--cut-preset', default=None)
+    query.add_argument('--name-like', default=None)
+    query.add_argument('--with', dest='existing', default=None, help='Path or product that must exist')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.command == 'index':
+        VariantCatalog(args.sweep_dir).index_sweep(hash_geometry=not args.no_hash)
+    else:
+        catalog = open_catalog(args.sweep_dir)
+        for entry in catalog.query(args.z_start, args.reduction, args.cut_preset, args.name_like, args.existing):
+            print(json.dumps(entry, default=str))
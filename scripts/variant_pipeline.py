@@ -0,0 +1,460 @@
+import os
+import json
+import time
+import shlex
+import subprocess
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from NozzleCreationv2 import (
+    NozzleVariantOrganizer, generate_variant_with_validation, resolve_effective_reduction,
+    default_variant_name, cut_preset_steering_overrides, z_start_values, rmax_reduction_values,
+    DEFAULT_INPUT_XML, BASE_GEOMETRY_PATH, STEERING_TEMPLATE_FILENAME, CUT_PRESETS
+)
+from steering_builder import SteeringConfig
+from condor_batch import write_command_cluster_submit, get_submitter
+from geo_cache import compact_tree_hash
+from variant_catalog import VariantCatalog
+from batch_overlap_check import REPORT_FILENAME, OVERLAP_TOLERANCE, SAMPLING_POINTS, load_report
+from pipeline_state import (
+    PipelineStateStore, hash_values, file_fingerprint, variant_hash, RUNNING, DONE, FAILED, SUBMITTED
+)
+
+## $ python variant_pipeline.py --backend dry-run              record the commands of a full sweep
+## $ python variant_pipeline.py --backend local --workers 8    run the sweep on this machine
+## $ python variant_pipeline.py --backend condor               submit each stage as one cluster; rerun to resume
+## $ python pipeline_state.py nozzle_variants_v3               stage status counts of a sweep
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# ================================
+# CONFIGURABLE PARAMETERS
+# ================================
+
+DEFAULT_SWEEP_DIR = "nozzle_variants_v3"
+DEFAULT_STEERING_TEMPLATE = Path(BASE_GEOMETRY_PATH).parent.parent / "steeringFiles" / STEERING_TEMPLATE_FILENAME
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Analysis step run on each simulated file ({slcio} and {variant_dir} are filled in)
+ANALYZE_COMMAND = ["python", str(REPO_ROOT / "analysis" / "pylcio" / "run.py"), "{slcio}",
+                   "-o", "{variant_dir}/cal_hits.root"]
+ANALYZE_OUTPUT = "{variant_dir}/cal_hits.root"
+
+# Lines run at the top of every Condor job script, e.g. setting up the key4hep stack
+CONDOR_JOB_PREAMBLE = ""
+
+# ================================
+# STAGES
+# ================================
+
+STAGES = ("generate", "convert", "overlaps", "simulate", "analyze")
+
+PENDING = "pending"
+DRY_RUN = "dry-run"
+
+# ================================
+# EXECUTION BACKENDS
+# ================================
+
+def _run_job(job):
+    """Run one command job, writing its output to the job's log. Returns (variant, success, seconds)."""
+    start = time.time()
+    with open(job["log"], "w", encoding="utf-8") as log:
+        try:
+            result = subprocess.run(job["command"], cwd=job["cwd"], stdout=log, stderr=subprocess.STDOUT)
+        except (OSError, subprocess.SubprocessError) as e:
+            # e.g. the command is not on PATH: only this variant fails, not the whole stage
+            log.write(f"Could not run {shlex.join(job['command'])}: {e}\n")
+            return job["variant"], False, time.time() - start
+    return job["variant"], result.returncode == 0, time.time() - start
+
+class LocalPoolBackend:
+    """Runs stage jobs on this machine in a process pool."""
+
+    name = "local"
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or os.cpu_count()
+
+    def run(self, stage, jobs):
+        """Returns a dictionary of variant name -> (status, seconds)."""
+        results = {}
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            for variant, success, seconds in pool.map(_run_job, jobs):
+                results[variant] = (DONE if success else FAILED, seconds)
+                logger.info(f"[{stage}] {variant}: {results[variant][0]} in {seconds:.1f} s")
+        return results
+
+class CondorBackend:
+    """Submits all jobs of a stage as one HTCondor cluster; completion is detected on the next run."""
+
+    name = "condor"
+
+    def __init__(self, submit_dir, preamble=CONDOR_JOB_PREAMBLE, submitter=None):
+        self.submit_dir = Path(submit_dir)
+        self.preamble = preamble
+        self.submitter = submitter or get_submitter()
+
+    def run(self, stage, jobs):
+        for job in jobs:
+            script = Path(job["cwd"]) / f"pipeline_{stage}.sh"
+            with open(script, "w", encoding="utf-8") as f:
+                f.write(
+                    "#!/bin/bash\n"
+                    f"{self.preamble}\n"
+                    f"cd {shlex.quote(str(job['cwd']))}\n"
+                    f"{shlex.join(str(arg) for arg in job['command'])} > {shlex.quote(str(job['log']))} 2>&1\n"
+                )
+            script.chmod(0o755)
+            job["script"] = script
+            job["variant_dir"] = job["cwd"]
+        submit_path = write_command_cluster_submit(self.submit_dir, stage, jobs)
+        cluster_id, n_jobs = self.submitter.submit(submit_path)
+        logger.info(f"[{stage}] submitted {n_jobs} jobs as cluster {cluster_id}")
+        return {job["variant"]: (SUBMITTED, None) for job in jobs}
+
+class DryRunBackend:
+    """Executes nothing; records every command that would run as JSON lines."""
+
+    name = "dry-run"
+
+    def __init__(self, record_path):
+        self.record_path = Path(record_path)
+        self.records = []
+
+    def record(self, stage, variant, command, cwd=None):
+        entry = {"stage": stage, "variant": variant, "cwd": str(cwd) if cwd else None,
+                 "command": [str(arg) for arg in command]}
+        self.records.append(entry)
+        with open(self.record_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def run(self, stage, jobs):
+        for job in jobs:
+            self.record(stage, job["variant"], job["command"], job["cwd"])
+        return {job["variant"]: (DRY_RUN, None) for job in jobs}
+
+# ================================
+# PIPELINE
+# ================================
+
+class VariantPipeline:
+    """
+    generate -> convert (geoConverter, cached) -> overlaps (TGeo check of the nozzle volumes)
+    -> simulate (ddsim) -> analyze, for a set of variants. A variant that fails the
+    overlap check never reaches ddsim.
+
+    Every variant and stage is recorded in a PipelineStateStore keyed by the variant
+    hash. A stage runs only if the previous stage is up to date, and is skipped if it
+    already finished with the same input hash and unchanged outputs, so a rerun
+    only executes stale or failed stages (like make over the variant tree).
+    """
+
+    def __init__(self, sweep_dir, backend, input_xml=DEFAULT_INPUT_XML, base_geometry_path=BASE_GEOMETRY_PATH,
+                 steering_template_path=DEFAULT_STEERING_TEMPLATE, cut_preset=None):
+        # Absolute, since stage commands run with the variant folder as working directory
+        self.sweep_dir = Path(sweep_dir).resolve()
+        self.backend = backend
+        self.input_xml = input_xml
+        self.base_geometry_path = base_geometry_path
+        self.steering_template_path = Path(steering_template_path)
+        self.cut_preset = cut_preset
+        self.state = PipelineStateStore(self.sweep_dir)
+        self._organizer = None
+        self._catalog = None
+
+    # ---- variant bookkeeping ----
+
+    def resolve_variants(self, configurations):
+        """
+        Map (z_start, rmax_reduction) pairs to variants.
+
+        Returns:
+            List of dictionaries with 'name', 'hash', 'dir', 'z_start' and 'reduction'
+        """
+        variants = {}
+        for z_start, rmax_reduction in configurations:
+            reduction, error_msg = resolve_effective_reduction(z_start, rmax_reduction)
+            if reduction is None:
+                logger.warning(f"Skipping z_start={z_start}, reduction={rmax_reduction}: {error_msg.splitlines()[0]}")
+                continue
+            name = default_variant_name(z_start, reduction)
+            # Configurations clamped to the same suggested reduction produce the same variant
+            if name in variants:
+                continue
+            params = {"z_start": z_start, "reduction": reduction, "cut_preset": self.cut_preset}
+            key = variant_hash(params)
+            self.state.register_variant(key, name, params)
+            variants[name] = {"name": name, "hash": key, "dir": self.sweep_dir / name, "z_start": z_start,
+                              "reduction": rmax_reduction}
+        return list(variants.values())
+
+    @staticmethod
+    def maia_path(variant):
+        return variant["dir"] / f"MAIA_{variant['name']}.xml"
+
+    @staticmethod
+    def slcio_path(variant):
+        return variant["dir"] / f"mumu_H_bb_100E_MAIA_{variant['name']}.slcio"
+
+    def stage_outputs(self, stage, variant):
+        """Files whose existence marks a stage as complete for a variant."""
+        if stage == "generate":
+            return [self.maia_path(variant)]
+        if stage == "convert":
+            return [Path(f"{self.maia_path(variant)}.root")]
+        if stage == "overlaps":
+            return [variant["dir"] / REPORT_FILENAME]
+        if stage == "simulate":
+            return [self.slcio_path(variant)]
+        if stage == "analyze":
+            return [Path(ANALYZE_OUTPUT.format(variant_dir=variant["dir"], slcio=self.slcio_path(variant)))]
+        raise ValueError(f"Unknown stage: {stage}")
+
+    def outputs_newer_than(self, stage, variant, timestamp):
+        """True if every output was written after timestamp (i.e. not left over from an older run)."""
+        return all(path.stat().st_mtime >= (timestamp or 0) for path in self.stage_outputs(stage, variant))
+
+    def is_complete(self, stage, variant):
+        if not all(path.exists() for path in self.stage_outputs(stage, variant)):
+            return False
+        if stage == "overlaps":
+            report = load_report(variant["dir"], compact_tree_hash(self.maia_path(variant)))
+            return report is not None and report["passed"]
+        if stage == "simulate":
+            from sim_cost_model import parse_sim_log_time
+            return parse_sim_log_time(variant["dir"] / "sim.log") is not None
+        return True
+
+    def steering_config(self, variant):
+        return SteeringConfig(self.steering_template_path).with_job(
+            self.maia_path(variant).resolve(), self.slcio_path(variant).name,
+            extra=cut_preset_steering_overrides(self.cut_preset)
+        )
+
+    def input_hash(self, stage, variant):
+        """
+        Hash of everything a stage of a variant depends on.
+
+        Returns:
+            Hash string, or None if the inputs do not exist yet
+        """
+        if stage == "generate":
+            return hash_values(stage, variant["hash"], file_fingerprint(self.input_xml), str(self.base_geometry_path))
+        if not self.maia_path(variant).exists():
+            return None
+        if stage == "convert":
+            return hash_values(stage, compact_tree_hash(self.maia_path(variant)))
+        if stage == "overlaps":
+            return hash_values(stage, compact_tree_hash(self.maia_path(variant)), OVERLAP_TOLERANCE, SAMPLING_POINTS)
+        if stage == "simulate":
+            return hash_values(stage, self.steering_config(variant).render(), compact_tree_hash(self.maia_path(variant)))
+        if stage == "analyze":
+            slcio = file_fingerprint(self.slcio_path(variant))
+            return hash_values(stage, slcio, ANALYZE_COMMAND) if slcio else None
+        raise ValueError(f"Unknown stage: {stage}")
+
+    def is_up_to_date(self, stage, variant):
+        input_hash = self.input_hash(stage, variant)
+        return input_hash is not None and self.state.is_up_to_date(variant["hash"], stage, input_hash)
+
+    # ---- stage jobs ----
+
+    def stage_job(self, stage, variant):
+        """Command job for a stage (generate runs in-process and has no job)."""
+        variant_dir = variant["dir"]
+        maia_path = self.maia_path(variant)
+        if stage == "convert":
+            # Through the conversion cache, so unchanged geometries are not converted again
+            command = ["python", Path(__file__).resolve().with_name("geo_cache.py"), maia_path,
+                       "--output", f"{maia_path}.root"]
+            log = variant_dir / "convert.log"
+        elif stage == "overlaps":
+            command = ["python", Path(__file__).resolve().with_name("batch_overlap_check.py"), f"{maia_path}.root",
+                       "--report", variant_dir / REPORT_FILENAME]
+            log = variant_dir / "overlaps.log"
+        elif stage == "simulate":
+            command = ["ddsim", "--steeringFile", variant_dir / "steer_sim.py"]
+            log = variant_dir / "sim.log"
+        elif stage == "analyze":
+            fields = {"slcio": self.slcio_path(variant), "variant_dir": variant_dir}
+            command = [arg.format(**fields) for arg in ANALYZE_COMMAND]
+            log = variant_dir / "analyze.log"
+        else:
+            raise ValueError(f"Stage {stage} has no command")
+        return {"variant": variant["name"], "cwd": variant_dir, "command": [str(arg) for arg in command],
+                "log": log}
+
+    def prepare_simulate(self, variant):
+        """Render the validated steering file of a variant before ddsim is launched."""
+        self.steering_config(variant).write(variant["dir"] / "steer_sim.py")
+
+    def simulate_requests(self, variant):
+        from sim_cost_model import load_or_train_cost_model, features_for_variant, condor_requests
+        features = features_for_variant(variant["dir"])
+        if features is None:
+            return {}
+        return condor_requests(load_or_train_cost_model().predict(features))
+
+    def run_generate(self, variants):
+        if isinstance(self.backend, DryRunBackend):
+            for variant in variants:
+                self.backend.record("generate", variant["name"],
+                                    ["generate_variant_with_validation", variant["z_start"], variant["reduction"]])
+            return {variant["name"]: (DRY_RUN, None) for variant in variants}
+
+        if self._organizer is None:
+            self._organizer = NozzleVariantOrganizer(self.base_geometry_path, self.sweep_dir,
+                                                     cut_preset=self.cut_preset)
+        if self._catalog is None:
+            self._catalog = VariantCatalog(self.sweep_dir)
+        results = {}
+        for variant in variants:
+            start = time.time()
+            success, _, msg = generate_variant_with_validation(
+                variant["z_start"], variant["reduction"], self.input_xml, self.sweep_dir,
+                organizer=self._organizer, catalog=self._catalog
+            )
+            results[variant["name"]] = (DONE if success else FAILED, time.time() - start)
+            if not success:
+                logger.warning(f"[generate] {variant['name']}: {msg}")
+        return results
+
+    # ---- driver ----
+
+    def run(self, configurations, stages=STAGES, resubmit=False):
+        """
+        Run the requested stages for every configuration.
+
+        Args:
+            configurations: Iterable of (z_start, rmax_reduction)
+            stages: Stages to run, in pipeline order
+            resubmit: Also rerun stages that were submitted but never produced their outputs
+
+        Returns:
+            Dictionary of variant name -> {stage: status}
+        """
+        variants = self.resolve_variants(configurations)
+        self.sweep_dir.mkdir(parents=True, exist_ok=True)
+        dry_run = isinstance(self.backend, DryRunBackend)
+
+        summary = {variant["name"]: {} for variant in variants}
+        for stage in stages:
+            previous = STAGES[STAGES.index(stage) - 1] if STAGES.index(stage) > 0 else None
+            todo = []
+            for variant in variants:
+                name, key = variant["name"], variant["hash"]
+                if previous is not None and not dry_run:
+                    upstream = summary[name].get(previous)
+                    if upstream is None:
+                        upstream = DONE if self.is_up_to_date(previous, variant) else PENDING
+                    if upstream != DONE:
+                        summary[name][stage] = PENDING
+                        continue
+
+                input_hash = None if dry_run else self.input_hash(stage, variant)
+                if input_hash is not None and self.state.is_up_to_date(key, stage, input_hash):
+                    summary[name][stage] = DONE
+                    continue
+
+                record = self.state.get(key, stage)
+                same_inputs = record is not None and record["input_hash"] == input_hash
+                if not dry_run and self.is_complete(stage, variant) and (
+                        record is None or (record["status"] == SUBMITTED and same_inputs
+                                           and self.outputs_newer_than(stage, variant, record["started"]))):
+                    # Outputs of a finished Condor job, or of a run made before the state store existed
+                    duration = None
+                    if stage == "simulate":
+                        from sim_cost_model import parse_sim_log_time
+                        duration = parse_sim_log_time(variant["dir"] / "sim.log")
+                    self.state.mark_done(key, stage, input_hash, self.stage_outputs(stage, variant),
+                                         backend=record["backend"] if record else None,
+                                         started=record["started"] if record else None, duration_s=duration)
+                    summary[name][stage] = DONE
+                    continue
+                if record is not None and record["status"] == SUBMITTED and same_inputs and not (dry_run or resubmit):
+                    # Still running on the pool; wait for its outputs instead of resubmitting
+                    summary[name][stage] = SUBMITTED
+                    continue
+                todo.append((variant, input_hash))
+
+            if not todo:
+                continue
+            reasons = {}
+            for variant, _ in todo:
+                record = self.state.get(variant["hash"], stage)
+                reason = "new" if record is None else ("stale" if record["status"] == DONE else record["status"])
+                reasons[reason] = reasons.get(reason, 0) + 1
+            logger.info(f"[{stage}] {len(todo)} variant(s) to process with the {self.backend.name} backend {reasons}")
+
+            started = time.time()
+            if not dry_run:
+                for variant, input_hash in todo:
+                    self.state.set(variant["hash"], stage, RUNNING, input_hash, backend=self.backend.name,
+                                   started=started)
+
+            if stage == "generate":
+                results = self.run_generate([variant for variant, _ in todo])
+            else:
+                jobs = []
+                for variant, _ in todo:
+                    if stage == "simulate" and not dry_run:
+                        self.prepare_simulate(variant)
+                    job = self.stage_job(stage, variant)
+                    if stage == "simulate" and isinstance(self.backend, CondorBackend):
+                        job["requests"] = self.simulate_requests(variant)
+                    jobs.append(job)
+                results = self.backend.run(stage, jobs)
+
+            for variant, input_hash in todo:
+                status, seconds = results[variant["name"]]
+                summary[variant["name"]][stage] = status
+                if status == DRY_RUN:
+                    continue
+                if status == DONE:
+                    self.state.mark_done(variant["hash"], stage, input_hash, self.stage_outputs(stage, variant),
+                                         backend=self.backend.name, started=started, duration_s=seconds)
+                else:
+                    self.state.set(variant["hash"], stage, status, input_hash, backend=self.backend.name,
+                                   started=started, duration_s=seconds)
+        return summary
+
+# ================================
+# MAIN EXECUTION
+# ================================
+
+if __name__ == "__main__":
+    import argparse
+    from itertools import product
+
+    parser = argparse.ArgumentParser(description='Run the nozzle variant pipeline')
+    parser.add_argument('--backend', choices=['local', 'condor', 'dry-run'], default='dry-run')
+    parser.add_argument('--sweep-dir', default=DEFAULT_SWEEP_DIR)
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES))
+    parser.add_argument('--workers', type=int, default=None, help='Process pool size for the local backend')
+    parser.add_argument('--cut-preset', default=None, choices=sorted(CUT_PRESETS))
+    parser.add_argument('--mock-submit', action='store_true', help='Use the mock condor_submit backend')
+    parser.add_argument('--resubmit', action='store_true', help='Rerun submitted stages that have no outputs yet')
+    parser.add_argument('--record', default='pipeline_dry_run.jsonl', help='Command record of the dry-run backend')
+    args = parser.parse_args()
+
+    if args.backend == 'local':
+        backend = LocalPoolBackend(args.workers)
+    elif args.backend == 'condor':
+        backend = CondorBackend(args.sweep_dir, submitter=get_submitter(mock=args.mock_submit))
+    else:
+        backend = DryRunBackend(args.record)
+
+    pipeline = VariantPipeline(args.sweep_dir, backend, cut_preset=args.cut_preset)
+    summary = pipeline.run(product(z_start_values, rmax_reduction_values), args.stages, args.resubmit)
+
+    counts = {}
+    for stages in summary.values():
+        for stage, status in stages.items():
+            counts[(stage, status)] = counts.get((stage, status), 0) + 1
+    for (stage, status), count in sorted(counts.items()):
+        logger.info(f"{stage:10s} {status:10s} {count}")
+    pipeline.state.close()
@@ -0,0 +1,248 @@
+import csv
+import math
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+from nozzle_polycones import COMPACT_CONSTANTS, read_polycone_zplanes, find_nozzle_xml
+from nozzle_attribution import TRACKER_HIT_COLLECTIONS
+
+## $ python variant_summary.py sweep_dir/*/ -o sweep_summary.csv --workers 8   one row of BIB metrics per variant
+## $ python variant_summary.py sweep_dir/*/ -o sweep_summary.parquet          same, as Parquet (needs pyarrow)
+## Needs pyLCIO (key4hep stack) to read the .slcio files.
+
+logger = logging.getLogger(__name__)
+
+# ================================
+# CONFIGURABLE PARAMETERS
+# ================================
+
+ECAL_BARREL_COLLECTION = "ECalBarrelCollection"
+ECAL_ENDCAP_COLLECTION = "ECalEndcapCollection"
+MCP_COLLECTION = "MCParticle"
+
+# ECal hits count as in time if their earliest contribution arrives within this window
+# around the time of flight from the IP [ns]
+ECAL_TIME_WINDOW = (-0.25, 0.25)
+SPEED_OF_LIGHT = 299.792458  # mm/ns
+
+# MCParticle vertices are counted in the first VERTEX_REGION_CM of the nozzle, from its tip.
+# The tip is read from each variant's Nozzle XML; this is the fallback without one
+NOZZLE_TIP_Z_CM = COMPACT_CONSTANTS["Nozzle_zmin"][0]
+VERTEX_REGION_CM = 10.0
+
+BOOTSTRAP_SAMPLES = 500
+BOOTSTRAP_SEED = 12345
+
+# ================================
+# PER-EVENT METRICS
+# ================================
+
+def _collection(event, names, col_name):
+    return event.getCollection(col_name) if col_name in names else None
+
+def nozzle_tip_z_cm(variant_folder):
+    """|z| of the nozzle tip of a variant [cm]: the innermost NozzleW zplane of its Nozzle XML"""
+    nozzle_xml = find_nozzle_xml(variant_folder)
+    if nozzle_xml is None:
+        return NOZZLE_TIP_Z_CM
+    profiles = read_polycone_zplanes(nozzle_xml, prefixes=("NozzleW",))
+    planes = [abs(z) for zplanes in profiles.values() for z, _, _ in zplanes]
+    return min(planes) if planes else NOZZLE_TIP_Z_CM
+
+def event_metrics(event, tracker_collections=TRACKER_HIT_COLLECTIONS, tip_z_cm=NOZZLE_TIP_Z_CM):
+    """
+    Compute the scalar metrics of one event.
+
+    Returns:
+        Dictionary of metric name -> value
+    """
+    from pyLCIO import EVENT, UTIL
+
+    names = set(event.getCollectionNames())
+    metrics = {}
+
+    mcps = _collection(event, names, MCP_COLLECTION)
+    n_mcp, n_tip = 0, 0
+    if mcps is not None:
+        z_lo = tip_z_cm * 10.0
+        z_hi = (tip_z_cm + VERTEX_REGION_CM) * 10.0
+        for p in mcps:
+            n_mcp += 1
+            if z_lo <= abs(p.getVertex()[2]) < z_hi:
+                n_tip += 1
+    metrics["mcparticles"] = n_mcp
+    metrics[f"vertices_nozzle_first_{VERTEX_REGION_CM:g}cm"] = n_tip
+
+    n_in_time = 0
+    for col_name in (ECAL_BARREL_COLLECTION, ECAL_ENDCAP_COLLECTION):
+        col = _collection(event, names, col_name)
+        energy = 0.0
+        for hit in col if col is not None else []:
+            energy += hit.getEnergy()
+            n_contrib = hit.getNMCContributions()
+            if n_contrib == 0:
+                continue
+            pos = hit.getPosition()
+            t0 = math.sqrt(pos[0] * pos[0] + pos[1] * pos[1] + pos[2] * pos[2]) / SPEED_OF_LIGHT
+            t = min(hit.getTimeCont(i) for i in range(n_contrib)) - t0
+            if ECAL_TIME_WINDOW[0] <= t <= ECAL_TIME_WINDOW[1]:
+                n_in_time += 1
+        if col_name == ECAL_ENDCAP_COLLECTION:
+            metrics["ecal_endcap_energy_gev"] = energy
+    metrics["ecal_hits_in_time"] = n_in_time
+
+    for col_name in tracker_collections:
+        col = _collection(event, names, col_name)
+        if col is None:
+            continue
+        decoder = UTIL.BitField64(col.getParameters().getStringVal(EVENT.LCIO.CellIDEncoding))
+        layers = []
+        for hit in col:
+            decoder.setValue(int(hit.getCellID0() & 0xffffffff) | (int(hit.getCellID1()) << 32))
+            layers.append(int(decoder['layer'].value()))
+        prefix = col_name.replace("Collection", "")
+        for layer, count in enumerate(np.bincount(layers) if layers else []):
+            metrics[f"{prefix}_layer{layer}_hits"] = int(count)
+        metrics[f"{prefix}_hits"] = len(layers)
+    return metrics
+
+# ================================
+# SUMMARY
+# ================================
+
+def bootstrap_means(values, n_samples=BOOTSTRAP_SAMPLES, seed=BOOTSTRAP_SEED):
+    """
+    Per-event means and their bootstrap uncertainties.
+
+    Args:
+        values: (n_events, n_metrics) array
+
+    Returns:
+        (means, errors) arrays of length n_metrics; errors are NaN with fewer than 2 events
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n_events = len(values)
+    means = values.mean(axis=0) if n_events else np.full(values.shape[1], np.nan)
+    if n_events < 2:
+        return means, np.full(values.shape[1], np.nan)
+    rng = np.random.default_rng(seed)
+    idx = rng.integers(0, n_events, size=(n_samples, n_events))
+    resampled = values[idx].mean(axis=1)
+    return means, resampled.std(axis=0, ddof=1)
+
+def summarize_file(slcio_path, max_events=-1, tip_z_cm=NOZZLE_TIP_Z_CM):
+    """
+    Stream one .slcio file and reduce it to a summary row.
+
+    Returns:
+        Dictionary with n_events and, for every metric, its mean per event and '<metric>_err'
+    """
+    from pyLCIO import IOIMPL
+
+    per_event = []
+    reader = IOIMPL.LCFactory.getInstance().createLCReader()
+    reader.open(str(slcio_path))
+    try:
+        for event in reader:
+            if 0 <= max_events <= len(per_event):
+                break
+            per_event.append(event_metrics(event, tip_z_cm=tip_z_cm))
+    finally:
+        reader.close()
+
+    # Metrics absent from an event (e.g. a layer without hits) are zero in it
+    names = sorted({name for metrics in per_event for name in metrics})
+    values = np.array([[metrics.get(name, 0) for name in names] for metrics in per_event],
+                      dtype=np.float64).reshape(len(per_event), len(names))
+    means, errors = bootstrap_means(values)
+    row = {"n_events": len(per_event)}
+    for name, mean, error in zip(names, means, errors):
+        row[name] = float(mean)
+        row[f"{name}_err"] = float(error)
+    return row
+
+def _summarize_job(job):
+    """Process-pool entry point. Returns (variant, row or None, error)."""
+    variant_folder, max_events = job
+    try:
+        slcio_files = sorted(Path(variant_folder).glob("*.slcio"))
+        if not slcio_files:
+            return Path(variant_folder).name, None, "no .slcio file"
+        row = summarize_file(slcio_files[0], max_events, nozzle_tip_z_cm(variant_folder))
+        return Path(variant_folder).name, row, None
+    except Exception as e:
+        return Path(variant_folder).name, None, str(e)
+
+def summarize_variants(variant_folders, max_events=-1, max_workers=None):
+    """
+    Summarize many variants in parallel, one .slcio file per worker.
+
+    Returns:
+        List of rows ({'variant': name, ...}) for the variants that could be read
+    """
+    rows = []
+    jobs = [(str(folder), max_events) for folder in variant_folders]
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        for variant, row, error in pool.map(_summarize_job, jobs):
+            if error:
+                logger.error(f"{variant}: {error}")
+                continue
+            rows.append({"variant": variant, **row})
+            logger.info(f"{variant}: {row['n_events']} events")
+    return rows
+
+def _fill_missing(row, fields):
+    """Row with every field; a metric never seen in a variant has mean 0 and an unknown (NaN) error"""
+    filled = dict(row)
+    for name in fields:
+        if name not in filled:
+            filled[name] = math.nan if name.endswith("_err") else 0.0
+    return filled
+
+def write_table(rows, path):
+    """Write summary rows as CSV, or as Parquet if the path ends in .parquet."""
+    path = Path(path)
+    fields = ["variant", "n_events"]
+    for row in rows:
+        fields += [name for name in row if name not in fields]
+    rows = [_fill_missing(row, fields) for row in rows]
+    if path.suffix == ".parquet":
+        if pyarrow is None:
+            raise RuntimeError("Writing Parquet needs pyarrow; use a .csv output instead")
+        columns = {name: [row[name] for row in rows] for name in fields}
+        pyarrow.parquet.write_table(pyarrow.table(columns), path)
+    else:
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(rows)
+    return path
+
+# ================================
+# MAIN EXECUTION
+# ================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='One row of BIB figures of merit per nozzle variant')
+    parser.add_argument('variant_folders', nargs='+')
+    parser.add_argument('-o', '--output', default='variant_summary.csv', help='.csv or .parquet')
+    parser.add_argument('--max-events', type=int, default=-1)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    rows = summarize_variants(args.variant_folders, args.max_events, args.workers)
+    logger.info(f"Wrote {len(rows)} variant(s) to {write_table(rows, args.output)}")